@@ -1,3 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import QueryStat
+
+
+@admin.register(QueryStat)
+class QueryStatAdmin(admin.ModelAdmin):
+    list_display = ['view_name', 'short_fingerprint', 'calls', 'total_time', 'max_time', 'rows', 'last_seen']
+    list_filter = ['view_name']
+    search_fields = ['fingerprint', 'view_name']
+    readonly_fields = [f.name for f in QueryStat._meta.fields]
+
+    def short_fingerprint(self, obj):
+        return obj.fingerprint[:100]
+    short_fingerprint.short_description = 'SQL Normalizado'
+
+    def has_add_permission(self, request):
+        return False
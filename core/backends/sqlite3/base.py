@@ -0,0 +1,59 @@
+"""
+Backend SQLite para produção com vários workers.
+
+Em relação a ``django.db.backends.sqlite3``:
+
+* aplica ``journal_mode=WAL``, ``busy_timeout``, ``synchronous=NORMAL``,
+  ``mmap_size`` e ``cache_size`` ao abrir cada conexão (ajustáveis em
+  ``OPTIONS['pragmas']``);
+* inicia as transações de ``atomic()`` com ``BEGIN IMMEDIATE``: o lock de
+  escrita é obtido (ou aguardado, até o ``busy_timeout``) no início da
+  transação, em vez de falhar com "database is locked" ao tentar promover
+  um lock de leitura no meio dela. ``OPTIONS['transaction_mode']`` aceita
+  ``DEFERRED``, ``IMMEDIATE`` ou ``EXCLUSIVE``.
+
+Use com ``CONN_MAX_AGE`` para que as pragmas sejam aplicadas uma vez por
+conexão persistente, e não a cada requisição.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 20000,  # ms
+    'synchronous': 'NORMAL',
+    'mmap_size': 134217728,  # 128 MB
+    'cache_size': -32000,  # KiB (valor negativo), ~32 MB
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = {**DEFAULT_PRAGMAS, **options.get('pragmas', {})}
+        self.transaction_mode = options.get('transaction_mode', 'IMMEDIATE').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"transaction_mode inválido: {self.transaction_mode!r} "
+                f"(use {', '.join(TRANSACTION_MODES)})"
+            )
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = dict(self.pragmas)
+        if self.is_in_memory_db():
+            # WAL e mmap não se aplicam a bancos em memória (testes)
+            pragmas.pop('journal_mode', None)
+            pragmas.pop('mmap_size', None)
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
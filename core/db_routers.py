@@ -0,0 +1,141 @@
+"""
+Roteadores de banco: livro-razão/auditoria e réplica de leitura.
+
+``LedgerRouter`` envia a auditoria (``LEDGER_MODELS``) para o alias
+``ledger``, quando configurado. ``StockMovement`` fica no banco principal:
+a saída de estoque grava movimentação e saldo na mesma transação.
+
+Views de relatório decoradas com ``use_read_replica`` leem do alias
+``settings.READ_DATABASE_ALIAS``; todo o resto (e todas as escritas) usa
+``default``. Depois de um POST do usuário, ``ReadReplicaStickinessMiddleware``
+marca um cookie por ``READ_REPLICA_STICKY_SECONDS`` segundos, durante os
+quais as views decoradas também leem de ``default`` (o usuário vê o que
+acabou de gravar mesmo que a réplica esteja atrasada).
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+
+STICKY_COOKIE = 'db_primary_sticky'
+
+_read_alias = ContextVar('read_database_alias', default=None)
+
+# Tabelas que precisam ser lidas do banco principal mesmo nas views de relatório
+PRIMARY_ONLY_APPS = {'sessions', 'contenttypes'}
+
+
+def get_read_alias():
+    alias = getattr(settings, 'READ_DATABASE_ALIAS', 'default')
+    return alias if alias in settings.DATABASES else 'default'
+
+
+def _pinned_alias(request):
+    alias = get_read_alias()
+    if alias == 'default' or request.COOKIES.get(STICKY_COOKIE):
+        return None
+    return alias
+
+
+def use_read_replica(view_func):
+    """Fixa as leituras da view na réplica (exceto logo após um POST do usuário)."""
+    if iscoroutinefunction(view_func):
+        # O ContextVar é herdado pelas threads do sync_to_async do ORM async
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            alias = _pinned_alias(request)
+            if alias is None:
+                return await view_func(request, *args, **kwargs)
+            token = _read_alias.set(alias)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        alias = _pinned_alias(request)
+        if alias is None:
+            return view_func(request, *args, **kwargs)
+        token = _read_alias.set(alias)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """Envia leituras para a réplica apenas dentro de views com ``use_read_replica``."""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e principal têm os mesmos dados
+        databases = {'default', get_read_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica é uma cópia do principal: não recebe migrações
+        if db != 'default' and db == get_read_alias():
+            return False
+        return None
+
+
+# Tabelas append-only que podem ficar no banco ``ledger``
+LEDGER_MODELS = {'users.auditlog'}
+
+
+def get_ledger_alias():
+    return 'ledger' if 'ledger' in settings.DATABASES else None
+
+
+class LedgerRouter:
+    """Envia a auditoria ao alias ``ledger`` (se existir)."""
+
+    def _route(self, model, hints):
+        alias = get_ledger_alias()
+        if alias is None:
+            return None
+        if model._meta.label_lower in LEDGER_MODELS:
+            return alias
+        # Ex.: AuditLog.user -> User, que continua no banco principal
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == alias:
+            return 'default'
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # AuditLog.user aponta para o banco principal (db_constraint=False)
+        if get_ledger_alias() and LEDGER_MODELS & {obj1._meta.label_lower, obj2._meta.label_lower}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = get_ledger_alias()
+        if alias is None:
+            return None
+        is_ledger_model = f'{app_label}.{model_name}' in LEDGER_MODELS
+        if db == alias:
+            return is_ledger_model
+        if is_ledger_model:
+            return False
+        return None
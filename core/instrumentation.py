@@ -0,0 +1,121 @@
+"""
+Instrumentação de desempenho por requisição.
+
+``RequestTimings`` acumula o tempo de SQL (via ``execute_wrapper``) e de
+renderização de templates da requisição corrente; ``fingerprint`` normaliza
+o SQL para agrupar consultas que só diferem nos parâmetros (assinaturas N+1).
+"""
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+_current_timings = ContextVar('request_timings', default=None)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES_RE = re.compile(r'(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Normaliza o SQL: literais e parâmetros viram ``?`` e listas ``IN (...)``
+    de qualquer tamanho ficam iguais.
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    sql = _VALUES_RE.sub(r'\1', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def _params_key(params):
+    try:
+        return hash(tuple(params)) if params is not None else None
+    except TypeError:
+        return repr(params)
+
+
+class RequestTimings:
+    """Medições de uma requisição (também usado como ``execute_wrapper``)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_time = 0.0
+        self.sql_in_templates = 0.0
+        self.template_time = 0.0
+        self.queries = []
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.sql_time += duration
+            if self._template_depth:
+                self.sql_in_templates += duration
+            self.queries.append((sql, _params_key(params), duration))
+
+    def activate(self):
+        return _current_timings.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_timings.reset(token)
+
+    def summary(self, n_plus_one_threshold=5):
+        total = time.perf_counter() - self.started
+        exact = Counter((sql, params) for sql, params, _ in self.queries)
+        by_fingerprint = Counter(fingerprint(sql) for sql, _, _ in self.queries)
+        template_own = max(self.template_time - self.sql_in_templates, 0.0)
+        return {
+            'total_ms': round(total * 1000, 2),
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'template_ms': round(template_own * 1000, 2),
+            'python_ms': round(max(total - self.sql_time - template_own, 0.0) * 1000, 2),
+            'queries': len(self.queries),
+            'duplicates': sum(count - 1 for count in exact.values() if count > 1),
+            'n_plus_one': [
+                {'fingerprint': fp, 'count': count}
+                for fp, count in by_fingerprint.most_common()
+                if count >= n_plus_one_threshold
+            ],
+        }
+
+
+_template_timer_installed = False
+
+
+def install_template_timer():
+    """
+    Mede ``Template.render`` do backend Django (somente o template de nível
+    mais alto; ``include`` e ``extends`` são renderizados dentro dele).
+    """
+    global _template_timer_installed
+    if _template_timer_installed:
+        return
+    from django.template.backends.django import Template
+
+    original_render = Template.render
+
+    def render(self, context=None, request=None):
+        timings = _current_timings.get()
+        if timings is None:
+            return original_render(self, context, request)
+        timings._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            timings._template_depth -= 1
+            if not timings._template_depth:
+                timings.template_time += time.perf_counter() - start
+
+    Template.render = render
+    _template_timer_installed = True
@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+ALIAS = 'sqlite_benchmark'
+
+ENGINES = [
+    ('padrão', 'django.db.backends.sqlite3', {}),
+    ('ajustado', 'core.backends.sqlite3', {}),
+]
+
+
+def _setup_database(path, stock_rows):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        DROP TABLE IF EXISTS bench_stock;
+        DROP TABLE IF EXISTS bench_movement;
+        CREATE TABLE bench_stock (id INTEGER PRIMARY KEY, quantidade INTEGER NOT NULL);
+        CREATE TABLE bench_movement (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stock_id INTEGER NOT NULL,
+            quantidade INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+    ''')
+    conn.executemany(
+        'INSERT INTO bench_stock (id, quantidade) VALUES (?, ?)',
+        [(i, 1000000) for i in range(stock_rows)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _worker(args):
+    """Simula saídas de estoque: leitura fora da transação + baixa atômica."""
+    engine, options, path, operations, stock_rows = args
+    connections.settings[ALIAS] = dict(
+        connections.settings['default'],
+        ENGINE=engine, NAME=path, OPTIONS=options, CONN_MAX_AGE=None,
+    )
+    connection = connections[ALIAS]
+    ok = errors = 0
+    latencies = []
+    for _ in range(operations):
+        stock_id = random.randrange(stock_rows)
+        start = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM bench_movement WHERE stock_id = %s', [stock_id])
+            with transaction.atomic(using=ALIAS):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT quantidade FROM bench_stock WHERE id = %s', [stock_id])
+                    quantidade = cursor.fetchone()[0]
+                    cursor.execute('UPDATE bench_stock SET quantidade = %s WHERE id = %s', [quantidade - 1, stock_id])
+                    cursor.execute(
+                        'INSERT INTO bench_movement (stock_id, quantidade, created_at) VALUES (%s, %s, %s)',
+                        [stock_id, 1, time.time()],
+                    )
+            ok += 1
+        except OperationalError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+    return ok, errors, latencies
+
+
+class Command(BaseCommand):
+    help = 'Compara a vazão de escritas concorrentes no SQLite: backend padrão x core.backends.sqlite3'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Processos escrevendo em paralelo')
+        parser.add_argument('--operations', type=int, default=200, help='Operações por processo')
+        parser.add_argument('--stock-rows', type=int, default=50, help='Linhas de estoque disputadas')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        operations = options['operations']
+        stock_rows = options['stock_rows']
+        context = multiprocessing.get_context('fork')
+
+        self.stdout.write(f'{workers} processos x {operations} operações ({stock_rows} linhas de estoque)\n')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for label, engine, engine_options in ENGINES:
+                path = os.path.join(tmpdir, f'{label}.sqlite3')
+                _setup_database(path, stock_rows)
+                # Conexões não podem ser herdadas pelos processos filhos
+                connections.close_all()
+
+                started = time.perf_counter()
+                with context.Pool(workers) as pool:
+                    results = pool.map(
+                        _worker, [(engine, engine_options, path, operations, stock_rows)] * workers
+                    )
+                elapsed = time.perf_counter() - started
+
+                ok = sum(r[0] for r in results)
+                errors = sum(r[1] for r in results)
+                latencies = sorted(lat for r in results for lat in r[2])
+                p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+                self.stdout.write(
+                    f'{label:<10} {engine:<32} ok={ok:<6} "database is locked"={errors:<6} '
+                    f'{ok / elapsed:8.1f} ops/s  p95={p95:.1f} ms'
+                )
@@ -0,0 +1,85 @@
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import ProtocolTemplate, Substance
+
+
+def _request(url, cookie, timeout):
+    request = urllib.request.Request(url, headers={'Cookie': cookie})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Compara a vazão das APIs JSON entre o servidor WSGI (gunicorn) e o ASGI (uvicorn)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-url', default='http://127.0.0.1:8000', help='Servidor WSGI')
+        parser.add_argument('--async-url', default='http://127.0.0.1:8001', help='Servidor ASGI')
+        parser.add_argument('--username', required=True, help='Usuário usado nas requisições')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requisições simultâneas')
+        parser.add_argument('--requests', type=int, default=2000, help='Requisições por servidor')
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('paths', nargs='*', help='Caminhos a testar (padrão: APIs de estoque e protocolos)')
+
+    def handle(self, *args, **options):
+        cookie = self._session_cookie(options['username'])
+        paths = options['paths'] or self._default_paths()
+        total = options['requests']
+        concurrency = options['concurrency']
+
+        self.stdout.write(f'{total} requisições, {concurrency} simultâneas, caminhos: {", ".join(paths)}\n')
+        for label in ('sync', 'async'):
+            base_url = options[f'{label}_url'].rstrip('/')
+            urls = [base_url + paths[i % len(paths)] for i in range(total)]
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(lambda url: _request(url, cookie, options['timeout']), urls))
+            elapsed = time.perf_counter() - started
+
+            errors = sum(1 for ok, _ in results if not ok)
+            latencies = sorted(latency for _, latency in results)
+            p50 = latencies[len(latencies) // 2] * 1000
+            p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+            self.stdout.write(
+                f'{label:<6} {base_url:<28} {total / elapsed:8.1f} req/s  '
+                f'p50={p50:.1f} ms  p95={p95:.1f} ms  erros={errors}'
+            )
+
+    @staticmethod
+    def _session_cookie(username):
+        """Cria uma sessão autenticada no banco, compartilhada pelos dois servidores."""
+        user = get_user_model().objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f'Usuário "{username}" não encontrado')
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    @staticmethod
+    def _default_paths():
+        paths = ['/inventory/api/protocolos/stats/']
+        substance = Substance.objects.values_list('id', flat=True).first()
+        if substance:
+            paths.append(f'/inventory/api/substance-stock/?substance_id={substance}')
+        protocol = ProtocolTemplate.objects.values_list('id', flat=True).first()
+        if protocol:
+            paths.append(f'/inventory/api/protocolos/{protocol}/substancias/')
+        return paths
@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copia o banco SQLite principal para a réplica de leitura (API de backup do SQLite)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Repete a cópia a cada N segundos (0 = uma vez)')
+        parser.add_argument('--pages', type=int, default=1024,
+                            help='Páginas copiadas por passo (libera o lock de leitura entre passos)')
+
+    def handle(self, *args, **options):
+        alias = getattr(settings, 'READ_DATABASE_ALIAS', 'default')
+        if alias == 'default':
+            raise CommandError('Nenhuma réplica configurada (defina SQLITE_REPLICA=True).')
+        source = settings.DATABASES['default']
+        replica = settings.DATABASES[alias]
+        for name, db in (('default', source), (alias, replica)):
+            if 'sqlite3' not in db['ENGINE']:
+                raise CommandError(f'O banco "{name}" não é SQLite; use a replicação do próprio servidor.')
+
+        while True:
+            started = time.perf_counter()
+            self.refresh(str(source['NAME']), str(replica['NAME']), options['pages'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Réplica atualizada em {time.perf_counter() - started:.2f}s ({replica["NAME"]})'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def refresh(self, source_path, replica_path, pages):
+        # O destino é atualizado in-place: conexões abertas na réplica passam a ver a nova cópia
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(replica_path)
+        try:
+            target.execute('PRAGMA busy_timeout = 20000')
+            source.backup(target, pages=pages)
+        finally:
+            target.close()
+            source.close()
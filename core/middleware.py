@@ -1,54 +1,276 @@
+import json
+import logging
+import random
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.contrib import messages
 
+from . import profiling, query_stats
+from .db_routers import STICKY_COOKIE, get_read_alias
+from .instrumentation import RequestTimings, install_template_timer
+from .models import RequestProfile
+from .permissions import compile_policy
+
+performance_logger = logging.getLogger('performance')
+
 
-class RoleBasedAccessMiddleware:
+class AsyncCapableMiddleware:
     """
-    Middleware para controlar acesso baseado em roles.
+    Base para middlewares que funcionam em WSGI e ASGI: em modo assíncrono
+    ``__call__`` delega para ``__acall__``, sem passar por uma thread.
     """
-    
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        
-        # URLs que requerem permissões específicas
-        self.admin_only_urls = [
-            '/admin/',
-            '/users/audit-logs/',
-        ]
-        
-        self.chefe_admin_only_urls = [
-            '/inventory/entrada/',
-        ]
-        
-        # URLs públicas (não requerem login)
-        self.public_urls = [
-            '/users/login/',
-            '/login/',
-        ]
-    
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
     def __call__(self, request):
-        # Verificar se é uma URL pública
-        if any(request.path.startswith(url) for url in self.public_urls):
-            response = self.get_response(request)
-            return response
-        
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+class RoleBasedAccessMiddleware(AsyncCapableMiddleware):
+    """
+    Middleware para controlar acesso baseado em roles.
+
+    As regras ficam em ``core.permissions.ROUTE_PERMISSIONS`` e são
+    verificadas em ``process_view`` com uma única consulta ao dicionário
+    compilado, pelo nome da rota resolvida.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.policy = compile_policy()
+        self.login_url = reverse('users:login')
+        # Arquivos estáticos não passam pela verificação
+        self.static_url = settings.STATIC_URL
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.path_info.startswith(self.static_url):
+            return None
+
+        rule = self.policy.get(request.resolver_match.view_name)
+        if rule is not None and rule.roles is None:
+            return None
+
         # Verificar se o usuário está autenticado
         if not request.user.is_authenticated:
-            if request.path != reverse('users:login'):
-                return redirect('users:login')
-        else:
-            # Verificar permissões específicas
-            if any(request.path.startswith(url) for url in self.admin_only_urls):
-                if not (request.user.role == 'admin'):
-                    messages.error(request, 'Acesso negado. Apenas administradores.')
-                    return redirect('core:dashboard')
-            
-            elif any(request.path.startswith(url) for url in self.chefe_admin_only_urls):
-                if not (request.user.role in ['chefe', 'admin']):
-                    messages.error(request, 'Acesso negado. Apenas chefes e administradores.')
-                    return redirect('core:dashboard')
-        
+            return redirect(self.login_url)
+
+        # Verificar permissões específicas
+        if rule is not None and request.user.role not in rule.roles:
+            messages.error(request, rule.message)
+            return redirect(rule.redirect_to)
+        return None
+
+
+class ServerTimingMiddleware(AsyncCapableMiddleware):
+    """
+    Mede SQL, templates e Python por requisição (opt-in via
+    ``SERVER_TIMING_ENABLED``) e devolve os valores no cabeçalho
+    ``Server-Timing`` e em uma linha de log JSON com o nome da rota.
+
+    Apenas uma fração ``SERVER_TIMING_SAMPLE_RATE`` das requisições é medida.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.sample_rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 1.0)
+        self.n_plus_one_threshold = getattr(settings, 'SERVER_TIMING_N_PLUS_ONE_THRESHOLD', 5)
+        install_template_timer()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = timings.activate()
+        try:
+            with self.wrap_connections(timings):
+                response = self.get_response(request)
+        finally:
+            RequestTimings.deactivate(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = timings.activate()
+        try:
+            with self.wrap_connections(timings):
+                response = await self.get_response(request)
+        finally:
+            RequestTimings.deactivate(token)
+        return self.finish(request, response, timings)
+
+    def sampled(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    @staticmethod
+    def wrap_connections(wrapper):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        return stack
+
+    def finish(self, request, response, timings):
+        summary = timings.summary(self.n_plus_one_threshold)
+        response['Server-Timing'] = self.format_header(summary)
+        resolver_match = getattr(request, 'resolver_match', None)
+        performance_logger.info(json.dumps({
+            'view': resolver_match.view_name if resolver_match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **summary,
+        }, ensure_ascii=False))
+        return response
+
+    @staticmethod
+    def format_header(summary):
+        desc = f"{summary['queries']} consultas"
+        if summary['duplicates']:
+            desc += f", {summary['duplicates']} duplicadas"
+        if summary['n_plus_one']:
+            desc += f", {len(summary['n_plus_one'])} N+1"
+        return ', '.join([
+            f'sql;dur={summary["sql_ms"]};desc="{desc}"',
+            f'tpl;dur={summary["template_ms"]}',
+            f'app;dur={summary["python_ms"]}',
+            f'total;dur={summary["total_ms"]}',
+        ])
+
+
+class QueryStatsMiddleware(AsyncCapableMiddleware):
+    """
+    Acumula estatísticas de SQL por fingerprint e rota (opt-in via
+    ``QUERY_STATS_ENABLED``); ver ``core.query_stats``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_STATS_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = query_stats.RequestQueryStats()
+        with ServerTimingMiddleware.wrap_connections(stats):
+            response = self.get_response(request)
+        self.merge(request, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = query_stats.RequestQueryStats()
+        with ServerTimingMiddleware.wrap_connections(stats):
+            response = await self.get_response(request)
+        if stats.entries:
+            # A gravação periódica acessa o banco
+            await sync_to_async(self.merge)(request, stats)
+        return response
+
+    @staticmethod
+    def merge(request, stats):
+        if stats.entries:
+            resolver_match = getattr(request, 'resolver_match', None)
+            query_stats.collector.merge(resolver_match.view_name if resolver_match else '-', stats)
+
+
+class ProfilerMiddleware(AsyncCapableMiddleware):
+    """
+    Perfila a requisição sob demanda, apenas para administradores:
+    ``?_profile=sampling|cprofile`` ou cabeçalho ``X-Profile``. O resultado
+    é gravado em ``RequestProfile`` e listado em ``/users/profiles/``.
+
+    Sob ASGI a requisição alterna entre o event loop e threads, então o
+    profiler só atua no modo síncrono (WSGI).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILER_ENABLED', True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.interval = getattr(settings, 'PROFILER_SAMPLE_INTERVAL', 0.001)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mode = request.GET.get('_profile') or request.headers.get('X-Profile')
+        if not mode or not (request.user.is_authenticated and request.user.is_admin):
+            return self.get_response(request)
+        if mode not in profiling.MODES:
+            mode = 'sampling'
+
+        response, data = profiling.profile_call(
+            lambda: self.get_response(request), mode=mode, interval=self.interval
+        )
+        resolver_match = getattr(request, 'resolver_match', None)
+        profile = RequestProfile.objects.create(
+            path=request.get_full_path()[:500],
+            view_name=resolver_match.view_name if resolver_match else '',
+            method=request.method,
+            status_code=response.status_code,
+            user=request.user,
+            mode=mode,
+            **data,
+        )
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+
+class ReadReplicaStickinessMiddleware(AsyncCapableMiddleware):
+    """
+    Após um POST (ou outro método de escrita) de um usuário autenticado,
+    as views de relatório leem do banco principal por
+    ``READ_REPLICA_STICKY_SECONDS`` segundos; ver ``core.db_routers``.
+    """
+
+    def __init__(self, get_response):
+        if get_read_alias() == 'default':
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.sticky_seconds = getattr(settings, 'READ_REPLICA_STICKY_SECONDS', 30)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
         response = self.get_response(request)
+        if self.is_write(request) and request.user.is_authenticated:
+            self.mark_sticky(response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.is_write(request) and await sync_to_async(lambda: request.user.is_authenticated)():
+            self.mark_sticky(response)
         return response
 
+    @staticmethod
+    def is_write(request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def mark_sticky(self, response):
+        response.set_cookie(
+            STICKY_COOKIE, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax'
+        )
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:04
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint_hash', models.CharField(max_length=40, verbose_name='Hash do Fingerprint')),
+                ('fingerprint', models.TextField(verbose_name='SQL Normalizado')),
+                ('view_name', models.CharField(max_length=200, verbose_name='Rota')),
+                ('calls', models.BigIntegerField(default=0, verbose_name='Execuções')),
+                ('total_time', models.FloatField(default=0, verbose_name='Tempo Total (ms)')),
+                ('max_time', models.FloatField(default=0, verbose_name='Tempo Máximo (ms)')),
+                ('rows', models.BigIntegerField(default=0, verbose_name='Linhas')),
+                ('first_seen', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Primeira Ocorrência')),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Última Ocorrência')),
+            ],
+            options={
+                'verbose_name': 'Estatística de Consulta',
+                'verbose_name_plural': 'Estatísticas de Consultas',
+                'ordering': ['-total_time'],
+                'indexes': [models.Index(fields=['-total_time'], name='querystat_total_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='querystat',
+            constraint=models.UniqueConstraint(fields=('fingerprint_hash', 'view_name'), name='querystat_fp_view_uniq'),
+        ),
+    ]
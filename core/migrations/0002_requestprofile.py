@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, verbose_name='URL')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='Rota')),
+                ('method', models.CharField(max_length=10, verbose_name='Método')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Status')),
+                ('mode', models.CharField(choices=[('sampling', 'Amostragem'), ('cprofile', 'cProfile')], max_length=10, verbose_name='Modo')),
+                ('duration_ms', models.FloatField(verbose_name='Duração (ms)')),
+                ('samples', models.PositiveIntegerField(default=0, verbose_name='Amostras')),
+                ('collapsed_stacks', models.TextField(blank=True, verbose_name='Pilhas Colapsadas')),
+                ('flamegraph_svg', models.TextField(blank=True, verbose_name='Flame Graph (SVG)')),
+                ('pstats_data', models.BinaryField(blank=True, null=True, verbose_name='Dump pstats')),
+                ('stats_report', models.TextField(blank=True, verbose_name='Relatório pstats')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data/Hora')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Perfil de Requisição',
+                'verbose_name_plural': 'Perfis de Requisições',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,3 +1,76 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class QueryStat(models.Model):
+    """
+    Estatísticas agregadas de uma consulta SQL normalizada (fingerprint)
+    por rota, acumuladas pelo coletor de ``core.query_stats``.
+    """
+    fingerprint_hash = models.CharField(max_length=40, verbose_name='Hash do Fingerprint')
+    fingerprint = models.TextField(verbose_name='SQL Normalizado')
+    view_name = models.CharField(max_length=200, verbose_name='Rota')
+    calls = models.BigIntegerField(default=0, verbose_name='Execuções')
+    total_time = models.FloatField(default=0, verbose_name='Tempo Total (ms)')
+    max_time = models.FloatField(default=0, verbose_name='Tempo Máximo (ms)')
+    rows = models.BigIntegerField(default=0, verbose_name='Linhas')
+    first_seen = models.DateTimeField(default=timezone.now, verbose_name='Primeira Ocorrência')
+    last_seen = models.DateTimeField(default=timezone.now, verbose_name='Última Ocorrência')
+
+    class Meta:
+        verbose_name = 'Estatística de Consulta'
+        verbose_name_plural = 'Estatísticas de Consultas'
+        ordering = ['-total_time']
+        constraints = [
+            models.UniqueConstraint(fields=['fingerprint_hash', 'view_name'], name='querystat_fp_view_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['-total_time'], name='querystat_total_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.view_name}: {self.fingerprint[:80]}'
+
+    @property
+    def mean_time(self):
+        return self.total_time / self.calls if self.calls else 0
+
+
+class RequestProfile(models.Model):
+    """
+    Perfil de execução de uma requisição, gravado pelo ``ProfilerMiddleware``.
+    """
+    MODE_CHOICES = [
+        ('sampling', 'Amostragem'),
+        ('cprofile', 'cProfile'),
+    ]
+
+    path = models.CharField(max_length=500, verbose_name='URL')
+    view_name = models.CharField(max_length=200, blank=True, verbose_name='Rota')
+    method = models.CharField(max_length=10, verbose_name='Método')
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Status')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='request_profiles',
+        verbose_name='Usuário'
+    )
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, verbose_name='Modo')
+    duration_ms = models.FloatField(verbose_name='Duração (ms)')
+    samples = models.PositiveIntegerField(default=0, verbose_name='Amostras')
+    collapsed_stacks = models.TextField(blank=True, verbose_name='Pilhas Colapsadas')
+    flamegraph_svg = models.TextField(blank=True, verbose_name='Flame Graph (SVG)')
+    pstats_data = models.BinaryField(null=True, blank=True, verbose_name='Dump pstats')
+    stats_report = models.TextField(blank=True, verbose_name='Relatório pstats')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Data/Hora')
+
+    class Meta:
+        verbose_name = 'Perfil de Requisição'
+        verbose_name_plural = 'Perfis de Requisições'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
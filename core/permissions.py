@@ -0,0 +1,110 @@
+"""
+Política de acesso por rota.
+
+As regras são declaradas por nome de URL (``namespace:nome``; ``namespace:*``
+vale para todas as rotas do namespace) e compiladas uma única vez em um
+dicionário indexado pelo ``view_name`` resolvido. Rotas sem regra exigem
+apenas usuário autenticado.
+"""
+from collections import namedtuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import URLPattern, URLResolver, get_resolver
+
+ADMIN = frozenset({'admin'})
+CHEFE_ADMIN = frozenset({'chefe', 'admin'})
+
+# roles=None: rota pública
+Rule = namedtuple('Rule', ['roles', 'message', 'redirect_to'])
+
+
+def public():
+    return Rule(None, '', '')
+
+
+def require_roles(roles, message=None, redirect_to='core:dashboard'):
+    if message is None:
+        message = (
+            'Acesso negado. Apenas administradores.' if roles == ADMIN
+            else 'Acesso negado. Apenas chefes e administradores.'
+        )
+    return Rule(frozenset(roles), message, redirect_to)
+
+
+ROUTE_PERMISSIONS = {
+    'users:login': public(),
+    'admin:*': require_roles(ADMIN),
+    'users:audit_logs': require_roles(ADMIN),
+    'users:query_stats': require_roles(ADMIN),
+    'users:profiles': require_roles(ADMIN),
+    'users:profile_detail': require_roles(ADMIN),
+    'users:profile_download': require_roles(ADMIN),
+    'users:setup_2fa': require_roles(
+        CHEFE_ADMIN, 'Apenas chefes e administradores podem configurar 2FA.'
+    ),
+    'inventory:stock_entry': require_roles(
+        CHEFE_ADMIN, 'Acesso negado. Apenas chefes e administradores podem registrar entradas.'
+    ),
+    'inventory:transfer_suggestions': require_roles(
+        CHEFE_ADMIN, 'Acesso negado. Apenas chefes e administradores podem planejar transferências.'
+    ),
+    'inventory:transfer_send_draft': require_roles(
+        CHEFE_ADMIN, 'Acesso negado. Apenas chefes e administradores podem enviar transferências sugeridas.'
+    ),
+    'inventory:transfer_discard_draft': require_roles(
+        CHEFE_ADMIN, 'Acesso negado. Apenas chefes e administradores podem descartar transferências sugeridas.'
+    ),
+    'inventory:api_bulk_price_update': require_roles(
+        CHEFE_ADMIN, 'Acesso negado. Apenas chefes e administradores podem alterar preços.'
+    ),
+    'inventory:patient_edit': require_roles(
+        ADMIN, 'Apenas administradores podem editar pacientes.', 'inventory:patients_list'
+    ),
+}
+
+
+def iter_view_names(resolver=None, namespace=''):
+    """Percorre o URLconf e gera o ``view_name`` de cada rota nomeada."""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from iter_view_names(pattern, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f'{namespace}{pattern.name}'
+
+
+def compile_policy(rules=None, resolver=None):
+    """
+    Expande as regras para ``{view_name: Rule}``.
+
+    Nomes exatos têm precedência sobre ``namespace:*``. Regras que não
+    correspondem a nenhuma rota geram ``ImproperlyConfigured``.
+    """
+    rules = ROUTE_PERMISSIONS if rules is None else rules
+    view_names = set(iter_view_names(resolver))
+    wildcards = {key[:-1]: rule for key, rule in rules.items() if key.endswith(':*')}
+
+    policy = {}
+    for view_name in view_names:
+        namespace = view_name.rpartition(':')[0]
+        while namespace:
+            if f'{namespace}:' in wildcards:
+                policy[view_name] = wildcards[f'{namespace}:']
+                break
+            namespace = namespace.rpartition(':')[0]
+
+    unknown = []
+    for key, rule in rules.items():
+        if key.endswith(':*'):
+            if not any(name.startswith(key[:-1]) for name in view_names):
+                unknown.append(key)
+        elif key in view_names:
+            policy[key] = rule
+        else:
+            unknown.append(key)
+    if unknown:
+        raise ImproperlyConfigured(
+            'Regras de acesso para rotas inexistentes: ' + ', '.join(sorted(unknown))
+        )
+    return policy
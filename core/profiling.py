@@ -0,0 +1,166 @@
+"""
+Profiler sob demanda de requisições individuais.
+
+Dois modos:
+
+* ``sampling``: uma thread amostra a pilha da thread da requisição via
+  ``sys._current_frames()`` a cada ``interval`` segundos e acumula pilhas
+  colapsadas (``a;b;c N``), renderizadas depois como flame graph SVG;
+* ``cprofile``: ``cProfile`` determinístico, guardado como dump ``pstats``
+  (``marshal``) e relatório em texto.
+"""
+import cProfile
+import hashlib
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from xml.sax.saxutils import escape
+
+MODES = ('sampling', 'cprofile')
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """Amostra a pilha de uma thread em intervalos fixos."""
+
+    def __init__(self, interval=0.001, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._base_depth = 0
+
+    def start(self):
+        # Quadros acima de quem chamou start() (servidor, WSGI) são descartados
+        frame = sys._getframe(2)
+        while frame is not None:
+            self._base_depth += 1
+            frame = frame.f_back
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+            self.stacks[';'.join(labels[self._base_depth:])] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+
+def run_cprofile(func):
+    """Executa ``func`` sob cProfile; retorna ``(resultado, dump_pstats, relatório)``."""
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        result = func()
+    finally:
+        profile.disable()
+    stream = io.StringIO()
+    # Stats assume os dados do profile (profile.stats fica vazio)
+    stats = pstats.Stats(profile, stream=stream)
+    stats.sort_stats('cumulative').print_stats(60)
+    return result, marshal.dumps(stats.stats), stream.getvalue()
+
+
+def render_flamegraph(stacks, width=1200, row_height=17, min_width=0.5):
+    """
+    Renderiza pilhas colapsadas (``{"a;b;c": n}``) como flame graph SVG.
+
+    Quadros mais estreitos que ``min_width`` pixels são omitidos.
+    """
+    root = {'children': {}, 'value': 0}
+    for stack, count in stacks.items():
+        node = root
+        node['value'] += count
+        for label in stack.split(';'):
+            node = node['children'].setdefault(label, {'children': {}, 'value': 0})
+            node['value'] += count
+
+    total = root['value'] or 1
+    rects = []
+    max_depth = 0
+
+    def walk(node, x, depth):
+        nonlocal max_depth
+        for label, child in sorted(node['children'].items()):
+            child_width = child['value'] / total * width
+            if child_width >= min_width:
+                rects.append((label, x, depth, child_width, child['value']))
+                max_depth = max(max_depth, depth)
+                walk(child, x, depth + 1)
+            x += child_width
+
+    walk(root, 0.0, 0)
+    height = (max_depth + 1) * row_height + 4
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+    ]
+    for label, x, depth, rect_width, value in rects:
+        y = height - (depth + 1) * row_height
+        digest = hashlib.md5(label.encode('utf-8')).digest()
+        color = f'rgb({205 + digest[0] % 50},{80 + digest[1] % 130},{digest[2] % 60})'
+        text = label[:max(int(rect_width / 7) - 1, 0)]
+        percent = value / total * 100
+        parts.append(
+            f'<g><title>{escape(label)} ({value} amostras, {percent:.1f}%)</title>'
+            f'<rect x="{x:.2f}" y="{y}" width="{rect_width:.2f}" height="{row_height - 1}" fill="{color}"/>'
+            + (f'<text x="{x + 3:.2f}" y="{y + row_height - 5}">{escape(text)}</text>' if len(text) > 2 else '')
+            + '</g>'
+        )
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def profile_call(func, mode='sampling', interval=0.001):
+    """
+    Executa ``func`` sob o profiler escolhido.
+
+    Retorna ``(resultado, dados)``, onde ``dados`` tem as chaves dos campos
+    de ``RequestProfile``.
+    """
+    started = time.perf_counter()
+    if mode == 'cprofile':
+        result, dump, report = run_cprofile(func)
+        data = {'pstats_data': dump, 'stats_report': report}
+    else:
+        profiler = SamplingProfiler(interval=interval)
+        profiler.start()
+        try:
+            result = func()
+        finally:
+            profiler.stop()
+        collapsed = profiler.collapsed()
+        data = {
+            'samples': profiler.samples,
+            'collapsed_stacks': collapsed,
+            'flamegraph_svg': render_flamegraph(profiler.stacks) if profiler.samples else '',
+        }
+    data['duration_ms'] = (time.perf_counter() - started) * 1000
+    return result, data
@@ -0,0 +1,140 @@
+"""
+Coletor de estatísticas de SQL por fingerprint e rota.
+
+Cada requisição acumula suas consultas localmente (``RequestQueryStats``,
+usado como ``execute_wrapper``) e, ao final, soma o resultado na tabela em
+memória do processo. A tabela tem tamanho limitado e é gravada em
+``QueryStat`` periodicamente ou quando enche.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .instrumentation import fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint_with_hash(sql):
+    normalized = fingerprint(sql)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest(), normalized
+
+
+class RequestQueryStats:
+    """Consultas de uma requisição, agrupadas por fingerprint."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            rowcount = getattr(context.get('cursor'), 'rowcount', -1)
+            entry = self.entries.get(sql)
+            if entry is None:
+                self.entries[sql] = [1, duration, duration, max(rowcount, 0)]
+            else:
+                entry[0] += 1
+                entry[1] += duration
+                entry[2] = max(entry[2], duration)
+                entry[3] += max(rowcount, 0)
+
+
+class QueryStatsCollector:
+    """
+    Tabela em memória ``(hash, rota) -> [fingerprint, execuções, tempo total,
+    tempo máximo, linhas]``, limitada a ``max_entries`` chaves.
+    """
+
+    def __init__(self, max_entries=2000, flush_interval=60.0):
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._table = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        return len(self._table)
+
+    def merge(self, view_name, request_stats):
+        """Soma as consultas de uma requisição; grava se a tabela encheu ou o intervalo passou."""
+        with self._lock:
+            for sql, (calls, total, maximum, rows) in request_stats.entries.items():
+                fp_hash, normalized = fingerprint_with_hash(sql)
+                key = (fp_hash, view_name)
+                entry = self._table.get(key)
+                if entry is None:
+                    self._table[key] = [normalized, calls, total, maximum, rows]
+                else:
+                    entry[1] += calls
+                    entry[2] += total
+                    entry[3] = max(entry[3], maximum)
+                    entry[4] += rows
+            due = (
+                len(self._table) >= self.max_entries
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Grava a tabela em ``QueryStat`` (uma leitura, um bulk_update e um bulk_create)."""
+        with self._lock:
+            table, self._table = self._table, {}
+            self._last_flush = time.monotonic()
+        if not table:
+            return 0
+
+        from .models import QueryStat
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                existing = {
+                    (stat.fingerprint_hash, stat.view_name): stat
+                    for stat in QueryStat.objects.select_for_update().filter(
+                        fingerprint_hash__in={fp_hash for fp_hash, _ in table}
+                    )
+                }
+                to_update = []
+                to_create = []
+                for (fp_hash, view_name), (normalized, calls, total, maximum, rows) in table.items():
+                    stat = existing.get((fp_hash, view_name))
+                    if stat is None:
+                        to_create.append(QueryStat(
+                            fingerprint_hash=fp_hash, fingerprint=normalized, view_name=view_name,
+                            calls=calls, total_time=total, max_time=maximum, rows=rows,
+                            first_seen=now, last_seen=now,
+                        ))
+                    else:
+                        stat.calls += calls
+                        stat.total_time += total
+                        stat.max_time = max(stat.max_time, maximum)
+                        stat.rows += rows
+                        stat.last_seen = now
+                        to_update.append(stat)
+                QueryStat.objects.bulk_update(
+                    to_update, ['calls', 'total_time', 'max_time', 'rows', 'last_seen'], batch_size=500
+                )
+                QueryStat.objects.bulk_create(to_create, batch_size=500)
+        except Exception:
+            logger.exception('Falha ao gravar %d estatísticas de consultas', len(table))
+            return 0
+        return len(table)
+
+
+collector = QueryStatsCollector(
+    max_entries=getattr(settings, 'QUERY_STATS_MAX_ENTRIES', 2000),
+    flush_interval=getattr(settings, 'QUERY_STATS_FLUSH_INTERVAL', 60.0),
+)
+atexit.register(collector.flush)
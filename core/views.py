@@ -2,14 +2,16 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.db.models import Sum, Count, Q, F
 from django.utils import timezone
+from .db_routers import use_read_replica
 from datetime import timedelta
 from inventory.models import (
     Substance, Batch, Inventory, StockMovement, Unit, 
-    TransferNew, Patient, PatientSession
+    TransferNew, Patient, PatientSession, StockForecast
 )
 
 
 @login_required
+@use_read_replica
 def dashboard_view(request):
     """Dashboard principal reformulado com estatísticas avançadas."""
     user = request.user
@@ -256,8 +258,12 @@ def alerts_view(request):
         validade__lt=timezone.now().date()
     ).select_related('substance', 'unit').order_by('validade')
     
+    # Abaixo do ponto de pedido (tabela recalculada pelo comando forecast_stock)
+    reorder_forecasts = StockForecast.objects.filter(repor=True).select_related('substance', 'unit')
+    
     context = {
         'low_stock_substances': low_stock_substances,
+        'reorder_forecasts': reorder_forecasts,
         'expiring_30_days': expiring_30_days,
         'expiring_60_days': expiring_60_days,
         'expiring_90_days': expiring_90_days,
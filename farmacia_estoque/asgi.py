@@ -3,14 +3,41 @@ ASGI config for farmacia_estoque project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Perfil ASGI (ver ``Procfile.asgi``): as APIs JSON usam as views assíncronas
+de ``inventory.views_async`` e os arquivos estáticos são servidos pelo
+WhiteNoise fora da pilha de middlewares do Django (o middleware do
+WhiteNoise é apenas síncrono e forçaria cada requisição a passar por uma
+thread).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
 import os
 
+from asgiref.wsgi import WsgiToAsgi
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'farmacia_estoque.settings')
+os.environ.setdefault('DJANGO_ASGI', 'True')
+
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+from whitenoise import WhiteNoise  # noqa: E402
+
+
+def _not_found(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'Not Found']
+
+
+static_application = WsgiToAsgi(
+    WhiteNoise(_not_found, root=settings.STATIC_ROOT, prefix=settings.STATIC_URL)
+)
+
 
-application = get_asgi_application()
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'].startswith(settings.STATIC_URL):
+        return await static_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -50,10 +52,20 @@ MIDDLEWARE = [
     'django_htmx.middleware.HtmxMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'core.middleware.RoleBasedAccessMiddleware',
+    'core.middleware.ProfilerMiddleware',
+    'core.middleware.ReadReplicaStickinessMiddleware',
+    'users.middleware.AuditContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Perfil ASGI (farmacia_estoque/asgi.py define DJANGO_ASGI): estáticos são
+# servidos pelo WhiteNoise direto no ASGI e as APIs JSON usam views async
+ASGI_PROFILE = config('DJANGO_ASGI', default=False, cast=bool)
+ASYNC_API_VIEWS = config('ASYNC_API_VIEWS', default=ASGI_PROFILE, cast=bool)
+if ASGI_PROFILE:
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
 ROOT_URLCONF = 'farmacia_estoque.urls'
 
 TEMPLATES = [
@@ -75,13 +87,54 @@ TEMPLATES = [
 WSGI_APPLICATION = 'farmacia_estoque.wsgi.application'
 
 # Database
+# SQLite com WAL, pragmas ajustadas e BEGIN IMMEDIATE (core/backends/sqlite3)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=20000, cast=int),
+            },
+        },
     }
 }
 
+# Réplica de leitura para relatórios (views com core.db_routers.use_read_replica).
+# DATABASE_REPLICA_URL aponta para outra conexão (ex.: réplica Postgres);
+# SQLITE_REPLICA=True usa uma cópia local atualizada por refresh_sqlite_replica.
+if config('DATABASE_REPLICA_URL', default=''):
+    DATABASES['replica'] = dj_database_url.parse(config('DATABASE_REPLICA_URL'))
+elif config('SQLITE_REPLICA', default=False, cast=bool):
+    DATABASES['replica'] = {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pragmas': {'query_only': 1}},
+    }
+if 'replica' in DATABASES:
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+READ_DATABASE_ALIAS = 'replica' if 'replica' in DATABASES else 'default'
+READ_REPLICA_STICKY_SECONDS = config('READ_REPLICA_STICKY_SECONDS', default=30, cast=int)
+
+# Banco separado para a auditoria (tabela append-only, gravada em segundo plano).
+# Após configurar: python manage.py migrate --database=ledger
+if config('LEDGER_DATABASE_URL', default=''):
+    DATABASES['ledger'] = dj_database_url.parse(config('LEDGER_DATABASE_URL'))
+elif config('SQLITE_LEDGER', default=False, cast=bool):
+    DATABASES['ledger'] = {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_ledger.sqlite3',
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+DATABASE_ROUTERS = ['core.db_routers.LedgerRouter', 'core.db_routers.ReadReplicaRouter']
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -146,6 +199,76 @@ CSRF_COOKIE_SAMESITE = None
 SESSION_COOKIE_AGE = 3600 * 8  # 8 hours
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
+# Auditoria de alterações (gravação em lote)
+AUDIT_MODELS = [
+    'inventory.Substance',
+    'inventory.Batch',
+    'inventory.Patient',
+    'inventory.PatientSession',
+]
+AUDIT_ASYNC_FLUSH = config('AUDIT_ASYNC_FLUSH', default=True, cast=bool)
+AUDIT_FLUSH_INTERVAL = config('AUDIT_FLUSH_INTERVAL', default=2.0, cast=float)  # segundos
+AUDIT_BATCH_SIZE = config('AUDIT_BATCH_SIZE', default=200, cast=int)
+AUDIT_RETENTION_DAYS = config('AUDIT_RETENTION_DAYS', default=180, cast=int)
+AUDIT_ARCHIVE_DIR = config('AUDIT_ARCHIVE_DIR', default=str(BASE_DIR / 'audit_archive'))
+
+# Instrumentação de desempenho (cabeçalho Server-Timing + log 'performance')
+SERVER_TIMING_ENABLED = config('SERVER_TIMING_ENABLED', default=False, cast=bool)
+SERVER_TIMING_SAMPLE_RATE = config('SERVER_TIMING_SAMPLE_RATE', default=1.0, cast=float)
+SERVER_TIMING_N_PLUS_ONE_THRESHOLD = config('SERVER_TIMING_N_PLUS_ONE_THRESHOLD', default=5, cast=int)
+
+# Estatísticas de SQL por fingerprint (página /users/query-stats/)
+QUERY_STATS_ENABLED = config('QUERY_STATS_ENABLED', default=False, cast=bool)
+QUERY_STATS_FLUSH_INTERVAL = config('QUERY_STATS_FLUSH_INTERVAL', default=60.0, cast=float)  # segundos
+QUERY_STATS_MAX_ENTRIES = config('QUERY_STATS_MAX_ENTRIES', default=2000, cast=int)
+
+# Profiler sob demanda (?_profile=sampling|cprofile, apenas administradores)
+PROFILER_ENABLED = config('PROFILER_ENABLED', default=True, cast=bool)
+PROFILER_SAMPLE_INTERVAL = config('PROFILER_SAMPLE_INTERVAL', default=0.001, cast=float)  # segundos
+
+# Relatórios em segundo plano (comando run_report_worker)
+REPORT_CACHE_DIR = config('REPORT_CACHE_DIR', default=str(BASE_DIR / 'report_cache'))
+REPORT_CACHE_MAX_AGE = config('REPORT_CACHE_MAX_AGE', default=86400, cast=int)  # segundos
+REPORT_JOB_TIMEOUT = config('REPORT_JOB_TIMEOUT', default=1800, cast=int)  # segundos
+
+# PDF dos termos de responsabilidade (arquivos deduplicados por conteúdo)
+TERM_PDF_DIR = config('TERM_PDF_DIR', default=str(BASE_DIR / 'term_pdfs'))
+TERM_PDF_FONT = config('TERM_PDF_FONT', default='')  # caminho de uma fonte .ttf (opcional)
+TERM_PDF_WORKERS = config('TERM_PDF_WORKERS', default=4, cast=int)  # comando print_terms
+
+# Reservas de estoque: liberadas este número de horas após o fim do dia agendado
+RESERVATION_GRACE_HOURS = config('RESERVATION_GRACE_HOURS', default=12, cast=int)
+
+# Previsão de consumo e ponto de pedido (comando forecast_stock, rodar diariamente)
+FORECAST_HISTORY_DAYS = config('FORECAST_HISTORY_DAYS', default=180, cast=int)
+FORECAST_SMOOTHING = config('FORECAST_SMOOTHING', default=0.1, cast=float)  # alfa da suavização exponencial
+FORECAST_LEAD_TIME_DAYS = config('FORECAST_LEAD_TIME_DAYS', default=7, cast=int)  # prazo de reposição
+FORECAST_SERVICE_Z = config('FORECAST_SERVICE_Z', default=1.65, cast=float)  # 1,65 ~ 95% de nível de serviço
+FORECAST_MAX_COVER_DAYS = config('FORECAST_MAX_COVER_DAYS', default=3650, cast=int)
+
+# Planejador de transferências entre unidades (comando plan_rebalancing)
+REBALANCE_HORIZON_DAYS = config('REBALANCE_HORIZON_DAYS', default=30, cast=int)
+REBALANCE_HISTORY_DAYS = config('REBALANCE_HISTORY_DAYS', default=60, cast=int)  # consumo recente
+REBALANCE_MIN_SHELF_DAYS = config('REBALANCE_MIN_SHELF_DAYS', default=7, cast=int)  # validade mínima para transferir
+REBALANCE_MIN_QUANTITY = config('REBALANCE_MIN_QUANTITY', default=1, cast=int)
+
+# Previsão de perdas por vencimento (consumo recente usado na projeção)
+EXPIRY_FORECAST_HISTORY_DAYS = config('EXPIRY_FORECAST_HISTORY_DAYS', default=90, cast=int)
+
+# Simulação de políticas de estoque mínimo (comando simulate_min_stock)
+SIMULATION_HISTORY_DAYS = config('SIMULATION_HISTORY_DAYS', default=730, cast=int)
+SIMULATION_DEFAULT_SHELF_DAYS = config('SIMULATION_DEFAULT_SHELF_DAYS', default=180, cast=int)  # sem lotes no histórico
+SIMULATION_MAX_STOCKOUT_RATE = config('SIMULATION_MAX_STOCKOUT_RATE', default=0.01, cast=float)  # fração de dias em ruptura
+
+# Classificação ABC/XYZ do catálogo (comando classify_catalog, rodar semanalmente)
+CLASSIFICATION_HISTORY_DAYS = config('CLASSIFICATION_HISTORY_DAYS', default=365, cast=int)
+CLASSIFICATION_ABC_LIMITS = (0.8, 0.95)  # participação acumulada no valor consumido (A, B)
+CLASSIFICATION_XYZ_LIMITS = (0.5, 1.0)  # coeficiente de variação semanal (X, Y)
+
+# Relatório de adesão ao tratamento (risco de abandono)
+ADHERENCE_DEFAULT_INTERVAL_DAYS = config('ADHERENCE_DEFAULT_INTERVAL_DAYS', default=7, cast=int)  # cursos com uma sessão
+ADHERENCE_RISK_FACTORS = (1.5, 3.0)  # dias sem sessão / intervalo médio (atenção, abandono)
+
 # Login URLs
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -0,0 +1,149 @@
+"""
+Adesão ao tratamento: sessões realizadas por curso (paciente × protocolo)
+contra ``ProtocolTemplate.default_sessions``.
+
+Uma única consulta sobre ``PatientSession`` calcula, com funções de janela
+particionadas por (paciente, protocolo):
+
+- ``ROW_NUMBER`` em ordem decrescente de data, para ficar só com a última
+  sessão de cada curso (filtro sobre a janela, feito pelo banco);
+- ``LAG`` da data, o intervalo entre a última sessão e a anterior;
+- ``COUNT`` e ``MIN``, as sessões realizadas e o início do curso.
+
+Sobre essas colunas, a mesma consulta anota a taxa de conclusão, o
+intervalo médio ((última − primeira) / (realizadas − 1)) e o risco de
+abandono: dias sem sessão comparados com o intervalo médio do próprio curso
+(ou ``ADHERENCE_DEFAULT_INTERVAL_DAYS`` quando só houve uma sessão). Assim o
+filtro por risco, a ordenação, a paginação e os totais ficam no banco; só
+as linhas da página viram dicionários (``course``).
+"""
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Avg, Case, Count, F, FloatField, Func, IntegerField, Min, Q, Value, When, Window
+from django.db.models.functions import Cast, Coalesce, Greatest, Lag, Least, NullIf, RowNumber
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+RISK_CHOICES = [
+    ('concluido', 'Concluído'),
+    ('em_dia', 'Em dia'),
+    ('atencao', 'Atenção'),
+    ('abandono', 'Provável abandono'),
+]
+RISK_LABELS = dict(RISK_CHOICES)
+# Ordem do relatório (coluna ``prioridade``): maior risco primeiro
+RISK_ORDER = [risco for risco, _ in reversed(RISK_CHOICES)]
+
+EPOCH = date(2000, 1, 1)
+
+
+class DayNumber(Func):
+    """Dias desde ``EPOCH``: diferença de datas como inteiro em qualquer banco."""
+    output_field = IntegerField()
+    template = "(%(expressions)s - DATE '2000-01-01')"
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="CAST(julianday(%(expressions)s) - julianday('2000-01-01') AS INTEGER)",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template="(TO_DAYS(%(expressions)s) - TO_DAYS('2000-01-01'))", **extra_context
+        )
+
+
+def courses_queryset(unit_id=None, protocol_id=None, risco=None, today=None):
+    """
+    Última sessão de cada curso, com as colunas das janelas, a conclusão e a
+    prioridade (índice do risco em ``RISK_ORDER``), do maior risco (mais tempo
+    parado em relação ao ritmo) para os concluídos.
+    """
+    from .models import PatientSession
+
+    today = today or timezone.localdate()
+    default_interval = getattr(settings, 'ADHERENCE_DEFAULT_INTERVAL_DAYS', 7)
+    attention, dropout = getattr(settings, 'ADHERENCE_RISK_FACTORS', (1.5, 3.0))
+
+    sessions = PatientSession.objects.filter(protocol__isnull=False).exclude(payment_status='cancelado')
+    if unit_id:
+        sessions = sessions.filter(unit_id=unit_id)
+    if protocol_id:
+        sessions = sessions.filter(protocol_id=protocol_id)
+
+    course = [F('patient_id'), F('protocol_id')]
+    sessions = sessions.annotate(
+        ordem=Window(RowNumber(), partition_by=course, order_by=[F('session_date').desc(), F('created_at').desc()]),
+        anterior=Window(Lag('session_date'), partition_by=course, order_by=[F('session_date').asc(), F('created_at').asc()]),
+        realizadas=Window(Count('id'), partition_by=course),
+        inicio=Window(Min('session_date'), partition_by=course),
+    ).annotate(
+        esperadas=Greatest(Coalesce('protocol__default_sessions', 1), 1),
+        dias_sem_sessao=Value((today - EPOCH).days) - DayNumber('session_date'),
+        intervalo_medio=Case(
+            When(realizadas__gt=1, then=(
+                Cast(DayNumber('session_date') - DayNumber('inicio'), FloatField()) / (F('realizadas') - 1)
+            )),
+            output_field=FloatField(),
+        ),
+    ).annotate(
+        conclusao=Least(Cast('realizadas', FloatField()) * 100.0 / F('esperadas'), 100.0),
+        # Intervalo médio zero (sessões no mesmo dia) conta como desconhecido
+        referencia=Greatest(Coalesce(NullIf('intervalo_medio', 0.0), float(default_interval)), 1.0),
+    ).annotate(
+        prioridade=Case(
+            When(GreaterThanOrEqual(F('realizadas'), F('esperadas')), then=Value(RISK_ORDER.index('concluido'))),
+            When(GreaterThanOrEqual(F('dias_sem_sessao'), F('referencia') * dropout), then=Value(RISK_ORDER.index('abandono'))),
+            When(GreaterThanOrEqual(F('dias_sem_sessao'), F('referencia') * attention), then=Value(RISK_ORDER.index('atencao'))),
+            default=Value(RISK_ORDER.index('em_dia')),
+            output_field=IntegerField(),
+        ),
+    ).filter(ordem=1)
+    if risco in RISK_LABELS:
+        sessions = sessions.filter(prioridade=RISK_ORDER.index(risco))
+    return sessions.values(
+        'patient_id', 'patient__codigo', 'patient__nome', 'protocol_id', 'protocol__name',
+        'unit__nome', 'session_date', 'anterior', 'realizadas', 'inicio',
+        'esperadas', 'dias_sem_sessao', 'intervalo_medio', 'conclusao', 'prioridade',
+    ).order_by('prioridade', '-dias_sem_sessao', 'patient__nome', 'protocol__name', 'protocol_id')
+
+
+def course(row):
+    """Linha de ``courses_queryset`` no formato do relatório e da API."""
+    ultima = row['session_date']
+    risco = RISK_ORDER[row['prioridade']]
+    return {
+        'patient_id': str(row['patient_id']),
+        'paciente_codigo': row['patient__codigo'],
+        'paciente': row['patient__nome'],
+        'protocol_id': str(row['protocol_id']),
+        'protocolo': row['protocol__name'],
+        'unidade': row['unit__nome'],
+        'realizadas': row['realizadas'],
+        'esperadas': row['esperadas'],
+        'conclusao': round(row['conclusao'], 1),
+        'inicio': row['inicio'],
+        'ultima_sessao': ultima,
+        'intervalo_ultimo': (ultima - row['anterior']).days if row['anterior'] else None,
+        'intervalo_medio': round(row['intervalo_medio'], 1) if row['intervalo_medio'] is not None else None,
+        'dias_sem_sessao': row['dias_sem_sessao'],
+        'risco': risco,
+        'risco_label': RISK_LABELS[risco],
+    }
+
+
+def summarize(courses):
+    """Totais por risco e taxa média de conclusão (agregação sobre ``courses_queryset``)."""
+    totals = courses.order_by().aggregate(
+        cursos=Count('id'),
+        conclusao_media=Avg('conclusao'),
+        **{risco: Count('id', filter=Q(prioridade=i)) for i, risco in enumerate(RISK_ORDER)},
+    )
+    return {
+        'cursos': totals['cursos'],
+        'por_risco': {risco: totals[risco] for risco, _ in RISK_CHOICES},
+        'conclusao_media': round(totals['conclusao_media'] or 0, 1),
+    }
@@ -4,8 +4,11 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from .models import (
     Unit, Substance, SubstanceUnitConfig, Patient, Batch, 
-    Inventory, StockMovement, UnitTransfer
+    Inventory, StockMovement, UnitTransfer, SubstancePriceHistory, ReportJob,
+    ControlledSubstanceRule, StockReservation, StockAvailability, StockForecast,
+    SubstanceClassification
 )
+from . import controlled, reservations
 
 
 @admin.register(Unit)
@@ -36,15 +39,15 @@ class UnitAdmin(admin.ModelAdmin):
 class SubstanceAdmin(admin.ModelAdmin):
     list_display = [
         'nome_comum', 'nome_comercial', 'concentracao', 'apresentacao', 
-        'unidade', 'estoque_total_display', 'estoque_minimo_default', 'status_estoque'
+        'unidade', 'classe_controle', 'estoque_total_display', 'estoque_minimo_default', 'status_estoque'
     ]
-    list_filter = ['unidade', 'created_at']
+    list_filter = ['classe_controle', 'unidade', 'created_at']
     search_fields = ['nome_comum', 'nome_comercial', 'concentracao']
-    readonly_fields = ['created_at', 'updated_at', 'created_by']
+    readonly_fields = ['classe_controle', 'created_at', 'updated_at', 'created_by']
     
     fieldsets = (
         ('Informações Básicas', {
-            'fields': ('nome_comum', 'nome_comercial', 'concentracao', 'apresentacao', 'unidade')
+            'fields': ('nome_comum', 'nome_comercial', 'concentracao', 'apresentacao', 'unidade', 'classe_controle')
         }),
         ('Configurações de Alerta', {
             'fields': ('estoque_minimo_default', 'dias_alerta_vencimento')
@@ -79,6 +82,21 @@ class SubstanceAdmin(admin.ModelAdmin):
     status_estoque.short_description = 'Status'
 
 
+@admin.register(SubstancePriceHistory)
+class SubstancePriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ['substance', 'preco_anterior', 'preco_novo', 'vigente_desde', 'alterado_por']
+    list_filter = ['vigente_desde']
+    search_fields = ['substance__nome_comum', 'alterado_por__nome']
+    readonly_fields = ['substance', 'preco_anterior', 'preco_novo', 'vigente_desde', 'alterado_por', 'created_at']
+    date_hierarchy = 'vigente_desde'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(SubstanceUnitConfig)
 class SubstanceUnitConfigAdmin(admin.ModelAdmin):
     list_display = ['substance', 'unit', 'estoque_minimo', 'ativo']
@@ -155,12 +173,12 @@ class BatchAdmin(admin.ModelAdmin):
 @admin.register(Inventory)
 class InventoryAdmin(admin.ModelAdmin):
     list_display = [
-        'substance', 'batch', 'unit', 'quantity_on_hand', 
+        'substance', 'batch', 'unit', 'quantity_on_hand', 'quantity_reserved',
         'status_estoque', 'updated_at'
     ]
     list_filter = ['unit', 'substance', 'updated_at']
     search_fields = ['substance__nome_comum', 'batch__lote', 'unit__nome']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['quantity_reserved', 'created_at', 'updated_at']
     
     def status_estoque(self, obj):
         if obj.estoque_baixo:
@@ -179,7 +197,7 @@ class StockMovementAdmin(admin.ModelAdmin):
         'data_hora', 'tipo', 'substance', 'batch', 'unit', 
         'quantidade', 'user', 'paciente_nome'
     ]
-    list_filter = ['tipo', 'unit', 'substance', 'data_hora']
+    list_filter = ['tipo', 'substance__classe_controle', 'unit', 'substance', 'data_hora']
     search_fields = [
         'substance__nome_comum', 'batch__lote', 'paciente_nome', 
         'user__username', 'motivo'
@@ -243,3 +261,94 @@ class UnitTransferAdmin(admin.ModelAdmin):
         }),
     )
 
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ['report_type', 'status', 'requested_by', 'created_at', 'finished_at']
+    list_filter = ['report_type', 'status', 'created_at']
+    readonly_fields = [
+        'report_type', 'filters', 'cache_key', 'result_file', 'error',
+        'requested_by', 'created_at', 'started_at', 'finished_at'
+    ]
+
+
+@admin.register(ControlledSubstanceRule)
+class ControlledSubstanceRuleAdmin(admin.ModelAdmin):
+    list_display = ['padrao', 'classe', 'prioridade', 'ativo', 'updated_at']
+    list_filter = ['classe', 'ativo']
+    search_fields = ['padrao', 'observacoes']
+    actions = ['reclassificar_substancias']
+    
+    @admin.action(description='Reclassificar todas as substâncias')
+    def reclassificar_substancias(self, request, queryset):
+        changed = controlled.reclassify_all()
+        self.message_user(request, f'{len(changed)} substância(s) reclassificada(s).')
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['paciente', 'substance', 'batch', 'unit', 'quantidade', 'data_agendada', 'status', 'expira_em']
+    list_filter = ['status', 'unit', 'data_agendada']
+    search_fields = ['paciente__nome', 'substance__nome_comum', 'batch__lote']
+    readonly_fields = [
+        'paciente', 'protocolo', 'unit', 'substance', 'batch', 'quantidade', 'data_agendada',
+        'expira_em', 'status', 'session', 'movimento', 'criado_por', 'created_at', 'updated_at'
+    ]
+    actions = ['cancelar_reservas']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Cancelar reservas selecionadas')
+    def cancelar_reservas(self, request, queryset):
+        count = reservations.cancel_reservations(queryset)
+        self.message_user(request, f'{count} reserva(s) cancelada(s).')
+
+
+@admin.register(StockAvailability)
+class StockAvailabilityAdmin(admin.ModelAdmin):
+    list_display = ['substance', 'unit', 'on_hand', 'reserved', 'disponivel', 'updated_at']
+    list_filter = ['unit']
+    search_fields = ['substance__nome_comum']
+    readonly_fields = ['substance', 'unit', 'on_hand', 'reserved', 'updated_at']
+    
+    def disponivel(self, obj):
+        return obj.available
+    disponivel.short_description = 'Disponível'
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StockForecast)
+class StockForecastAdmin(admin.ModelAdmin):
+    list_display = [
+        'substance', 'unit', 'consumo_medio_diario', 'ponto_pedido', 'disponivel',
+        'dias_cobertura', 'data_ruptura', 'repor'
+    ]
+    list_filter = ['repor', 'unit']
+    search_fields = ['substance__nome_comum']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SubstanceClassification)
+class SubstanceClassificationAdmin(admin.ModelAdmin):
+    list_display = [
+        'substance', 'unit', 'classe_abc', 'classe_xyz', 'valor_consumo', 'valor_faturado',
+        'participacao_acumulada', 'coeficiente_variacao', 'calculado_em'
+    ]
+    list_filter = ['classe_abc', 'classe_xyz', 'unit']
+    search_fields = ['substance__nome_comum']
+    ordering = ['unit__nome', 'classe_abc', '-valor_consumo']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from . import controlled, protocol_matrix, reservations
+        from .models import Substance, term_template_resolver
+        controlled.connect_signals()
+        protocol_matrix.connect_signals()
+        reservations.connect_signals()
+        term_template_resolver.connect_signals(Substance)
@@ -0,0 +1,175 @@
+"""
+Classificação ABC/XYZ do catálogo por (substância, unidade).
+
+Duas consultas agrupadas trazem o histórico (``CLASSIFICATION_HISTORY_DAYS``):
+
+- saídas de ``StockMovement`` por semana: quantidade e valor consumido
+  (quantidade × ``Batch.preco_unitario``);
+- ``SessionSubstance`` por (substância, unidade da sessão): valor faturado.
+
+As semanas viram uma matriz ``séries × semanas`` (numpy) e o resto é
+vetorizado:
+
+- ABC: dentro de cada unidade, as séries em ordem decrescente de valor
+  consumido são A enquanto a participação acumulada anterior está abaixo de
+  ``CLASSIFICATION_ABC_LIMITS[0]``, B até ``[1]`` e C depois;
+- XYZ: coeficiente de variação semanal (desvio / média, desde a primeira
+  semana com consumo) até ``CLASSIFICATION_XYZ_LIMITS[0]`` é X, até ``[1]``
+  é Y, acima é Z.
+
+Séries com estoque e sem consumo no período entram como CZ. O resultado
+substitui a tabela ``SubstanceClassification`` (comando ``classify_catalog``).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateField, DecimalField, F, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+
+def load_history(start_date, end_date):
+    """
+    (chaves, quantidades, valores, faturado): ``quantidades`` é a matriz
+    ``séries × semanas``; ``valores`` e ``faturado`` são vetores por série.
+    """
+    from .models import SessionSubstance, StockAvailability, StockMovement
+
+    week_zero = start_date - timedelta(days=start_date.weekday())
+    weeks = (end_date - week_zero).days // 7 + 1
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+
+    rows = StockMovement.objects.filter(
+        tipo='saida', data_hora__gte=start, data_hora__lt=end
+    ).annotate(semana=TruncWeek('data_hora', output_field=DateField())).values_list(
+        'substance_id', 'unit_id', 'semana'
+    ).annotate(
+        total=Sum('quantidade'),
+        valor=Sum(F('quantidade') * F('batch__preco_unitario'), output_field=DecimalField()),
+    ).order_by()
+
+    index = {}
+    positions, offsets, totals, values = [], [], [], []
+    for substance_id, unit_id, semana, total, valor in rows:
+        positions.append(index.setdefault((substance_id, unit_id), len(index)))
+        offsets.append((semana - week_zero).days // 7)
+        totals.append(float(total))
+        values.append(float(valor or 0))
+
+    billed_rows = SessionSubstance.objects.filter(
+        session__session_date__gte=start_date, session__session_date__lte=end_date
+    ).values_list('substance_id', 'session__unit_id').annotate(total=Sum('total_price')).order_by()
+    billed_rows = [(key, float(total or 0)) for *key, total in billed_rows]
+    # Séries faturadas ou com estoque, mesmo sem saídas no período
+    for key, _ in billed_rows:
+        index.setdefault(tuple(key), len(index))
+    for key in StockAvailability.objects.filter(on_hand__gt=0).values_list('substance_id', 'unit_id'):
+        index.setdefault(key, len(index))
+
+    quantities = np.zeros((len(index), weeks))
+    consumed_value = np.zeros(len(index))
+    if positions:
+        positions = np.array(positions)
+        np.add.at(quantities, (positions, np.array(offsets)), np.array(totals))
+        np.add.at(consumed_value, positions, np.array(values))
+    billed = np.zeros(len(index))
+    for key, total in billed_rows:
+        billed[index[tuple(key)]] += total
+    return list(index), quantities, consumed_value, billed
+
+
+def abc_classes(units, values, limits):
+    """Classe ABC de cada série, ranqueando dentro da unidade (``units``: código por série)."""
+    classes = np.full(len(values), 'C')
+    if not len(values):
+        return classes, np.zeros(0)
+    order = np.lexsort((-values, units))
+    sorted_units, sorted_values = units[order], values[order]
+    # Soma acumulada dentro de cada unidade: acumulado global menos o acumulado até o início do grupo
+    starts = np.r_[0, np.flatnonzero(sorted_units[1:] != sorted_units[:-1]) + 1]
+    group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(order)]))
+    running = np.cumsum(sorted_values)
+    offset = np.r_[0.0, running][starts][group]
+    unit_total = np.add.reduceat(sorted_values, starts)[group]
+    share = np.divide(running - offset, unit_total, out=np.zeros(len(order)), where=unit_total > 0)
+    share_before = share - np.divide(sorted_values, unit_total, out=np.zeros(len(order)), where=unit_total > 0)
+
+    sorted_classes = np.select(
+        [sorted_values <= 0, share_before < limits[0], share_before < limits[1]], ['C', 'A', 'B'], 'C'
+    )
+    classes[order] = sorted_classes
+    cumulative = np.empty(len(order))
+    cumulative[order] = share
+    return classes, cumulative
+
+
+def xyz_classes(quantities, limits):
+    """
+    (classe XYZ, coeficiente de variação) de cada linha, contando só a partir
+    da primeira semana com consumo (itens novos não parecem irregulares);
+    sem consumo é Z com CV nulo.
+    """
+    if not quantities.size:
+        return np.full(len(quantities), 'Z'), np.full(len(quantities), np.nan)
+    active = np.arange(quantities.shape[1]) >= (quantities > 0).argmax(axis=1)[:, None]
+    weeks = active.sum(axis=1)
+    mean = np.where(active, quantities, 0.0).sum(axis=1) / weeks
+    std = np.sqrt(np.where(active, (quantities - mean[:, None]) ** 2, 0.0).sum(axis=1) / weeks)
+    consuming = mean > 1e-9
+    cv = np.divide(std, mean, out=np.full(len(mean), np.nan), where=consuming)
+    classes = np.select([~consuming, cv <= limits[0], cv <= limits[1]], ['Z', 'X', 'Y'], 'Z')
+    return classes, cv
+
+
+def _decimal(value, places):
+    return Decimal(str(round(float(value), places)))
+
+
+def compute_classifications(today=None, days=None):
+    """Lista de ``SubstanceClassification`` (não salvos) para todas as séries."""
+    from .models import SubstanceClassification
+
+    today = today or timezone.localdate()
+    days = days or getattr(settings, 'CLASSIFICATION_HISTORY_DAYS', 365)
+    abc_limits = getattr(settings, 'CLASSIFICATION_ABC_LIMITS', (0.8, 0.95))
+    xyz_limits = getattr(settings, 'CLASSIFICATION_XYZ_LIMITS', (0.5, 1.0))
+
+    end_date = today - timedelta(days=1)
+    keys, quantities, consumed_value, billed = load_history(end_date - timedelta(days=days - 1), end_date)
+    unit_codes = np.unique([str(unit_id) for _, unit_id in keys], return_inverse=True)[1] if keys else np.zeros(0)
+    abc, cumulative = abc_classes(unit_codes, consumed_value, abc_limits)
+    xyz, cv = xyz_classes(quantities, xyz_limits)
+    totals = quantities.sum(axis=1)
+
+    now = timezone.now()
+    return [
+        SubstanceClassification(
+            substance_id=substance_id,
+            unit_id=unit_id,
+            classe_abc=str(abc[i]),
+            classe_xyz=str(xyz[i]),
+            quantidade_consumida=_decimal(totals[i], 2),
+            valor_consumo=_decimal(consumed_value[i], 2),
+            valor_faturado=_decimal(billed[i], 2),
+            participacao_acumulada=_decimal(cumulative[i] * 100, 2),
+            coeficiente_variacao=None if np.isnan(cv[i]) else _decimal(min(cv[i], 99999), 3),
+            dias_historico=days,
+            calculado_em=now,
+        )
+        for i, (substance_id, unit_id) in enumerate(keys)
+    ]
+
+
+def refresh_classifications(today=None, days=None):
+    """Recalcula e substitui a tabela ``SubstanceClassification``; retorna as classificações."""
+    from .models import SubstanceClassification
+
+    classifications = compute_classifications(today=today, days=days)
+    with transaction.atomic():
+        SubstanceClassification.objects.all().delete()
+        SubstanceClassification.objects.bulk_create(classifications, batch_size=500)
+    return classifications
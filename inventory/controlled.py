@@ -0,0 +1,90 @@
+"""
+Classificação de substâncias controladas.
+
+A classe é persistida em ``Substance.classe_controle`` (indexada) a partir
+das regras de ``ControlledSubstanceRule``. Assim, listagens e relatórios
+filtram no banco (``controlled_q``) em vez de varrer nomes em Python.
+
+As regras ficam em cache no processo, marcado com a versão compartilhada
+``CacheVersion('controlled_rules')``: salvar ou excluir uma regra incrementa
+a versão após o commit e cada processo recarrega as regras quando ela muda.
+"""
+from threading import Lock
+
+from django.db.models import Q
+
+CONTROLLED_CLASSES = [
+    ('retencao_receita', 'Retenção de Receita'),
+    ('portaria_344', 'Portaria 344/98'),
+]
+
+VERSION_NAME = 'controlled_rules'
+
+_rules = None
+_rules_lock = Lock()
+
+
+def controlled_q(prefix=''):
+    """Filtro de substâncias controladas; ``prefix`` ex.: ``'substance__'``."""
+    return Q(**{f'{prefix}classe_controle__gt': ''})
+
+
+def get_rules():
+    """Regras ativas (padrão em minúsculas, classe), em ordem de prioridade."""
+    global _rules
+    from .models import CacheVersion, ControlledSubstanceRule
+
+    version = CacheVersion.current(VERSION_NAME)
+    with _rules_lock:
+        if _rules is None or _rules[0] != version:
+            _rules = (version, [
+                (padrao.lower(), classe)
+                for padrao, classe in ControlledSubstanceRule.objects.filter(ativo=True).values_list('padrao', 'classe')
+            ])
+        return _rules[1]
+
+
+def clear_rules(**kwargs):
+    """Descarta as regras neste processo e, após o commit, nos demais."""
+    global _rules
+    from .models import CacheVersion
+
+    with _rules_lock:
+        _rules = None
+    CacheVersion.bump(VERSION_NAME)
+
+
+def classify(substance, rules=None):
+    nomes = f'{substance.nome_comum}\n{substance.nome_comercial}'.lower()
+    for padrao, classe in rules if rules is not None else get_rules():
+        if padrao in nomes:
+            return classe
+    return ''
+
+
+def reclassify_all(batch_size=500, dry_run=False):
+    """Reaplica as regras a todas as substâncias; retorna as alteradas."""
+    from .models import Substance, term_template_resolver
+
+    clear_rules()
+    rules = get_rules()
+    changed = []
+    for substance in Substance.objects.only('id', 'nome_comum', 'nome_comercial', 'classe_controle').iterator(chunk_size=batch_size):
+        classe = classify(substance, rules)
+        if classe != substance.classe_controle:
+            substance.classe_controle = classe
+            changed.append(substance)
+    if changed and not dry_run:
+        Substance.objects.bulk_update(changed, ['classe_controle'], batch_size=batch_size)
+        # bulk_update não dispara sinais
+        term_template_resolver.invalidate()
+    return changed
+
+
+def connect_signals():
+    from django.db.models.signals import post_delete, post_save
+
+    from .models import ControlledSubstanceRule
+
+    post_save.connect(clear_rules, sender=ControlledSubstanceRule, dispatch_uid='controlled:rule:save')
+    post_delete.connect(clear_rules, sender=ControlledSubstanceRule, dispatch_uid='controlled:rule:delete')
@@ -0,0 +1,104 @@
+"""
+Previsão de perdas por vencimento, lote a lote, em uma única consulta.
+
+Para cada lote com saldo, a consulta traz:
+
+- ``acumulado``: saldo acumulado dos lotes da mesma substância/unidade
+  até este, em ordem FEFO (função de janela ``SUM ... ROWS UNBOUNDED
+  PRECEDING``); descontado o próprio saldo, é o que será consumido antes
+  dele. Lotes já vencidos formam uma partição à parte e não entram na fila
+  de consumo;
+- ``consumo``: saídas da substância na unidade nos últimos
+  ``EXPIRY_FORECAST_HISTORY_DAYS`` dias (subconsulta agregada).
+
+Com a taxa diária, o consumo previsto até a validade é
+``min(saldo, max(0, taxa · dias até vencer − (acumulado − saldo)))``; o restante é a perda
+prevista, valorizada por ``Batch.preco_unitario``.
+
+O resultado é calculado uma vez por dia em cada processo.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from threading import Lock
+
+from django.conf import settings
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+ZERO = Decimal('0')
+
+_cache = {}
+_cache_lock = Lock()
+
+
+def lots_queryset(today, history_days):
+    from .models import Inventory, StockMovement
+
+    since = timezone.make_aware(datetime.combine(today - timedelta(days=history_days), time.min))
+    consumption = StockMovement.objects.filter(
+        substance=OuterRef('substance'), unit=OuterRef('unit'), tipo='saida', data_hora__gte=since
+    ).order_by().values('substance').annotate(total=Sum('quantidade')).values('total')
+    expired = Case(When(batch__validade__lt=today, then=Value(1)), default=Value(0))
+
+    return Inventory.objects.filter(quantity_on_hand__gt=0).annotate(
+        consumo=Coalesce(Subquery(consumption), Value(ZERO), output_field=DecimalField()),
+        acumulado=Window(
+            Sum('quantity_on_hand'),
+            partition_by=[F('substance_id'), F('unit_id'), expired],
+            order_by=[F('batch__validade').asc(), F('batch__created_at').asc(), F('batch_id').asc()],
+            frame=RowRange(start=None, end=0),
+        ),
+    ).values_list(
+        'substance__nome_comum', 'unit_id', 'unit__nome', 'batch__lote', 'batch__validade', 'batch__preco_unitario',
+        'quantity_on_hand', 'acumulado', 'consumo',
+    ).order_by('batch__validade')
+
+
+def compute(today=None, history_days=None):
+    today = today or timezone.localdate()
+    history_days = history_days or getattr(settings, 'EXPIRY_FORECAST_HISTORY_DAYS', 90)
+
+    lots = []
+    for nome, unit_id, unidade, lote, validade, preco, saldo, acumulado, consumo in lots_queryset(today, history_days):
+        taxa = Decimal(consumo) / history_days
+        dias = max((validade - today).days, 0)
+        antes = Decimal(acumulado) - saldo
+        uso = min(saldo, max(ZERO, taxa * dias - antes))
+        perda = saldo - uso
+        lots.append({
+            'substancia': nome,
+            'unit_id': unit_id,
+            'unidade': unidade,
+            'lote': lote,
+            'validade': validade,
+            'dias': dias,
+            'saldo': saldo,
+            'consumo_diario': taxa.quantize(Decimal('0.01')),
+            'uso_previsto': uso.quantize(Decimal('0.01')),
+            'perda_quantidade': perda.quantize(Decimal('0.01')),
+            'perda_valor': (perda * preco).quantize(Decimal('0.01')),
+        })
+
+    lots.sort(key=lambda lot: (-lot['perda_valor'], lot['validade']))
+    return {
+        'date': today,
+        'history_days': history_days,
+        'lots': lots,
+        'total_quantidade': sum((lot['perda_quantidade'] for lot in lots), ZERO),
+        'total_valor': sum((lot['perda_valor'] for lot in lots), ZERO),
+    }
+
+
+def get_forecast():
+    """Previsão do dia (calculada na primeira chamada do dia no processo)."""
+    today = timezone.localdate()
+    with _cache_lock:
+        cached = _cache.get('forecast')
+        if cached is not None and cached['date'] == today:
+            return cached
+    forecast = compute(today)
+    with _cache_lock:
+        _cache['forecast'] = forecast
+    return forecast
@@ -0,0 +1,142 @@
+"""
+Previsão de consumo, ponto de pedido e ruptura por (substância, unidade).
+
+Uma consulta agrupada traz as saídas por dia de todas as séries. Elas
+viram uma matriz ``séries × dias`` (numpy) e a suavização exponencial roda
+sobre a matriz inteira: o laço é sobre os dias, nunca sobre as séries.
+Para cada série, obtêm-se o nível (consumo médio diário) e a variância
+suavizada do erro de previsão, e daí:
+
+    estoque de segurança = z · σ · √(prazo de reposição)
+    ponto de pedido      = média · prazo + estoque de segurança
+    dias de cobertura    = disponível / média
+
+O disponível vem de ``StockAvailability`` (em estoque − reservado). O
+resultado substitui a tabela ``StockForecast`` (comando ``forecast_stock``,
+rodado de madrugada).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def load_series(end_date, days):
+    """
+    (chaves, matriz): ``chaves`` é a lista de (substância, unidade) e a
+    matriz tem o consumo de cada uma nos ``days`` dias até ``end_date``.
+    """
+    from .models import StockMovement
+
+    start_date = end_date - timedelta(days=days - 1)
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    rows = StockMovement.objects.filter(
+        tipo='saida', data_hora__gte=start, data_hora__lt=end
+    ).annotate(dia=TruncDate('data_hora')).values_list('substance_id', 'unit_id', 'dia').annotate(
+        total=Sum('quantidade')
+    ).order_by()
+
+    index = {}
+    positions, offsets, totals = [], [], []
+    for substance_id, unit_id, dia, total in rows:
+        positions.append(index.setdefault((substance_id, unit_id), len(index)))
+        offsets.append((dia - start_date).days)
+        totals.append(float(total))
+
+    matrix = np.zeros((len(index), days))
+    if positions:
+        np.add.at(matrix, (np.array(positions), np.array(offsets)), np.array(totals))
+    return list(index), matrix
+
+
+def smooth(matrix, alpha):
+    """Nível e desvio (suavização exponencial) de cada linha da matriz."""
+    if not matrix.size:
+        return np.zeros(len(matrix)), np.zeros(len(matrix))
+    # Nível inicial: média do período (evita depender do primeiro dia)
+    level = matrix.mean(axis=1)
+    variance = matrix.var(axis=1)
+    for day in range(matrix.shape[1]):
+        error = matrix[:, day] - level
+        level += alpha * error
+        variance = (1 - alpha) * (variance + alpha * error ** 2)
+    return level, np.sqrt(variance)
+
+
+def _available():
+    from .models import StockAvailability
+
+    return {
+        (substance_id, unit_id): float(on_hand - reserved)
+        for substance_id, unit_id, on_hand, reserved in StockAvailability.objects.values_list(
+            'substance_id', 'unit_id', 'on_hand', 'reserved'
+        )
+    }
+
+
+def _decimal(value, places):
+    return Decimal(str(round(float(value), places)))
+
+
+def compute_forecasts(today=None, days=None):
+    """Lista de ``StockForecast`` (não salvos) para todas as séries."""
+    from .models import StockForecast
+
+    today = today or timezone.localdate()
+    days = days or getattr(settings, 'FORECAST_HISTORY_DAYS', 180)
+    alpha = getattr(settings, 'FORECAST_SMOOTHING', 0.1)
+    lead_time = getattr(settings, 'FORECAST_LEAD_TIME_DAYS', 7)
+    z = getattr(settings, 'FORECAST_SERVICE_Z', 1.65)
+
+    keys, matrix = load_series(today - timedelta(days=1), days)
+    available = _available()
+    # Séries com estoque e sem consumo no período também entram (média zero)
+    known = set(keys)
+    keys += [key for key in available if key not in known]
+    matrix = np.vstack([matrix, np.zeros((len(keys) - len(matrix), days))])
+
+    mean, std = smooth(matrix, alpha)
+    safety = z * std * np.sqrt(lead_time)
+    reorder_point = mean * lead_time + safety
+    stock = np.array([available.get(key, 0.0) for key in keys])
+    consuming = mean > 1e-9
+    cover = np.divide(np.maximum(stock, 0), mean, out=np.full(len(keys), np.inf), where=consuming)
+    # Cobertura acima do horizonte máximo é tratada como "sem ruptura prevista"
+    projected = cover <= getattr(settings, 'FORECAST_MAX_COVER_DAYS', 3650)
+
+    now = timezone.now()
+    forecasts = []
+    for i, (substance_id, unit_id) in enumerate(keys):
+        finite = bool(projected[i])
+        forecasts.append(StockForecast(
+            substance_id=substance_id,
+            unit_id=unit_id,
+            consumo_medio_diario=_decimal(mean[i], 3),
+            desvio_diario=_decimal(std[i], 3),
+            estoque_seguranca=_decimal(safety[i], 2),
+            ponto_pedido=_decimal(reorder_point[i], 2),
+            disponivel=_decimal(stock[i], 2),
+            dias_cobertura=_decimal(cover[i], 1) if finite else None,
+            data_ruptura=today + timedelta(days=int(cover[i])) if finite else None,
+            repor=bool(consuming[i] and stock[i] <= reorder_point[i]),
+            dias_historico=days,
+            calculado_em=now,
+        ))
+    return forecasts
+
+
+def refresh_forecasts(today=None, days=None):
+    """Recalcula e substitui a tabela ``StockForecast``; retorna as previsões."""
+    from .models import StockForecast
+
+    forecasts = compute_forecasts(today=today, days=days)
+    with transaction.atomic():
+        StockForecast.objects.all().delete()
+        StockForecast.objects.bulk_create(forecasts, batch_size=500)
+    return forecasts
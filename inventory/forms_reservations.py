@@ -0,0 +1,24 @@
+from django import forms
+from .models import Patient, ProtocolTemplate, Unit
+
+
+class ProtocolReservationForm(forms.Form):
+    paciente = forms.ModelChoiceField(
+        queryset=Patient.objects.filter(ativo=True).order_by('nome'),
+        label='Paciente',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    protocolo = forms.ModelChoiceField(
+        queryset=ProtocolTemplate.objects.filter(is_active=True),
+        label='Protocolo',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    unit = forms.ModelChoiceField(
+        queryset=Unit.objects.filter(ativo=True),
+        label='Unidade',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    data_agendada = forms.DateField(
+        label='Data Agendada',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
@@ -8,7 +8,7 @@ class PatientSessionForm(forms.ModelForm):
     class Meta:
         model = PatientSession
         fields = [
-            'session_date', 'protocol_name', 'procedure_description',
+            'session_date', 'protocol', 'protocol_name', 'procedure_description',
             'clinical_notes', 'payment_status', 'payment_method'
         ]
         widgets = {
@@ -16,6 +16,9 @@ class PatientSessionForm(forms.ModelForm):
                 'type': 'date',
                 'class': 'form-control'
             }),
+            'protocol': forms.Select(attrs={
+                'class': 'form-select'
+            }),
             'protocol_name': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Ex: Protocolo Antioxidante'
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from inventory import session_protocols
+
+
+class Command(BaseCommand):
+    help = 'Vincula as sessões existentes ao template de protocolo pelo nome do protocolo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='Refaz também sessões já vinculadas')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas lista o que seria vinculado')
+
+    def handle(self, *args, **options):
+        linked = 0
+        for protocol_name, template, count in session_protocols.backfill(
+            overwrite=options['overwrite'], dry_run=options['dry_run']
+        ):
+            if template is None:
+                self.stdout.write(self.style.WARNING(f'{protocol_name}: sem template correspondente ({count} sessão(ões))'))
+                continue
+            linked += count
+            self.stdout.write(f'{protocol_name} -> {template.name}: {count} sessão(ões)')
+        verb = 'seriam vinculada(s)' if options['dry_run'] else 'vinculada(s)'
+        self.stdout.write(self.style.SUCCESS(f'✅ {linked} sessão(ões) {verb}'))
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory import term_rendering
+from inventory.models import TermTemplate
+
+PARAGRAPH = (
+    'Eu, {{PACIENTE_NOME}}, portador(a) do RG {{PACIENTE_RG}} e CPF {{PACIENTE_CPF}}, residente em '
+    '{{PACIENTE_ENDERECO}}, declaro ter sido informado(a) pelo(a) Dr(a). {{MEDICO_NOME}} '
+    '(CRM {{MEDICO_CRM}}) sobre o {{PROTOCOLO_NOME}}, incluindo os medicamentos {{MEDICAMENTOS}}, '
+    'seus riscos, benefícios e alternativas, e que recebi os medicamentos em {{DATA_ENTREGA}}. '
+    'Declaro ainda que li e compreendi integralmente este termo, tendo tido a oportunidade de '
+    'esclarecer todas as minhas dúvidas antes de assiná-lo. {{LOCAL}}, {{DATA_ATUAL}}.\n\n'
+)
+
+
+def _context(i):
+    return {
+        'paciente_nome': f'Paciente {i}',
+        'paciente_rg': f'{i:09d}',
+        'paciente_cpf': f'{i:011d}',
+        'paciente_endereco': f'Rua Exemplo, {i}',
+        'medico_nome': 'Médico Responsável',
+        'medico_crm': '123456',
+        'medicamentos': 'Substância A, Substância B',
+        'local': 'Ribeirão Preto/SP',
+        'data_entrega': '01/01/2025',
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compara a renderização de termos: str.replace por variável x template compilado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paragraphs', type=int, default=40, help='Parágrafos no texto do termo')
+        parser.add_argument('--patients', type=int, default=2000, help='Termos renderizados')
+
+    def handle(self, *args, **options):
+        template = TermTemplate(nome='Benchmark', conteudo=PARAGRAPH * options['paragraphs'])
+        contexts = [_context(i) for i in range(options['patients'])]
+        placeholders = TermTemplate.PLACEHOLDERS
+
+        runs = [
+            ('str.replace', lambda: [
+                term_rendering.render_with_replace(template.conteudo, placeholders, c) for c in contexts
+            ]),
+            ('compilado', lambda: [template.render_content(c) for c in contexts]),
+            ('compilado (lote)', lambda: template.render_many(contexts)),
+        ]
+
+        self.stdout.write(
+            f'{len(template.conteudo)} caracteres, {len(contexts)} termos\n'
+        )
+        baseline = None
+        for label, run in runs:
+            started = time.perf_counter()
+            rendered = run()
+            elapsed = time.perf_counter() - started
+            if baseline is None:
+                baseline = rendered
+            elif rendered != baseline:
+                self.stdout.write(self.style.ERROR(f'{label}: resultado diferente de str.replace'))
+            self.stdout.write(
+                f'{label:<18} {elapsed * 1000:9.1f} ms  {elapsed / len(contexts) * 1e6:8.1f} µs/termo'
+            )
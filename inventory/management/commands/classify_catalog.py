@@ -0,0 +1,34 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from inventory import classification
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a classificação ABC/XYZ por substância/unidade (rodar semanalmente)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Dias de histórico (padrão: CLASSIFICATION_HISTORY_DAYS)')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas calcula e lista, sem gravar')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['dry_run']:
+            classifications = classification.compute_classifications(days=options['days'])
+        else:
+            classifications = classification.refresh_classifications(days=options['days'])
+        elapsed = time.perf_counter() - started
+
+        for item in sorted(classifications, key=lambda c: (str(c.unit_id), c.classe_abc, -c.valor_consumo)):
+            if item.classe_abc == 'A':
+                self.stdout.write(
+                    f'{item.substance.nome_comum} ({item.unit.codigo}): {item.classe_abc}{item.classe_xyz}, '
+                    f'valor {item.valor_consumo}, CV {item.coeficiente_variacao}'
+                )
+        counts = Counter(c.classe_abc + c.classe_xyz for c in classifications)
+        summary = ', '.join(f'{key}: {counts[key]}' for key in sorted(counts))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(classifications)} série(s) em {elapsed:.2f}s ({summary or "nenhuma"})'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from inventory import reservations
+
+
+class Command(BaseCommand):
+    help = 'Libera as reservas de estoque vencidas (rodar periodicamente, ex.: a cada hora)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild-availability', action='store_true',
+            help='Recalcula também o disponível por substância/unidade a partir dos lotes'
+        )
+
+    def handle(self, *args, **options):
+        expired = reservations.expire_reservations()
+        self.stdout.write(self.style.SUCCESS(f'✅ {expired} reserva(s) expirada(s)'))
+        if options['rebuild_availability']:
+            rows = reservations.rebuild_availability()
+            self.stdout.write(self.style.SUCCESS(f'✅ Disponibilidade recalculada ({rows} substância/unidade)'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory import forecasting
+
+
+class Command(BaseCommand):
+    help = 'Recalcula consumo previsto, ponto de pedido e ruptura por substância/unidade (rodar diariamente)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Dias de histórico (padrão: FORECAST_HISTORY_DAYS)')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas calcula e lista, sem gravar')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['dry_run']:
+            forecasts = forecasting.compute_forecasts(days=options['days'])
+        else:
+            forecasts = forecasting.refresh_forecasts(days=options['days'])
+        elapsed = time.perf_counter() - started
+
+        to_reorder = [f for f in forecasts if f.repor]
+        for forecast in sorted(to_reorder, key=lambda f: (f.data_ruptura is None, f.data_ruptura)):
+            ruptura = forecast.data_ruptura.strftime('%d/%m/%Y') if forecast.data_ruptura else '-'
+            self.stdout.write(
+                f'{forecast.substance.nome_comum} ({forecast.unit.codigo}): disponível {forecast.disponivel}, '
+                f'ponto de pedido {forecast.ponto_pedido}, ruptura {ruptura}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(forecasts)} série(s) em {elapsed:.2f}s; {len(to_reorder)} abaixo do ponto de pedido'
+        ))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory import rebalancing
+from inventory.models import Batch, Substance, Unit
+
+
+class Command(BaseCommand):
+    help = 'Sugere transferências entre unidades para cobrir faltas previstas e lotes que venceriam sem uso'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon', type=int, default=None, help='Dias à frente (padrão: REBALANCE_HORIZON_DAYS)')
+        parser.add_argument('--create-drafts', action='store_true', help='Cria as transferências como rascunho (cancela os rascunhos abertos)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        moves = rebalancing.plan(horizon=options['horizon'])
+        elapsed = time.perf_counter() - started
+
+        units = Unit.objects.in_bulk({m.origem_id for m in moves} | {m.destino_id for m in moves})
+        substances = Substance.objects.in_bulk({m.substance_id for m in moves})
+        batches = Batch.objects.in_bulk({m.batch_id for m in moves})
+        for (origem_id, destino_id), items in rebalancing.group_moves(moves).items():
+            self.stdout.write(f'{units[origem_id].codigo} → {units[destino_id].codigo}')
+            for m in items:
+                self.stdout.write(
+                    f'  {substances[m.substance_id].nome_comum} lote {batches[m.batch_id].lote}: '
+                    f'{m.quantidade} ({rebalancing.MOTIVOS[m.motivo]})'
+                )
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(moves)} movimento(s) sugerido(s) em {elapsed:.2f}s'))
+
+        if options['create_drafts'] and moves:
+            transfers = rebalancing.create_drafts(moves)
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Rascunhos criados: {", ".join(t.numero for t in transfers)}'
+            ))
@@ -0,0 +1,39 @@
+import shutil
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import term_pdf
+from inventory.models import ResponsibilityTerm
+
+
+class Command(BaseCommand):
+    help = 'Gera um PDF único com os termos de responsabilidade de um dia (pool de processos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Data de aplicação (AAAA-MM-DD); padrão: hoje')
+        parser.add_argument('--unit', help='Código da unidade')
+        parser.add_argument('--workers', type=int, default=None, help='Processos gerando PDFs em paralelo (padrão: TERM_PDF_WORKERS)')
+        parser.add_argument('--output', help='Copia o PDF final para este caminho')
+
+    def handle(self, *args, **options):
+        try:
+            day = datetime.strptime(options['date'], '%Y-%m-%d').date() if options['date'] else datetime.now().date()
+        except ValueError:
+            raise CommandError('Data inválida; use AAAA-MM-DD')
+
+        terms = ResponsibilityTerm.objects.filter(data_aplicacao=day).select_related(
+            'patient', 'substance', 'unit', 'medico_responsavel', 'template_usado', 'aplicado_por'
+        ).order_by('numero')
+        if options['unit']:
+            terms = terms.filter(unit__codigo=options['unit'])
+        terms = list(terms)
+        if not terms:
+            raise CommandError(f'Nenhum termo em {day:%d/%m/%Y}')
+
+        path = term_pdf.batch_pdf_path(terms, workers=options['workers'] or getattr(settings, 'TERM_PDF_WORKERS', 4))
+        if options['output']:
+            shutil.copyfile(path, options['output'])
+            path = options['output']
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(terms)} termo(s) em {path}'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from inventory import controlled
+
+
+class Command(BaseCommand):
+    help = 'Reaplica as regras de substâncias controladas a todas as substâncias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Registros por atualização')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas lista o que mudaria')
+
+    def handle(self, *args, **options):
+        changed = controlled.reclassify_all(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        for substance in changed:
+            self.stdout.write(f'{substance.nome_comum}: {substance.get_classe_controle_display()}')
+        verb = 'seriam reclassificada(s)' if options['dry_run'] else 'reclassificada(s)'
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(changed)} substância(s) {verb}'))
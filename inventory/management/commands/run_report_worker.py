@@ -0,0 +1,68 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from inventory import report_jobs
+
+PURGE_INTERVAL = 3600  # segundos
+
+
+def _init_worker():
+    # Conexões herdadas do processo pai não podem ser usadas (nem fechadas) aqui
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+
+
+def _run_job(job_id):
+    try:
+        return report_jobs.run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Executa os relatórios em segundo plano (ReportJob) em um pool de processos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Processos gerando relatórios em paralelo')
+        parser.add_argument('--interval', type=float, default=2.0, help='Segundos entre consultas à fila')
+        parser.add_argument('--once', action='store_true', help='Processa a fila atual e encerra')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        requeued = report_jobs.requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f'{requeued} job(s) interrompido(s) devolvido(s) à fila.')
+        last_purge = 0.0
+
+        running = {}
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+            while True:
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    purged = report_jobs.purge_expired()
+                    if purged:
+                        self.stdout.write(f'{purged} job(s) expirado(s) removido(s).')
+                    last_purge = time.monotonic()
+
+                for job_id in report_jobs.claim_jobs(workers - len(running)):
+                    running[pool.submit(_run_job, job_id)] = job_id
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        report_jobs.finish_job(job_id, result_file=future.result())
+                        self.stdout.write(self.style.SUCCESS(f'✅ Relatório {job_id} concluído'))
+                    except Exception as e:
+                        report_jobs.finish_job(job_id, error=str(e) or e.__class__.__name__)
+                        self.stdout.write(self.style.ERROR(f'❌ Relatório {job_id} falhou: {e}'))
@@ -0,0 +1,120 @@
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from inventory import forecasting, replay_simulation
+from inventory.models import Substance, SubstanceUnitConfig, Unit
+
+
+def _init_worker():
+    # Conexões herdadas do processo pai não podem ser usadas (nem fechadas) aqui
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+
+
+def _simulate_chunk(args):
+    return replay_simulation.simulate(*args)
+
+
+def _days_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+class Command(BaseCommand):
+    help = 'Reaplica o histórico de saídas sob políticas de estoque mínimo e sugere o mínimo de cada unidade'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Dias de histórico (padrão: SIMULATION_HISTORY_DAYS)')
+        parser.add_argument('--min-days', type=_days_list, default=[3, 7, 14, 21, 30, 45, 60],
+                            help='Mínimos candidatos, em dias de consumo médio (ex.: 7,14,30)')
+        parser.add_argument('--order-days', type=_days_list, default=[7, 15, 30, 60, 90],
+                            help='Quantidade pedida, em dias de consumo médio, somada ao mínimo')
+        parser.add_argument('--lead-time', type=int, default=None, help='Prazo de reposição (padrão: FORECAST_LEAD_TIME_DAYS)')
+        parser.add_argument('--workers', type=int, default=2, help='Processos simulando em paralelo')
+        parser.add_argument('--apply', action='store_true', help='Grava o mínimo sugerido em SubstanceUnitConfig')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        days = options['days'] or getattr(settings, 'SIMULATION_HISTORY_DAYS', 730)
+        lead_time = options['lead_time'] or getattr(settings, 'FORECAST_LEAD_TIME_DAYS', 7)
+        max_stockout_days = getattr(settings, 'SIMULATION_MAX_STOCKOUT_RATE', 0.01) * days
+
+        keys, demand = forecasting.load_series(timezone.localdate() - timedelta(days=1), days)
+        mean = demand.mean(axis=1) if len(keys) else np.zeros(0)
+        consuming = mean > 1e-9
+        keys = [key for key, ok in zip(keys, consuming) if ok]
+        demand, mean = demand[consuming], mean[consuming]
+        if not keys:
+            self.stdout.write('Nenhuma saída no período.')
+            return
+
+        shelf = replay_simulation.load_shelf_life({substance_id for substance_id, _ in keys})
+        shelf_life = np.array([shelf[substance_id] for substance_id, _ in keys])
+        current = replay_simulation.load_current_minimums(keys)
+
+        # Políticas: grade (mínimo, pedido) em dias de cobertura + a configuração atual (última coluna)
+        grid = [(m, o) for m in options['min_days'] for o in options['order_days']]
+        min_cover = np.array([m for m, _ in grid], dtype=float)
+        order_cover = np.array([o for _, o in grid], dtype=float)
+        minimums = np.ceil(mean[:, None] * min_cover)
+        maximums = minimums + np.ceil(mean[:, None] * order_cover)
+        current_order = np.ceil(mean * float(np.median(order_cover)))
+        minimums = np.column_stack([minimums, current])
+        maximums = np.column_stack([maximums, current + current_order])
+
+        workers = max(1, min(options['workers'], len(keys)))
+        chunks = np.array_split(np.arange(len(keys)), workers)
+        jobs = [(demand[c], shelf_life[c], minimums[c], maximums[c], lead_time) for c in chunks]
+        if workers == 1:
+            parts = [replay_simulation.simulate(*jobs[0])]
+        else:
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+                parts = list(pool.map(_simulate_chunk, jobs))
+        results = {name: np.vstack([part[name] for part in parts]) for name in parts[0]}
+        elapsed = time.perf_counter() - started
+
+        # A configuração atual só serve de referência, não é candidata
+        candidates = {name: matrix[:, :-1] for name, matrix in results.items()}
+        best = replay_simulation.choose(candidates, max_stockout_days)
+
+        substances = Substance.objects.in_bulk({substance_id for substance_id, _ in keys})
+        units = Unit.objects.in_bulk({unit_id for _, unit_id in keys})
+        suggestions = []
+        for i, (substance_id, unit_id) in enumerate(keys):
+            b = best[i]
+            suggested = Decimal(int(minimums[i, b]))
+            suggestions.append((substance_id, unit_id, suggested))
+            self.stdout.write(
+                f'{substances[substance_id].nome_comum} ({units[unit_id].codigo}): '
+                f'mínimo atual {current[i]:g} → sugerido {suggested} '
+                f'({grid[b][0]}d de consumo, pedido de {grid[b][1]}d; validade típica {shelf_life[i]}d)'
+            )
+            for label, col in (('atual', -1), ('sugerido', b)):
+                self.stdout.write(
+                    f'    {label:<8} ruptura {results["dias_ruptura"][i, col]:.0f} dia(s), '
+                    f'estoque médio {results["estoque_medio"][i, col]:.1f}, '
+                    f'perda por vencimento {results["perda_vencimento"][i, col]:.1f}, '
+                    f'{results["pedidos"][i, col]:.0f} pedido(s)'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(keys)} série(s) × {len(grid) + 1} política(s) × {days} dia(s) em {elapsed:.2f}s '
+            f'({workers} processo(s); ruptura aceitável: até {math.floor(max_stockout_days)} dia(s))'
+        ))
+
+        if options['apply']:
+            for substance_id, unit_id, suggested in suggestions:
+                SubstanceUnitConfig.objects.update_or_create(
+                    substance_id=substance_id, unit_id=unit_id, defaults={'estoque_minimo': suggested}
+                )
+            self.stdout.write(self.style.SUCCESS(f'✅ Estoque mínimo atualizado em {len(suggestions)} configuração(ões)'))
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:56
+
+from decimal import Decimal
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0005_responsibledoctor_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubstancePriceHistory',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('preco_anterior', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço Anterior')),
+                ('preco_novo', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0'))], verbose_name='Novo Preço')),
+                ('vigente_desde', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Vigente desde')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('alterado_por', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_changes', to=settings.AUTH_USER_MODEL, verbose_name='Alterado por')),
+                ('substance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='inventory.substance', verbose_name='Substância')),
+            ],
+            options={
+                'verbose_name': 'Histórico de Preço',
+                'verbose_name_plural': 'Histórico de Preços',
+                'ordering': ['-vigente_desde'],
+                'indexes': [models.Index(fields=['substance', '-vigente_desde'], name='inventory_s_substan_f5601a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0006_substancepricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('report_type', models.CharField(choices=[('patients_csv', 'Pacientes (CSV)'), ('financial_csv', 'Financeiro (CSV)')], max_length=30, verbose_name='Relatório')),
+                ('filters', models.JSONField(blank=True, default=dict, verbose_name='Filtros')),
+                ('cache_key', models.CharField(max_length=64, verbose_name='Chave do Cache')),
+                ('status', models.CharField(choices=[('pending', 'Na fila'), ('running', 'Em execução'), ('done', 'Concluído'), ('failed', 'Falhou')], default='pending', max_length=10, verbose_name='Status')),
+                ('result_file', models.CharField(blank=True, max_length=255, verbose_name='Arquivo')),
+                ('error', models.TextField(blank=True, verbose_name='Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Relatório em Segundo Plano',
+                'verbose_name_plural': 'Relatórios em Segundo Plano',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='reportjob_status_idx'), models.Index(fields=['cache_key', 'status'], name='reportjob_cache_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:22
+
+from django.db import migrations, models
+
+# Lista usada até aqui nas verificações por nome (análogos de GLP-1)
+INITIAL_RULES = ['mounjaro', 'ozempic', 'saxenda', 'victoza', 'trulicity', 'rybelsus', 'wegovy']
+
+
+def seed_rules(apps, schema_editor):
+    ControlledSubstanceRule = apps.get_model('inventory', 'ControlledSubstanceRule')
+    Substance = apps.get_model('inventory', 'Substance')
+    db = schema_editor.connection.alias
+
+    ControlledSubstanceRule.objects.using(db).bulk_create([
+        ControlledSubstanceRule(padrao=padrao, classe='retencao_receita') for padrao in INITIAL_RULES
+    ])
+    changed = []
+    for substance in Substance.objects.using(db).all():
+        nomes = f'{substance.nome_comum}\n{substance.nome_comercial}'.lower()
+        if any(padrao in nomes for padrao in INITIAL_RULES):
+            substance.classe_controle = 'retencao_receita'
+            changed.append(substance)
+    Substance.objects.using(db).bulk_update(changed, ['classe_controle'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ControlledSubstanceRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('padrao', models.CharField(help_text='Trecho procurado no nome comum/comercial (sem diferenciar maiúsculas)', max_length=100, unique=True, verbose_name='Padrão no Nome')),
+                ('classe', models.CharField(choices=[('retencao_receita', 'Retenção de Receita'), ('portaria_344', 'Portaria 344/98')], max_length=20, verbose_name='Classe de Controle')),
+                ('prioridade', models.PositiveIntegerField(default=100, verbose_name='Prioridade')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('observacoes', models.TextField(blank=True, verbose_name='Observações')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Regra de Substância Controlada',
+                'verbose_name_plural': 'Regras de Substâncias Controladas',
+                'ordering': ['prioridade', 'padrao'],
+            },
+        ),
+        migrations.AddField(
+            model_name='substance',
+            name='classe_controle',
+            field=models.CharField(blank=True, choices=[('', 'Não controlada'), ('retencao_receita', 'Retenção de Receita'), ('portaria_344', 'Portaria 344/98')], db_index=True, default='', editable=False, max_length=20, verbose_name='Classe de Controle'),
+        ),
+        migrations.RunPython(seed_rules, migrations.RunPython.noop),
+    ]
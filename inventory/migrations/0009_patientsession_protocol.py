@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+
+def match_name(name, templates):
+    """
+    Cópia de ``inventory.session_protocols.match_name`` no momento desta
+    migração (migrações não importam código da aplicação).
+    """
+    name = name.strip().lower()
+    if not name:
+        return None
+    for template_name, pk in templates:
+        if template_name == name:
+            return pk
+    candidates = [
+        (len(template_name), template_name, pk)
+        for template_name, pk in templates
+        if template_name and (name in template_name or template_name in name)
+    ]
+    return max(candidates)[2] if candidates else None
+
+
+def link_sessions(apps, schema_editor):
+    ProtocolTemplate = apps.get_model('inventory', 'ProtocolTemplate')
+    PatientSession = apps.get_model('inventory', 'PatientSession')
+    templates = [(name.strip().lower(), pk) for pk, name in ProtocolTemplate.objects.values_list('id', 'name')]
+    sessions = PatientSession.objects.filter(protocol__isnull=True).exclude(protocol_name='')
+    for protocol_name in sessions.values_list('protocol_name', flat=True).distinct():
+        pk = match_name(protocol_name, templates)
+        if pk:
+            sessions.filter(protocol_name=protocol_name).update(protocol=pk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_controlled_substance_classification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientsession',
+            name='protocol',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sessions', to='inventory.protocoltemplate', verbose_name='Protocolo'),
+        ),
+        migrations.RunPython(link_sessions, migrations.RunPython.noop),
+    ]
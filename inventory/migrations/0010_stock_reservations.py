@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:28
+
+from decimal import Decimal
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def seed_availability(apps, schema_editor):
+    Inventory = apps.get_model('inventory', 'Inventory')
+    StockAvailability = apps.get_model('inventory', 'StockAvailability')
+    rows = Inventory.objects.values('substance_id', 'unit_id').annotate(
+        on_hand=models.Sum('quantity_on_hand'), reserved=models.Sum('quantity_reserved')
+    ).order_by()
+    StockAvailability.objects.bulk_create([StockAvailability(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0009_patientsession_protocol'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='quantity_reserved',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0'))], verbose_name='Quantidade Reservada'),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('quantidade', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Quantidade')),
+                ('data_agendada', models.DateField(verbose_name='Data Agendada')),
+                ('expira_em', models.DateTimeField(verbose_name='Expira em')),
+                ('status', models.CharField(choices=[('ativa', 'Ativa'), ('convertida', 'Convertida em saída'), ('expirada', 'Expirada'), ('cancelada', 'Cancelada')], default='ativa', max_length=20, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.batch', verbose_name='Lote')),
+                ('criado_por', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_reservations_created', to=settings.AUTH_USER_MODEL, verbose_name='Criado por')),
+                ('movimento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.stockmovement', verbose_name='Movimentação')),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='inventory.patient', verbose_name='Paciente')),
+                ('protocolo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='inventory.protocoltemplate', verbose_name='Protocolo')),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='inventory.patientsession', verbose_name='Sessão')),
+                ('substance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.substance', verbose_name='Substância')),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.unit', verbose_name='Unidade')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Estoque',
+                'verbose_name_plural': 'Reservas de Estoque',
+                'ordering': ['data_agendada', 'created_at'],
+                'indexes': [models.Index(fields=['status', 'expira_em'], name='reservation_expiry_idx'), models.Index(fields=['paciente', 'unit', 'status'], name='reservation_patient_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('on_hand', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Em Estoque')),
+                ('reserved', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Reservado')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('substance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.substance', verbose_name='Substância')),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.unit', verbose_name='Unidade')),
+            ],
+            options={
+                'verbose_name': 'Disponibilidade de Estoque',
+                'verbose_name_plural': 'Disponibilidade de Estoque',
+                'unique_together': {('substance', 'unit')},
+            },
+        ),
+        migrations.RunPython(seed_availability, migrations.RunPython.noop),
+    ]
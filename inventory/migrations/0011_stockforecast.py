@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumo_medio_diario', models.DecimalField(decimal_places=3, max_digits=12, verbose_name='Consumo Médio Diário')),
+                ('desvio_diario', models.DecimalField(decimal_places=3, max_digits=12, verbose_name='Desvio Padrão Diário')),
+                ('estoque_seguranca', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Estoque de Segurança')),
+                ('ponto_pedido', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Ponto de Pedido')),
+                ('disponivel', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Disponível')),
+                ('dias_cobertura', models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True, verbose_name='Dias de Cobertura')),
+                ('data_ruptura', models.DateField(blank=True, db_index=True, null=True, verbose_name='Ruptura Prevista')),
+                ('repor', models.BooleanField(db_index=True, default=False, verbose_name='Abaixo do Ponto de Pedido')),
+                ('dias_historico', models.PositiveIntegerField(verbose_name='Dias de Histórico')),
+                ('calculado_em', models.DateTimeField(verbose_name='Calculado em')),
+                ('substance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.substance', verbose_name='Substância')),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.unit', verbose_name='Unidade')),
+            ],
+            options={
+                'verbose_name': 'Previsão de Estoque',
+                'verbose_name_plural': 'Previsões de Estoque',
+                'ordering': ['data_ruptura', 'substance__nome_comum'],
+                'unique_together': {('substance', 'unit')},
+            },
+        ),
+    ]
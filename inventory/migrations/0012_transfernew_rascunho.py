@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_stockforecast'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transfernew',
+            name='status',
+            field=models.CharField(choices=[('rascunho', 'Rascunho (sugestão)'), ('pendente', 'Pendente'), ('em_transito', 'Em Trânsito'), ('concluida', 'Concluída'), ('cancelada', 'Cancelada')], default='pendente', max_length=20, verbose_name='Status'),
+        ),
+    ]
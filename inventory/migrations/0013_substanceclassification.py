@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_transfernew_rascunho'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubstanceClassification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('classe_abc', models.CharField(choices=[('A', 'A - Alto valor'), ('B', 'B - Valor intermediário'), ('C', 'C - Baixo valor')], db_index=True, max_length=1, verbose_name='Classe ABC')),
+                ('classe_xyz', models.CharField(choices=[('X', 'X - Demanda estável'), ('Y', 'Y - Demanda variável'), ('Z', 'Z - Demanda irregular')], db_index=True, max_length=1, verbose_name='Classe XYZ')),
+                ('quantidade_consumida', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Quantidade Consumida')),
+                ('valor_consumo', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Valor Consumido')),
+                ('valor_faturado', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Valor Faturado')),
+                ('participacao_acumulada', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Participação Acumulada (%)')),
+                ('coeficiente_variacao', models.DecimalField(blank=True, decimal_places=3, max_digits=8, null=True, verbose_name='Coeficiente de Variação')),
+                ('dias_historico', models.PositiveIntegerField(verbose_name='Dias de Histórico')),
+                ('calculado_em', models.DateTimeField(verbose_name='Calculado em')),
+                ('substance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.substance', verbose_name='Substância')),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.unit', verbose_name='Unidade')),
+            ],
+            options={
+                'verbose_name': 'Classificação ABC/XYZ',
+                'verbose_name_plural': 'Classificações ABC/XYZ',
+                'ordering': ['unit__nome', 'classe_abc', '-valor_consumo'],
+                'indexes': [models.Index(fields=['classe_abc', 'classe_xyz'], name='classification_abc_xyz_idx')],
+                'unique_together': {('substance', 'unit')},
+            },
+        ),
+    ]
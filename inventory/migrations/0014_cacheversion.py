@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_substanceclassification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Nome')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Versão de Cache',
+                'verbose_name_plural': 'Versões de Cache',
+            },
+        ),
+    ]
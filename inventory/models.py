@@ -5,6 +5,8 @@ from django.utils import timezone
 from decimal import Decimal
 import uuid
 
+from . import controlled, term_rendering, term_resolution
+
 User = get_user_model()
 
 
@@ -69,6 +71,18 @@ class Substance(models.Model):
         verbose_name='Dias para Alerta de Vencimento'
     )
     
+    # Classe de controle (mantida pelas regras de ControlledSubstanceRule)
+    CLASSE_CONTROLE_CHOICES = [('', 'Não controlada')] + controlled.CONTROLLED_CLASSES
+    classe_controle = models.CharField(
+        max_length=20,
+        choices=CLASSE_CONTROLE_CHOICES,
+        default='',
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Classe de Controle'
+    )
+    
     # Audit fields
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
@@ -88,6 +102,18 @@ class Substance(models.Model):
     def __str__(self):
         return f"{self.nome_comum} - {self.concentracao}"
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'nome_comum', 'nome_comercial'} & set(update_fields):
+            self.classe_controle = controlled.classify(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'classe_controle'}
+        super().save(*args, **kwargs)
+    
+    @property
+    def is_controlled(self):
+        return bool(self.classe_controle)
+    
     @property
     def estoque_minimo(self):
         """Mantém compatibilidade com código existente"""
@@ -120,6 +146,52 @@ class Substance(models.Model):
         return False
 
 
+class SubstancePriceHistory(models.Model):
+    """
+    Histórico de alterações do preço padrão das substâncias.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    substance = models.ForeignKey(
+        Substance,
+        on_delete=models.CASCADE,
+        related_name='price_history',
+        verbose_name='Substância'
+    )
+    preco_anterior = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name='Preço Anterior'
+    )
+    preco_novo = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0'))],
+        verbose_name='Novo Preço'
+    )
+    vigente_desde = models.DateTimeField(default=timezone.now, verbose_name='Vigente desde')
+
+    # Audit fields
+    alterado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='price_changes',
+        verbose_name='Alterado por'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+
+    class Meta:
+        verbose_name = 'Histórico de Preço'
+        verbose_name_plural = 'Histórico de Preços'
+        ordering = ['-vigente_desde']
+        indexes = [
+            models.Index(fields=['substance', '-vigente_desde']),
+        ]
+
+    def __str__(self):
+        return f"{self.substance.nome_comum}: {self.preco_anterior} → {self.preco_novo} ({self.vigente_desde:%d/%m/%Y})"
+
+
 class SubstanceUnitConfig(models.Model):
     """
     Configurações específicas de substância por unidade.
@@ -271,6 +343,14 @@ class Inventory(models.Model):
         validators=[MinValueValidator(Decimal('0'))],
         verbose_name='Quantidade em Estoque'
     )
+    # Mantida por inventory.reservations (reservas ativas neste lote)
+    quantity_reserved = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        validators=[MinValueValidator(Decimal('0'))],
+        verbose_name='Quantidade Reservada'
+    )
     
     # Audit fields
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
@@ -285,6 +365,31 @@ class Inventory(models.Model):
     def __str__(self):
         return f"{self.substance.nome_comum} - {self.batch.lote} ({self.unit.codigo}) - {self.quantity_on_hand}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores lidos do banco: o sinal de post_save calcula a diferença
+        # para o saldo agregado (StockAvailability)
+        instance._loaded_quantities = (
+            instance.__dict__.get('quantity_on_hand'),
+            instance.__dict__.get('quantity_reserved'),
+        )
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        on_hand, reserved = getattr(self, '_loaded_quantities', (None, None))
+        if fields is None or 'quantity_on_hand' in fields:
+            on_hand = self.quantity_on_hand
+        if fields is None or 'quantity_reserved' in fields:
+            reserved = self.quantity_reserved
+        self._loaded_quantities = (on_hand, reserved)
+
+    @property
+    def quantity_free(self):
+        """Saldo do lote que não está reservado."""
+        return self.quantity_on_hand - self.quantity_reserved
+    
     def get_estoque_minimo(self):
         """Retorna estoque mínimo específico da unidade ou padrão"""
         try:
@@ -451,6 +556,24 @@ class UnitTransfer(models.Model):
 # Importar modelos de sessão
 from .models_session import PatientSession, SessionSubstance, ProtocolTemplate, ProtocolSubstance
 
+# Relatórios gerados em segundo plano
+from .models_reports import ReportJob
+
+# Regras de classificação de substâncias controladas
+from .models_controlled import ControlledSubstanceRule
+
+# Reservas de estoque para sessões agendadas
+from .models_reservations import StockReservation, StockAvailability
+
+# Previsão de consumo (recalculada pelo comando forecast_stock)
+from .models_forecast import StockForecast
+
+# Classificação ABC/XYZ (recalculada pelo comando classify_catalog)
+from .models_classification import SubstanceClassification
+
+# Versões compartilhadas dos caches em memória
+from .models_cache import CacheVersion
+
 
 
 # Modelos de Transferência Nova
@@ -459,6 +582,7 @@ class TransferNew(models.Model):
     Modelo para transferências de substâncias entre unidades.
     """
     STATUS_CHOICES = [
+        ('rascunho', 'Rascunho (sugestão)'),
         ('pendente', 'Pendente'),
         ('em_transito', 'Em Trânsito'),
         ('concluida', 'Concluída'),
@@ -717,12 +841,7 @@ class ResponsibilityTerm(models.Model):
     @property
     def is_controlled_substance(self):
         """Verifica se a substância é controlada"""
-        controlled_substances = [
-            'mounjaro', 'ozempic', 'saxenda', 'victoza', 
-            'trulicity', 'rybelsus', 'wegovy'
-        ]
-        return any(controlled in self.substance.nome_comum.lower() 
-                  for controlled in controlled_substances)
+        return self.substance.is_controlled
     
     @property
     def requires_special_care(self):
@@ -842,28 +961,53 @@ class TermTemplate(models.Model):
     def __str__(self):
         return f"{self.nome} (v{self.versao})"
     
+    # Variável -> (chave no contexto, valor padrão)
+    PLACEHOLDERS = {
+        'PACIENTE_NOME': ('paciente_nome', ''),
+        'PACIENTE_RG': ('paciente_rg', ''),
+        'PACIENTE_CPF': ('paciente_cpf', ''),
+        'PACIENTE_ENDERECO': ('paciente_endereco', ''),
+        'MEDICO_NOME': ('medico_nome', ''),
+        'MEDICO_CRM': ('medico_crm', ''),
+        'PROTOCOLO_NOME': ('protocolo_nome', 'Full Care'),
+        'MEDICAMENTOS': ('medicamentos', ''),
+        'LOCAL': ('local', ''),
+        'DATA_ATUAL': ('data_atual', lambda: timezone.now().strftime('%d de %B de %Y')),
+        'DATA_ENTREGA': ('data_entrega', ''),
+    }
+    
     def render_content(self, context):
         """
         Renderiza o conteúdo substituindo as variáveis pelos dados reais.
         """
-        content = self.conteudo
-        
-        replacements = {
-            '{{PACIENTE_NOME}}': context.get('paciente_nome', ''),
-            '{{PACIENTE_RG}}': context.get('paciente_rg', ''),
-            '{{PACIENTE_CPF}}': context.get('paciente_cpf', ''),
-            '{{PACIENTE_ENDERECO}}': context.get('paciente_endereco', ''),
-            '{{MEDICO_NOME}}': context.get('medico_nome', ''),
-            '{{MEDICO_CRM}}': context.get('medico_crm', ''),
-            '{{PROTOCOLO_NOME}}': context.get('protocolo_nome', 'Full Care'),
-            '{{MEDICAMENTOS}}': context.get('medicamentos', ''),
-            '{{LOCAL}}': context.get('local', ''),
-            '{{DATA_ATUAL}}': context.get('data_atual', timezone.now().strftime('%d de %B de %Y')),
-            '{{DATA_ENTREGA}}': context.get('data_entrega', ''),
-        }
-        
-        for placeholder, value in replacements.items():
-            content = content.replace(placeholder, str(value))
-        
-        return content
+        return term_rendering.render(self, self.PLACEHOLDERS, context)
+    
+    def render_many(self, contexts):
+        """
+        Renderiza o termo para vários contextos (ex.: vários pacientes) de uma vez.
+        """
+        return term_rendering.render_many(self, self.PLACEHOLDERS, contexts)
+    
+    @staticmethod
+    def get_template_for_substance(substance):
+        """
+        Template ativo para a substância: controladas usam o de substâncias
+        controladas; depois injetáveis em geral e, por fim, Full Care.
+        """
+        return term_template_resolver.resolve(substance)
+    
+    @staticmethod
+    def get_templates_for_substances(substances):
+        """
+        Templates de várias substâncias de uma vez (por id da substância).
+        """
+        return term_template_resolver.resolve_many(substances)
+
+
+def _term_template_chain(substance):
+    chain = [('tipo', 'controlada')] if substance.is_controlled else []
+    return chain + [('tipo', 'injetavel_geral'), ('tipo', 'full_care')]
+
+
+term_template_resolver = term_resolution.TemplateResolver(TermTemplate, _term_template_chain, 'term_templates')
 
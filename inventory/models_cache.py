@@ -0,0 +1,66 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+
+class CacheVersion(models.Model):
+    """
+    Versão compartilhada de um cache em memória.
+
+    Quem altera os dados incrementa a versão (``bump``); cada processo compara
+    a versão do banco (``current``) com a do seu cache antes de usá-lo (ver
+    ``inventory.protocol_matrix``).
+    """
+    name = models.CharField(max_length=50, primary_key=True, verbose_name='Nome')
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Versão')
+
+    class Meta:
+        verbose_name = 'Versão de Cache'
+        verbose_name_plural = 'Versões de Cache'
+
+    def __str__(self):
+        return f'{self.name} v{self.version}'
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def increment(cls, name):
+        if not cls.objects.filter(name=name).update(version=F('version') + 1):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(name=name, version=1)
+            except IntegrityError:
+                cls.objects.filter(name=name).update(version=F('version') + 1)
+
+    @classmethod
+    def bump(cls, name):
+        """
+        Incrementa a versão após o commit da transação atual, no máximo uma
+        vez por transação: um ``save`` em lote dispara os sinais muitas vezes.
+        O pendente é procurado na fila de ``on_commit`` da conexão, e não em
+        uma flag, porque um rollback descarta a fila e a transação seguinte
+        precisa agendar de novo.
+        """
+        callback = _Increment(cls, name)
+        connection = transaction.get_connection()
+        if connection.in_atomic_block and any(item[1] == callback for item in connection.run_on_commit):
+            return
+        transaction.on_commit(callback)
+
+
+class _Increment:
+    """Callback de ``on_commit`` comparável (mesmo modelo e nome)."""
+
+    def __init__(self, model, name):
+        self.model = model
+        self.name = name
+
+    def __eq__(self, other):
+        return isinstance(other, _Increment) and (other.model, other.name) == (self.model, self.name)
+
+    def __hash__(self):
+        return hash((self.model, self.name))
+
+    def __call__(self):
+        self.model.increment(self.name)
@@ -0,0 +1,50 @@
+from django.db import models
+
+
+class SubstanceClassification(models.Model):
+    """
+    Classificação ABC (valor consumido) e XYZ (variabilidade da demanda) por
+    (substância, unidade), recalculada em lote pelo comando
+    ``classify_catalog`` (ver ``inventory.classification``).
+    """
+    ABC_CHOICES = [
+        ('A', 'A - Alto valor'),
+        ('B', 'B - Valor intermediário'),
+        ('C', 'C - Baixo valor'),
+    ]
+    XYZ_CHOICES = [
+        ('X', 'X - Demanda estável'),
+        ('Y', 'Y - Demanda variável'),
+        ('Z', 'Z - Demanda irregular'),
+    ]
+
+    substance = models.ForeignKey('Substance', on_delete=models.CASCADE, verbose_name='Substância')
+    unit = models.ForeignKey('Unit', on_delete=models.CASCADE, verbose_name='Unidade')
+
+    classe_abc = models.CharField(max_length=1, choices=ABC_CHOICES, db_index=True, verbose_name='Classe ABC')
+    classe_xyz = models.CharField(max_length=1, choices=XYZ_CHOICES, db_index=True, verbose_name='Classe XYZ')
+
+    quantidade_consumida = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Quantidade Consumida')
+    valor_consumo = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Valor Consumido')
+    valor_faturado = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Valor Faturado')
+    participacao_acumulada = models.DecimalField(
+        max_digits=5, decimal_places=2, verbose_name='Participação Acumulada (%)'
+    )
+    coeficiente_variacao = models.DecimalField(
+        max_digits=8, decimal_places=3, null=True, blank=True, verbose_name='Coeficiente de Variação'
+    )
+
+    dias_historico = models.PositiveIntegerField(verbose_name='Dias de Histórico')
+    calculado_em = models.DateTimeField(verbose_name='Calculado em')
+
+    class Meta:
+        verbose_name = 'Classificação ABC/XYZ'
+        verbose_name_plural = 'Classificações ABC/XYZ'
+        unique_together = ['substance', 'unit']
+        ordering = ['unit__nome', 'classe_abc', '-valor_consumo']
+        indexes = [
+            models.Index(fields=['classe_abc', 'classe_xyz'], name='classification_abc_xyz_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.substance.nome_comum} ({self.unit.codigo}): {self.classe_abc}{self.classe_xyz}"
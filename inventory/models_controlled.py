@@ -0,0 +1,38 @@
+from django.db import models
+
+from . import controlled
+
+
+class ControlledSubstanceRule(models.Model):
+    """
+    Regra de classificação: substâncias cujo nome comum ou comercial contém
+    ``padrao`` recebem ``classe``. Vale a regra ativa de menor prioridade.
+
+    A classe fica gravada em ``Substance.classe_controle`` (indexada) ao
+    salvar a substância; depois de alterar as regras, rode
+    ``reclassify_substances`` para atualizar as já cadastradas.
+    """
+    padrao = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Padrão no Nome',
+        help_text='Trecho procurado no nome comum/comercial (sem diferenciar maiúsculas)'
+    )
+    classe = models.CharField(
+        max_length=20,
+        choices=controlled.CONTROLLED_CLASSES,
+        verbose_name='Classe de Controle'
+    )
+    prioridade = models.PositiveIntegerField(default=100, verbose_name='Prioridade')
+    ativo = models.BooleanField(default=True, verbose_name='Ativo')
+    observacoes = models.TextField(blank=True, verbose_name='Observações')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Regra de Substância Controlada'
+        verbose_name_plural = 'Regras de Substâncias Controladas'
+        ordering = ['prioridade', 'padrao']
+
+    def __str__(self):
+        return f'"{self.padrao}" → {self.get_classe_display()}'
@@ -0,0 +1,34 @@
+from django.db import models
+
+
+class StockForecast(models.Model):
+    """
+    Previsão de consumo por (substância, unidade), recalculada em lote pelo
+    comando ``forecast_stock`` (ver ``inventory.forecasting``). Dashboard e
+    alertas leem esta tabela em vez de calcular na requisição.
+    """
+    substance = models.ForeignKey('Substance', on_delete=models.CASCADE, verbose_name='Substância')
+    unit = models.ForeignKey('Unit', on_delete=models.CASCADE, verbose_name='Unidade')
+
+    consumo_medio_diario = models.DecimalField(max_digits=12, decimal_places=3, verbose_name='Consumo Médio Diário')
+    desvio_diario = models.DecimalField(max_digits=12, decimal_places=3, verbose_name='Desvio Padrão Diário')
+    estoque_seguranca = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Estoque de Segurança')
+    ponto_pedido = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Ponto de Pedido')
+    disponivel = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Disponível')
+    dias_cobertura = models.DecimalField(
+        max_digits=10, decimal_places=1, null=True, blank=True, verbose_name='Dias de Cobertura'
+    )
+    data_ruptura = models.DateField(null=True, blank=True, db_index=True, verbose_name='Ruptura Prevista')
+    repor = models.BooleanField(default=False, db_index=True, verbose_name='Abaixo do Ponto de Pedido')
+
+    dias_historico = models.PositiveIntegerField(verbose_name='Dias de Histórico')
+    calculado_em = models.DateTimeField(verbose_name='Calculado em')
+
+    class Meta:
+        verbose_name = 'Previsão de Estoque'
+        verbose_name_plural = 'Previsões de Estoque'
+        unique_together = ['substance', 'unit']
+        ordering = ['data_ruptura', 'substance__nome_comum']
+
+    def __str__(self):
+        return f"{self.substance.nome_comum} ({self.unit.codigo}): PP {self.ponto_pedido}"
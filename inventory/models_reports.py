@@ -0,0 +1,62 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class ReportJob(models.Model):
+    """
+    Relatório gerado fora da requisição pelo comando ``run_report_worker``.
+
+    ``cache_key`` identifica tipo + filtros + versão dos dados: pedidos
+    idênticos reaproveitam o arquivo de um job já concluído (ver
+    ``inventory.report_jobs``).
+    """
+    REPORT_TYPE_CHOICES = [
+        ('patients_csv', 'Pacientes (CSV)'),
+        ('financial_csv', 'Financeiro (CSV)'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Na fila'),
+        ('running', 'Em execução'),
+        ('done', 'Concluído'),
+        ('failed', 'Falhou'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    report_type = models.CharField(max_length=30, choices=REPORT_TYPE_CHOICES, verbose_name='Relatório')
+    filters = models.JSONField(default=dict, blank=True, verbose_name='Filtros')
+    cache_key = models.CharField(max_length=64, verbose_name='Chave do Cache')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='Status')
+    result_file = models.CharField(max_length=255, blank=True, verbose_name='Arquivo')
+    error = models.TextField(blank=True, verbose_name='Erro')
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_jobs',
+        verbose_name='Solicitado por'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Iniciado em')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Concluído em')
+
+    class Meta:
+        verbose_name = 'Relatório em Segundo Plano'
+        verbose_name_plural = 'Relatórios em Segundo Plano'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_idx'),
+            models.Index(fields=['cache_key', 'status'], name='reportjob_cache_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_report_type_display()} - {self.get_status_display()} ({self.created_at:%d/%m/%Y %H:%M})'
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
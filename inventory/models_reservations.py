@@ -0,0 +1,121 @@
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.validators import MinValueValidator
+from django.db import models
+from decimal import Decimal
+
+User = get_user_model()
+
+
+class StockReservation(models.Model):
+    """
+    Reserva de um lote para a sessão agendada de um paciente.
+
+    Enquanto ativa, a quantidade conta em ``Inventory.quantity_reserved``
+    do lote. Ao registrar a sessão, a reserva vira ``StockMovement`` de
+    saída; passado ``expira_em`` sem sessão, ela expira e libera o lote
+    (ver ``inventory.reservations``).
+    """
+    STATUS_CHOICES = [
+        ('ativa', 'Ativa'),
+        ('convertida', 'Convertida em saída'),
+        ('expirada', 'Expirada'),
+        ('cancelada', 'Cancelada'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    paciente = models.ForeignKey(
+        'Patient',
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        verbose_name='Paciente'
+    )
+    protocolo = models.ForeignKey(
+        'ProtocolTemplate',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reservations',
+        verbose_name='Protocolo'
+    )
+    unit = models.ForeignKey('Unit', on_delete=models.CASCADE, verbose_name='Unidade')
+    substance = models.ForeignKey('Substance', on_delete=models.CASCADE, verbose_name='Substância')
+    batch = models.ForeignKey('Batch', on_delete=models.CASCADE, verbose_name='Lote')
+    quantidade = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        verbose_name='Quantidade'
+    )
+    data_agendada = models.DateField(verbose_name='Data Agendada')
+    expira_em = models.DateTimeField(verbose_name='Expira em')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ativa', verbose_name='Status')
+
+    session = models.ForeignKey(
+        'PatientSession',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reservations',
+        verbose_name='Sessão'
+    )
+    movimento = models.ForeignKey(
+        'StockMovement',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Movimentação'
+    )
+
+    criado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='stock_reservations_created',
+        verbose_name='Criado por'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Reserva de Estoque'
+        verbose_name_plural = 'Reservas de Estoque'
+        ordering = ['data_agendada', 'created_at']
+        indexes = [
+            models.Index(fields=['status', 'expira_em'], name='reservation_expiry_idx'),
+            models.Index(fields=['paciente', 'unit', 'status'], name='reservation_patient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.paciente.nome} - {self.substance.nome_comum} {self.quantidade} ({self.data_agendada})"
+
+    @property
+    def is_active(self):
+        return self.status == 'ativa'
+
+
+class StockAvailability(models.Model):
+    """
+    Saldo agregado por (substância, unidade), mantido de forma incremental a
+    cada gravação de ``Inventory``. ``available`` (em estoque − reservado) é
+    lido em uma linha, sem somar lotes ou reservas.
+    """
+    substance = models.ForeignKey('Substance', on_delete=models.CASCADE, verbose_name='Substância')
+    unit = models.ForeignKey('Unit', on_delete=models.CASCADE, verbose_name='Unidade')
+    on_hand = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Em Estoque')
+    reserved = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Reservado')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Disponibilidade de Estoque'
+        verbose_name_plural = 'Disponibilidade de Estoque'
+        unique_together = ['substance', 'unit']
+
+    def __str__(self):
+        return f"{self.substance.nome_comum} ({self.unit.codigo}): {self.available}"
+
+    @property
+    def available(self):
+        return self.on_hand - self.reserved
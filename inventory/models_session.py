@@ -43,6 +43,14 @@ class PatientSession(models.Model):
     session_date = models.DateField(verbose_name='Data da Sessão')
     
     # Protocolo e procedimento
+    protocol = models.ForeignKey(
+        'ProtocolTemplate',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sessions',
+        verbose_name='Protocolo'
+    )
     protocol_name = models.CharField(
         max_length=200, 
         blank=True,
@@ -109,6 +117,25 @@ class PatientSession(models.Model):
     def __str__(self):
         return f"{self.patient.nome} - Sessão {self.session_number} ({self.session_date})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Nome lido do banco: o template só é procurado quando ele muda
+        instance._loaded_protocol_name = instance.__dict__.get('protocol_name')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # O nome fica gravado na sessão mesmo se o template mudar depois
+        if self.protocol_id and not self.protocol_name:
+            self.protocol_name = self.protocol.name
+        elif self.protocol_name and not self.protocol_id and (
+            self._state.adding or self.protocol_name != getattr(self, '_loaded_protocol_name', None)
+        ):
+            from .session_protocols import match_protocol
+            self.protocol = match_protocol(self.protocol_name)
+        super().save(*args, **kwargs)
+        self._loaded_protocol_name = self.protocol_name
+    
     @property
     def is_paid(self):
         return self.payment_status == 'pago'
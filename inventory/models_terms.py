@@ -119,12 +119,7 @@ class ResponsibilityTerm(models.Model):
     @property
     def is_controlled_substance(self):
         """Verifica se a substância é controlada"""
-        controlled_substances = [
-            'mounjaro', 'ozempic', 'saxenda', 'victoza', 
-            'trulicity', 'rybelsus', 'wegovy'
-        ]
-        return any(controlled in self.substance.nome_comum.lower() 
-                  for controlled in controlled_substances)
+        return self.substance.is_controlled
     
     @property
     def requires_special_care(self):
@@ -0,0 +1,101 @@
+"""
+Atualização de preços das substâncias em lote, com histórico.
+"""
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import protocol_matrix
+from .models import Substance, SubstancePriceHistory
+
+
+def parse_price(value):
+    """
+    Converte o valor enviado (aceita vírgula decimal) em Decimal com 2 casas.
+    Valores que não cabem em ``Substance.preco_padrao`` são rejeitados.
+    """
+    if value is None:
+        raise ValueError('Preço não informado')
+    text = str(value).strip().replace('R$', '').strip()
+    if ',' in text:
+        text = text.replace('.', '').replace(',', '.')
+    try:
+        price = Decimal(text or '0')
+        if not price.is_finite():
+            raise InvalidOperation
+        price = price.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'Preço inválido: {value}')
+    if price < 0:
+        raise ValueError(f'Preço negativo: {value}')
+    field = Substance._meta.get_field('preco_padrao')
+    if price >= Decimal(10) ** (field.max_digits - field.decimal_places):
+        raise ValueError(f'Preço acima do limite: {value}')
+    return price
+
+
+def apply_price_changes(submitted_prices, user=None, vigente_desde=None):
+    """
+    Aplica somente os preços que mudaram.
+
+    ``submitted_prices`` mapeia id da substância -> preço (str/Decimal).
+    Os preços atuais são lidos em uma única consulta; as alterações são
+    gravadas com um ``bulk_update`` e um ``bulk_create`` do histórico.
+    Retorna um dicionário com ``updated``, ``unchanged`` e ``errors``.
+    """
+    vigente_desde = vigente_desde or timezone.now()
+    errors = []
+    parsed = {}
+    for substance_id, value in submitted_prices.items():
+        try:
+            key = str(uuid.UUID(str(substance_id)))
+        except ValueError:
+            errors.append({'substance_id': str(substance_id), 'error': 'Identificador inválido'})
+            continue
+        try:
+            parsed[key] = parse_price(value)
+        except ValueError as e:
+            errors.append({'substance_id': str(substance_id), 'error': str(e)})
+
+    if not parsed:
+        return {'updated': [], 'unchanged': 0, 'errors': errors}
+
+    current = Substance.objects.filter(id__in=list(parsed)).only('id', 'nome_comum', 'preco_padrao')
+    found = set()
+    changed = []
+    history = []
+    now = timezone.now()
+    for substance in current:
+        key = str(substance.id)
+        found.add(key)
+        new_price = parsed[key]
+        if substance.preco_padrao == new_price:
+            continue
+        history.append(SubstancePriceHistory(
+            substance=substance,
+            preco_anterior=substance.preco_padrao,
+            preco_novo=new_price,
+            vigente_desde=vigente_desde,
+            alterado_por=user,
+        ))
+        substance.preco_padrao = new_price
+        substance.updated_at = now
+        changed.append(substance)
+
+    for missing in set(parsed) - found:
+        errors.append({'substance_id': missing, 'error': 'Substância não encontrada'})
+
+    if changed:
+        with transaction.atomic():
+            Substance.objects.bulk_update(changed, ['preco_padrao', 'updated_at'])
+            SubstancePriceHistory.objects.bulk_create(history)
+            # bulk_update não dispara sinais: a matriz de protocolos é invalidada aqui
+            protocol_matrix.bump()
+
+    return {
+        'updated': [str(s.id) for s in changed],
+        'unchanged': len(found) - len(changed),
+        'errors': errors,
+    }
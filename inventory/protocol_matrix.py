@@ -0,0 +1,136 @@
+"""
+Matriz protocolo × unidade: custo atual e sessões completas que o estoque
+de cada unidade comporta.
+
+O cálculo usa quatro consultas: protocolos ativos, suas substâncias (com
+o preço), saldo agrupado por (unidade, substância) nos lotes dentro da
+validade e unidades ativas. O cruzamento é feito em memória.
+
+O resultado fica em cache no processo, marcado com a versão compartilhada
+``CacheVersion('protocol_matrix')``. Movimentações, saldos, preços e
+protocolos incrementam a versão após o commit (``bump``: sinais e
+``pricing.apply_price_changes``, cujo ``bulk_update`` não dispara sinais);
+cada processo confere a versão (uma leitura) antes de usar o cache e o
+refaz quando ela mudou ou na virada do dia (lotes que vencem deixam de
+contar).
+"""
+from decimal import Decimal
+from threading import Lock
+
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+VERSION_NAME = 'protocol_matrix'
+
+_matrix = None
+_matrix_lock = Lock()
+
+
+def current_version():
+    from .models import CacheVersion
+
+    return CacheVersion.current(VERSION_NAME)
+
+
+def bump(**kwargs):
+    """Invalida a matriz em todos os processos (após o commit da transação atual)."""
+    from .models import CacheVersion
+
+    CacheVersion.bump(VERSION_NAME)
+
+
+def _protocols():
+    """{protocolo: {'name', 'substances': [...]}} dos protocolos ativos."""
+    from .models import ProtocolSubstance, ProtocolTemplate
+
+    protocols = {
+        pk: {'id': pk, 'name': name, 'substances': []}
+        for pk, name in ProtocolTemplate.objects.filter(is_active=True).values_list('id', 'name')
+    }
+    rows = ProtocolSubstance.objects.filter(protocol__is_active=True).values_list(
+        'protocol_id', 'substance_id', 'substance__nome_comum', 'substance__preco_padrao',
+        'default_quantity', 'is_optional',
+    ).order_by('order')
+    for protocol_id, substance_id, name, price, quantity, optional in rows:
+        protocols[protocol_id]['substances'].append({
+            'substance_id': substance_id,
+            'name': name,
+            'price': price,
+            'quantity': quantity,
+            'optional': optional,
+        })
+    return protocols
+
+
+def _stock(today):
+    """{(unidade, substância): saldo} nos lotes não vencidos."""
+    from .models import Inventory
+
+    rows = Inventory.objects.filter(
+        quantity_on_hand__gt=0, batch__validade__gte=today
+    ).values_list('unit_id', 'substance_id').annotate(total=Sum('quantity_on_hand'))
+    return {(unit_id, substance_id): total for unit_id, substance_id, total in rows}
+
+
+def build_matrix(today=None):
+    from .models import Unit
+
+    today = today or timezone.localdate()
+    protocols = _protocols()
+    stock = _stock(today)
+    units = list(Unit.objects.filter(ativo=True).order_by('nome').values_list('id', 'nome'))
+
+    rows = []
+    for protocol in sorted(protocols.values(), key=lambda p: p['name'].lower()):
+        required = [s for s in protocol['substances'] if not s['optional']]
+        optional = [s for s in protocol['substances'] if s['optional']]
+        cells = []
+        for unit_id, unit_name in units:
+            sessions = None
+            limiting = None
+            for substance in required:
+                if substance['quantity'] <= 0:
+                    continue
+                supported = int(stock.get((unit_id, substance['substance_id']), Decimal('0')) // substance['quantity'])
+                if sessions is None or supported < sessions:
+                    sessions, limiting = supported, substance['name']
+            cells.append({'unit_id': unit_id, 'unit': unit_name, 'sessions': sessions, 'limiting': limiting})
+        rows.append({
+            'protocol_id': protocol['id'],
+            'name': protocol['name'],
+            'cost': sum((s['quantity'] * s['price'] for s in required), Decimal('0')),
+            'optional_cost': sum((s['quantity'] * s['price'] for s in optional), Decimal('0')),
+            'cells': cells,
+        })
+
+    return {
+        'date': today,
+        'generated_at': timezone.now(),
+        'units': [{'id': unit_id, 'nome': nome} for unit_id, nome in units],
+        'rows': rows,
+    }
+
+
+def get_matrix():
+    global _matrix
+    today = timezone.localdate()
+    version = current_version()
+    with _matrix_lock:
+        if _matrix is not None:
+            matrix, loaded_version = _matrix
+            if matrix['date'] == today and loaded_version == version:
+                return matrix
+    matrix = build_matrix(today)
+    with _matrix_lock:
+        _matrix = (matrix, version)
+    return matrix
+
+
+def connect_signals():
+    from .models import Batch, Inventory, ProtocolSubstance, ProtocolTemplate, StockMovement, Substance, Unit
+
+    for sender in (Inventory, StockMovement, Batch, Substance, ProtocolTemplate, ProtocolSubstance, Unit):
+        uid = f'protocol_matrix:{sender.__name__}'
+        post_save.connect(bump, sender=sender, weak=False, dispatch_uid=f'{uid}:save')
+        post_delete.connect(bump, sender=sender, weak=False, dispatch_uid=f'{uid}:delete')
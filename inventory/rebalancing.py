@@ -0,0 +1,269 @@
+"""
+Planejador de transferências entre unidades.
+
+Entradas (duas consultas para o catálogo inteiro, só unidades ativas):
+lotes com saldo livre (em estoque − reservado) e validade, e o consumo
+recente de cada (substância, unidade) a partir das saídas de
+``StockMovement``.
+
+Para cada substância, o consumo de cada unidade é projetado em FEFO sobre o
+horizonte (``REBALANCE_HORIZON_DAYS``): um lote só é aproveitado até a sua
+validade, à taxa de consumo da unidade. Daí saem a falta prevista de cada
+unidade e o excedente de cada lote, marcado "em risco" quando o lote vence
+antes de ser usado.
+
+O guloso resolve em duas passadas:
+
+1. Faltas: cada unidade em falta (da maior para a menor) recebe excedentes
+   de outras unidades, primeiro dos lotes em risco, depois dos que vencem
+   antes, desde que ainda tenham ``REBALANCE_MIN_SHELF_DAYS`` de validade.
+2. Vencimento: o que continua em risco vai para a unidade que consome mais
+   rápido e consegue usar o lote antes de vencer.
+
+Os movimentos são agrupados por (origem, destino) em ``TransferNew`` com
+status ``rascunho`` (``create_drafts``), para conferência e envio
+(``transfers.send_draft``). Rascunhos não movimentam estoque, então o plano
+não os enxerga: cada novo conjunto de rascunhos cancela os que ainda estavam
+abertos. Na tela de sugestões, os movimentos conferidos voltam no POST e são
+revalidados (``moves_from_rows``) em vez de recalculados.
+"""
+import math
+import uuid
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+Move = namedtuple('Move', ['substance_id', 'batch_id', 'origem_id', 'destino_id', 'quantidade', 'motivo'])
+
+MOTIVOS = {
+    'ruptura': 'Cobrir falta prevista',
+    'vencimento': 'Evitar vencimento sem uso',
+}
+
+
+class _Lot:
+    __slots__ = ('batch_id', 'unit_id', 'days_left', 'free', 'usable', 'at_risk')
+
+    def __init__(self, batch_id, unit_id, days_left, free):
+        self.batch_id = batch_id
+        self.unit_id = unit_id
+        self.days_left = days_left
+        self.free = free
+        self.usable = 0.0
+        self.at_risk = False
+
+    @property
+    def excess(self):
+        return self.free - self.usable
+
+
+def load_rates(today, days):
+    """Consumo diário de cada (substância, unidade) nos últimos ``days`` dias."""
+    from .models import StockMovement
+
+    since = timezone.make_aware(datetime.combine(today - timedelta(days=days), time.min))
+    rows = StockMovement.objects.filter(tipo='saida', data_hora__gte=since, unit__ativo=True).values_list(
+        'substance_id', 'unit_id'
+    ).annotate(total=Sum('quantidade')).order_by()
+    return {(substance_id, unit_id): float(total) / days for substance_id, unit_id, total in rows}
+
+
+def load_lots(today):
+    """{substância: [_Lot]} dos lotes com saldo livre e dentro da validade."""
+    from .models import Inventory
+
+    rows = Inventory.objects.filter(
+        quantity_on_hand__gt=F('quantity_reserved'),
+        batch__validade__gte=today,
+        unit__ativo=True,
+    ).values_list(
+        'substance_id', 'unit_id', 'batch_id', 'batch__validade', 'quantity_on_hand', 'quantity_reserved'
+    ).order_by('batch__validade')
+    lots = defaultdict(list)
+    for substance_id, unit_id, batch_id, validade, on_hand, reserved in rows:
+        lots[substance_id].append(_Lot(batch_id, unit_id, (validade - today).days, float(on_hand - reserved)))
+    return lots
+
+
+def _project(lots, rate, horizon):
+    """Consumo FEFO de uma unidade: marca ``usable``/``at_risk`` e retorna o consumo coberto."""
+    consumed = 0.0
+    for lot in sorted(lots, key=lambda lot: lot.days_left):
+        capacity = rate * min(lot.days_left, horizon) - consumed
+        lot.usable = max(0.0, min(lot.free, capacity))
+        lot.at_risk = lot.days_left <= horizon and lot.usable < lot.free
+        consumed += lot.usable
+    return consumed
+
+
+def plan_substance(substance_id, lots, rates, horizon, min_shelf, min_quantity):
+    """Movimentos sugeridos para uma substância; ``rates``: {unidade: consumo diário}."""
+    units = {lot.unit_id for lot in lots} | set(rates)
+    rate = {unit_id: rates.get(unit_id, 0.0) for unit_id in units}
+    by_unit = defaultdict(list)
+    for lot in lots:
+        by_unit[lot.unit_id].append(lot)
+
+    shortage = {}
+    for unit_id in units:
+        covered = _project(by_unit[unit_id], rate[unit_id], horizon)
+        shortage[unit_id] = rate[unit_id] * horizon - covered
+
+    moves = []
+
+    def move(lot, destino_id, quantity, motivo):
+        quantity = math.floor(quantity)
+        if quantity < min_quantity:
+            return 0
+        lot.free -= quantity
+        moves.append(Move(substance_id, lot.batch_id, lot.unit_id, destino_id, Decimal(quantity), motivo))
+        return quantity
+
+    # 1. Faltas previstas
+    for unit_id in sorted(units, key=lambda u: -shortage[u]):
+        if shortage[unit_id] < min_quantity:
+            continue
+        donors = sorted(
+            (lot for lot in lots if lot.unit_id != unit_id and lot.excess >= min_quantity and lot.days_left >= min_shelf),
+            key=lambda lot: (not lot.at_risk, lot.days_left),
+        )
+        for lot in donors:
+            if shortage[unit_id] < min_quantity:
+                break
+            # Só o que a unidade de destino consegue usar antes da validade
+            usable_there = rate[unit_id] * min(lot.days_left, horizon)
+            moved = move(lot, unit_id, min(lot.excess, shortage[unit_id], usable_there), 'ruptura')
+            shortage[unit_id] -= moved
+
+    # Capacidade que cada unidade ainda tem até a validade de cada lote recebido
+    inbound = defaultdict(float)
+    for m in moves:
+        inbound[m.destino_id] += float(m.quantidade)
+
+    # 2. Lotes que venceriam sem uso
+    for lot in sorted(lots, key=lambda lot: lot.days_left):
+        if not lot.at_risk or lot.excess < min_quantity or lot.days_left < min_shelf:
+            continue
+        for unit_id in sorted(units, key=lambda u: -rate[u]):
+            if unit_id == lot.unit_id or rate[unit_id] <= 0:
+                continue
+            own = sum(
+                min(other.free, rate[unit_id] * other.days_left)
+                for other in by_unit[unit_id] if other.days_left <= lot.days_left
+            )
+            capacity = rate[unit_id] * lot.days_left - own - inbound[unit_id]
+            if capacity >= min_quantity:
+                inbound[unit_id] += move(lot, unit_id, min(lot.excess, capacity), 'vencimento')
+            if lot.excess < min_quantity:
+                break
+    return moves
+
+
+def plan(today=None, horizon=None, history_days=None):
+    """Movimentos sugeridos para o catálogo inteiro."""
+    today = today or timezone.localdate()
+    horizon = horizon or getattr(settings, 'REBALANCE_HORIZON_DAYS', 30)
+    history_days = history_days or getattr(settings, 'REBALANCE_HISTORY_DAYS', 60)
+    min_shelf = getattr(settings, 'REBALANCE_MIN_SHELF_DAYS', 7)
+    min_quantity = getattr(settings, 'REBALANCE_MIN_QUANTITY', 1)
+
+    rates = defaultdict(dict)
+    for (substance_id, unit_id), rate in load_rates(today, history_days).items():
+        rates[substance_id][unit_id] = rate
+    moves = []
+    # Sem lote com saldo livre não há o que transferir
+    for substance_id, lots in load_lots(today).items():
+        moves.extend(plan_substance(substance_id, lots, rates[substance_id], horizon, min_shelf, min_quantity))
+    return moves
+
+
+def group_moves(moves):
+    """{(origem, destino): [Move]}"""
+    groups = defaultdict(list)
+    for m in moves:
+        groups[(m.origem_id, m.destino_id)].append(m)
+    return dict(groups)
+
+
+def moves_from_rows(rows):
+    """
+    Movimentos a partir de linhas conferidas ``(lote, destino, quantidade,
+    motivo)``. Origem e substância vêm do lote; a soma por lote não pode
+    passar do saldo livre atual. Levanta ``ValueError`` na primeira linha
+    inválida.
+    """
+    from .models import Inventory, Unit
+
+    rows = list(rows)
+    try:
+        batch_ids = {uuid.UUID(str(batch_id)) for batch_id, _, _, _ in rows}
+        unit_ids = {uuid.UUID(str(destino_id)) for _, destino_id, _, _ in rows}
+    except ValueError:
+        raise ValueError('Movimento inválido.')
+    lots = {
+        batch_id: (substance_id, unit_id, on_hand - reserved)
+        for batch_id, substance_id, unit_id, on_hand, reserved in Inventory.objects.filter(
+            batch_id__in=batch_ids, unit_id=F('batch__unit_id')
+        ).values_list('batch_id', 'substance_id', 'unit_id', 'quantity_on_hand', 'quantity_reserved')
+    }
+    units = set(Unit.objects.filter(id__in=unit_ids, ativo=True).values_list('id', flat=True))
+
+    moves = []
+    taken = defaultdict(Decimal)
+    for batch_id, destino_id, quantidade, motivo in rows:
+        batch_id, destino_id = uuid.UUID(str(batch_id)), uuid.UUID(str(destino_id))
+        try:
+            quantidade = Decimal(str(quantidade))
+        except InvalidOperation:
+            quantidade = None
+        if quantidade is not None and quantidade.is_finite() and quantidade.adjusted() < 10:
+            quantidade = quantidade.quantize(Decimal('0.01'))
+        if quantidade is None or not quantidade.is_finite() or quantidade <= 0:
+            raise ValueError('Quantidade inválida.')
+        if batch_id not in lots or destino_id not in units or motivo not in MOTIVOS:
+            raise ValueError('Movimento inválido.')
+        substance_id, origem_id, free = lots[batch_id]
+        if origem_id == destino_id:
+            raise ValueError('Movimento inválido.')
+        taken[batch_id] += quantidade
+        if taken[batch_id] > free:
+            raise ValueError(f'Quantidade acima do saldo livre do lote (disponível: {free}).')
+        moves.append(Move(substance_id, batch_id, origem_id, destino_id, quantidade, motivo))
+    return moves
+
+
+def create_drafts(moves, user=None):
+    """
+    Uma ``TransferNew`` (rascunho) por par de unidades, com um item por lote.
+    Os rascunhos ainda abertos são cancelados: o plano novo os substitui.
+    """
+    from .models import TransferItemNew, TransferNew
+
+    transfers = []
+    with transaction.atomic():
+        TransferNew.objects.filter(status='rascunho').update(status='cancelada')
+        for (origem_id, destino_id), items in group_moves(moves).items():
+            transfer = TransferNew.objects.create(
+                unidade_origem_id=origem_id,
+                unidade_destino_id=destino_id,
+                status='rascunho',
+                observacoes='Sugestão do planejador de transferências.',
+                criado_por=user,
+            )
+            TransferItemNew.objects.bulk_create([
+                TransferItemNew(
+                    transfer=transfer,
+                    substance_id=m.substance_id,
+                    batch_origem_id=m.batch_id,
+                    quantidade=m.quantidade,
+                    observacoes=MOTIVOS[m.motivo],
+                )
+                for m in items
+            ])
+            transfers.append(transfer)
+    return transfers
@@ -0,0 +1,129 @@
+"""
+Simulação de políticas de estoque mínimo sobre o histórico de saídas.
+
+Cada série (substância, unidade) tem seu consumo diário histórico
+(``forecasting.load_series``) reaplicado sob várias políticas (mínimo,
+máximo) em dias de cobertura do consumo médio da série:
+
+- ao fim de cada dia, se em estoque + em trânsito ≤ mínimo, pede-se até o
+  máximo, que chega após o prazo de reposição;
+- o estoque é guardado por idade (uma coluna por dia desde o recebimento)
+  e consumido em FEFO (mais antigo primeiro); o que passa da validade
+  típica da substância é perdido.
+
+O estado é um conjunto de matrizes ``séries × políticas × idade``: o laço é
+sobre os dias, nunca sobre séries ou políticas. ``simulate`` não acessa o
+banco e pode rodar em processos separados sobre fatias das séries
+(comando ``simulate_min_stock``).
+"""
+from collections import defaultdict
+from statistics import median
+
+import numpy as np
+from django.conf import settings
+
+
+def load_shelf_life(substance_ids):
+    """{substância: validade típica (mediana, em dias) dos lotes recebidos}"""
+    from .models import Batch
+
+    default = getattr(settings, 'SIMULATION_DEFAULT_SHELF_DAYS', 180)
+    samples = defaultdict(list)
+    for substance_id, validade, created_at in Batch.objects.filter(substance_id__in=substance_ids).values_list(
+        'substance_id', 'validade', 'created_at'
+    ):
+        days = (validade - created_at.date()).days
+        if days > 0:
+            samples[substance_id].append(days)
+    return {substance_id: int(median(samples[substance_id])) if samples[substance_id] else default
+            for substance_id in substance_ids}
+
+
+def load_current_minimums(keys):
+    """Estoque mínimo configurado hoje (``SubstanceUnitConfig`` ou o padrão da substância)."""
+    from .models import Substance, SubstanceUnitConfig
+
+    configured = {
+        (substance_id, unit_id): float(minimo)
+        for substance_id, unit_id, minimo in SubstanceUnitConfig.objects.values_list(
+            'substance_id', 'unit_id', 'estoque_minimo'
+        )
+    }
+    defaults = dict(Substance.objects.filter(id__in={s for s, _ in keys}).values_list('id', 'estoque_minimo_default'))
+    return np.array([configured.get(key, float(defaults.get(key[0]) or 0)) for key in keys])
+
+
+def simulate(demand, shelf_life, minimums, maximums, lead_time):
+    """
+    Reaplica ``demand`` (séries × dias) sob cada política.
+
+    ``shelf_life``: validade (dias) de cada série; ``minimums``/``maximums``:
+    séries × políticas. Retorna um dicionário de matrizes séries × políticas:
+    ``dias_ruptura``, ``estoque_medio``, ``perda_vencimento``,
+    ``falta`` (quantidade não atendida) e ``pedidos``.
+    """
+    series, days = demand.shape
+    policies = minimums.shape[1]
+    lead_time = max(int(lead_time), 1)
+    ages = int(max(shelf_life.max(initial=1), 1))
+
+    # Estoque por idade; começa cheio, como recém-recebido
+    stock = np.zeros((series, policies, ages))
+    stock[:, :, 0] = maximums
+    expires = (np.arange(ages) >= shelf_life[:, None] - 1)[:, None, :]
+    pipeline = np.zeros((lead_time, series, policies))
+
+    stockout_days = np.zeros((series, policies))
+    inventory_sum = np.zeros((series, policies))
+    expired = np.zeros((series, policies))
+    shortfall = np.zeros((series, policies))
+    orders = np.zeros((series, policies))
+
+    for day in range(days):
+        slot = day % lead_time
+        # Envelhece um dia e descarta o que venceu
+        expired += (stock * expires).sum(axis=2)
+        stock[:, :, 1:] = np.where(expires[:, :, :-1], 0.0, stock[:, :, :-1])
+        stock[:, :, 0] = pipeline[slot]
+        pipeline[slot] = 0.0
+
+        # Consumo FEFO: acumulado do mais antigo para o mais novo
+        need = demand[:, day][:, None, None]
+        cumulative = np.cumsum(stock[:, :, ::-1], axis=2)
+        left = np.maximum(cumulative - need, 0.0)
+        stock = np.diff(left, axis=2, prepend=0.0)[:, :, ::-1]
+
+        missing = np.maximum(need[:, :, 0] - cumulative[:, :, -1], 0.0)
+        shortfall += missing
+        stockout_days += missing > 1e-9
+
+        on_hand = left[:, :, -1]
+        inventory_sum += on_hand
+        position = on_hand + pipeline.sum(axis=0)
+        order = np.where(position <= minimums, maximums - position, 0.0)
+        pipeline[slot] += order
+        orders += order > 0
+
+    return {
+        'dias_ruptura': stockout_days,
+        'estoque_medio': inventory_sum / max(days, 1),
+        'perda_vencimento': expired,
+        'falta': shortfall,
+        'pedidos': orders,
+    }
+
+
+def choose(results, max_stockout_days):
+    """
+    Índice da política sugerida para cada série: entre as que ficam até
+    ``max_stockout_days`` em ruptura, a de menor perda e depois a de menor
+    estoque médio; se nenhuma atende, a de menos dias em ruptura.
+    """
+    stockouts = results['dias_ruptura']
+    feasible = stockouts <= max_stockout_days
+    first = np.where(feasible, results['perda_vencimento'], stockouts)
+    # Séries sem política viável comparam só as inviáveis (e vice-versa)
+    group = feasible | ~feasible.any(axis=1, keepdims=True)
+    first = np.where(group, first, np.inf)
+    tied = group & (first <= first.min(axis=1, keepdims=True) + 1e-9)
+    return np.where(tied, results['estoque_medio'], np.inf).argmin(axis=1)
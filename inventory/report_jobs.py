@@ -0,0 +1,149 @@
+"""
+Fila de relatórios em segundo plano (tabela ``ReportJob``).
+
+A view chama ``request_report``, que calcula a chave tipo + filtros +
+versão dos dados. Se já existe um job com essa chave na fila, em execução
+ou concluído há menos de ``REPORT_CACHE_MAX_AGE`` segundos, ele é
+reaproveitado. Caso contrário, um novo job entra na fila.
+
+O comando ``run_report_worker`` reserva os jobs (``claim_jobs``) e executa
+``run_job`` em um pool de processos. O arquivo fica em
+``REPORT_CACHE_DIR/<cache_key>.<ext>``, portanto worker e servidor web
+precisam compartilhar o disco.
+
+A versão dos dados é a contagem e a data da última alteração das tabelas
+de que o relatório depende (``REPORTS[...]['sources']``). Qualquer inclusão,
+exclusão ou edição muda a chave, e o arquivo antigo deixa de ser usado.
+"""
+import hashlib
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import ReportJob
+from .reports import REPORTS
+
+
+def get_cache_dir():
+    return Path(getattr(settings, 'REPORT_CACHE_DIR', Path(settings.BASE_DIR) / 'report_cache'))
+
+
+def normalize_filters(report_type, params):
+    """Apenas os filtros aceitos pelo relatório, sem valores vazios."""
+    return {
+        name: params.get(name)
+        for name in REPORTS[report_type]['filters']
+        if params.get(name)
+    }
+
+
+def data_version(report_type):
+    parts = []
+    for model, field in REPORTS[report_type]['sources']:
+        stats = model.objects.aggregate(count=Count('pk'), last=Max(field))
+        parts.append(f"{model._meta.label_lower}:{stats['count']}:{stats['last'].isoformat() if stats['last'] else ''}")
+    return '|'.join(parts)
+
+
+def make_cache_key(report_type, filters, version):
+    payload = json.dumps([report_type, filters, version], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def result_path(job):
+    return get_cache_dir() / job.result_file
+
+
+def request_report(report_type, params, user):
+    """
+    Job do usuário para o relatório pedido: um dele reaproveitado ou um novo,
+    na fila. Cada job pertence a quem o pediu; um arquivo ainda válido gerado
+    para outro usuário é reaproveitado em um job já concluído deste usuário.
+    """
+    filters = normalize_filters(report_type, params)
+    cache_key = make_cache_key(report_type, filters, data_version(report_type))
+    fresh_since = timezone.now() - timedelta(seconds=getattr(settings, 'REPORT_CACHE_MAX_AGE', 86400))
+
+    shared = None
+    for job in ReportJob.objects.filter(cache_key=cache_key, status__in=['pending', 'running', 'done']):
+        if job.status != 'done':
+            if job.requested_by_id == user.pk:
+                return job
+        elif job.finished_at >= fresh_since and result_path(job).exists():
+            if job.requested_by_id == user.pk:
+                return job
+            shared = shared or job
+
+    if shared is not None:
+        return ReportJob.objects.create(
+            report_type=report_type, filters=filters, cache_key=cache_key, requested_by=user,
+            status='done', result_file=shared.result_file, finished_at=shared.finished_at,
+        )
+
+    return ReportJob.objects.create(
+        report_type=report_type, filters=filters, cache_key=cache_key, requested_by=user
+    )
+
+
+def claim_jobs(limit):
+    """Reserva até ``limit`` jobs da fila (seguro com vários workers)."""
+    claimed = []
+    for job_id in ReportJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)[:limit]:
+        if ReportJob.objects.filter(id=job_id, status='pending').update(status='running', started_at=timezone.now()):
+            claimed.append(job_id)
+    return claimed
+
+
+def run_job(job_id):
+    """Gera o arquivo do job (executado no processo do pool); retorna o nome do arquivo."""
+    job = ReportJob.objects.get(id=job_id)
+    report = REPORTS[job.report_type]
+    cache_dir = get_cache_dir()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    filename = f'{job.cache_key}{Path(report["filename"]).suffix}'
+    tmp_path = cache_dir / f'.{filename}.{os.getpid()}.tmp'
+    try:
+        # utf-8-sig: o Excel reconhece a acentuação do CSV
+        with open(tmp_path, 'w', newline='', encoding='utf-8-sig') as stream:
+            report['writer'](job.filters, stream)
+        os.replace(tmp_path, cache_dir / filename)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return filename
+
+
+def finish_job(job_id, result_file='', error=''):
+    ReportJob.objects.filter(id=job_id).update(
+        status='failed' if error else 'done',
+        result_file=result_file,
+        error=error,
+        finished_at=timezone.now(),
+    )
+
+
+def requeue_stale_jobs():
+    """Devolve à fila jobs que ficaram 'em execução' (worker interrompido)."""
+    stale_since = timezone.now() - timedelta(seconds=getattr(settings, 'REPORT_JOB_TIMEOUT', 1800))
+    return ReportJob.objects.filter(status='running', started_at__lt=stale_since).update(
+        status='pending', started_at=None
+    )
+
+
+def purge_expired():
+    """Remove arquivos e jobs concluídos há mais de ``REPORT_CACHE_MAX_AGE``."""
+    expired_before = timezone.now() - timedelta(seconds=getattr(settings, 'REPORT_CACHE_MAX_AGE', 86400))
+    expired = ReportJob.objects.filter(status__in=['done', 'failed'], finished_at__lt=expired_before)
+    in_use = set(
+        ReportJob.objects.filter(status='done', finished_at__gte=expired_before).values_list('result_file', flat=True)
+    )
+    for result_file in expired.exclude(result_file='').values_list('result_file', flat=True):
+        if result_file not in in_use:
+            (get_cache_dir() / result_file).unlink(missing_ok=True)
+    return expired.delete()[0]
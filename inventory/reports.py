@@ -0,0 +1,175 @@
+"""
+Consultas e geradores dos relatórios de pacientes e financeiro.
+
+Usados pela página de relatório (``views_reports``) e pelos jobs de
+``inventory.report_jobs``. Cada gerador recebe os filtros já normalizados
+e escreve o arquivo em ``stream`` (texto).
+"""
+import csv
+from collections import defaultdict
+from datetime import datetime
+
+from django.db.models import Count, Max, Q
+
+from .models import Patient, PatientSession, SessionSubstance, StockMovement, Substance
+
+PATIENT_FILTERS = ['professional', 'unit', 'substance', 'date_from', 'date_to', 'status']
+FINANCIAL_FILTERS = ['unit', 'substance', 'date_from', 'date_to']
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_patients(filters):
+    """Pacientes que atendem aos filtros (sessões do profissional/substância/período)."""
+    patients = Patient.objects.all()
+
+    status_filter = filters.get('status', 'active')
+    if status_filter == 'active':
+        patients = patients.filter(ativo=True)
+    elif status_filter == 'inactive':
+        patients = patients.filter(ativo=False)
+
+    if filters.get('unit'):
+        patients = patients.filter(unidade_principal_id=filters['unit'])
+
+    session_filters = Q()
+    if filters.get('professional'):
+        session_filters &= Q(sessions__created_by_id=filters['professional'])
+    if filters.get('substance'):
+        session_filters &= Q(sessions__substances__substance_id=filters['substance'])
+    date_from = _parse_date(filters.get('date_from'))
+    if date_from:
+        session_filters &= Q(sessions__session_date__gte=date_from)
+    date_to = _parse_date(filters.get('date_to'))
+    if date_to:
+        session_filters &= Q(sessions__session_date__lte=date_to)
+
+    if session_filters:
+        patients = patients.filter(id__in=Patient.objects.filter(session_filters).values('id'))
+    return patients
+
+
+def patients_with_stats(patients):
+    """
+    Estatísticas de sessões por paciente em quatro consultas (em vez de
+    quatro por paciente).
+    """
+    patients = list(
+        patients.select_related('unidade_principal').annotate(
+            total_sessions=Count('sessions', distinct=True),
+            last_session_date=Max('sessions__session_date'),
+        ).order_by('nome')
+    )
+    patient_ids = [patient.id for patient in patients]
+
+    professionals = defaultdict(list)
+    for patient_id, username in PatientSession.objects.filter(
+        patient_id__in=patient_ids, created_by__isnull=False
+    ).values_list('patient_id', 'created_by__username').distinct().order_by('created_by__username'):
+        professionals[patient_id].append(username)
+
+    substances = defaultdict(list)
+    for patient_id, nome in SessionSubstance.objects.filter(
+        session__patient_id__in=patient_ids
+    ).values_list('session__patient_id', 'substance__nome_comum').distinct().order_by('substance__nome_comum'):
+        substances[patient_id].append(nome)
+
+    return [
+        {
+            'patient': patient,
+            'last_session_date': patient.last_session_date,
+            'total_sessions': patient.total_sessions,
+            'professionals': professionals[patient.id],
+            'substances_used': substances[patient.id],
+        }
+        for patient in patients
+    ]
+
+
+def write_patients_csv(filters, stream):
+    writer = csv.writer(stream)
+    writer.writerow([
+        'Código',
+        'Nome',
+        'Unidade',
+        'Status',
+        'Total Sessões',
+        'Última Sessão',
+        'Profissionais',
+        'Substâncias Utilizadas'
+    ])
+    for row in patients_with_stats(filter_patients(filters)):
+        patient = row['patient']
+        writer.writerow([
+            patient.codigo,
+            patient.nome,
+            patient.unidade_principal.nome if patient.unidade_principal else '',
+            'Ativo' if patient.ativo else 'Inativo',
+            row['total_sessions'],
+            row['last_session_date'].strftime('%d/%m/%Y') if row['last_session_date'] else '',
+            ', '.join(row['professionals']),
+            ', '.join(row['substances_used']),
+        ])
+
+
+def write_financial_csv(filters, stream):
+    """Saídas de estoque valorizadas pelo preço padrão da substância."""
+    movements = StockMovement.objects.filter(tipo='saida')
+    if filters.get('unit'):
+        movements = movements.filter(unit_id=filters['unit'])
+    if filters.get('substance'):
+        movements = movements.filter(substance_id=filters['substance'])
+    date_from = _parse_date(filters.get('date_from'))
+    if date_from:
+        movements = movements.filter(data_hora__date__gte=date_from)
+    date_to = _parse_date(filters.get('date_to'))
+    if date_to:
+        movements = movements.filter(data_hora__date__lte=date_to)
+
+    writer = csv.writer(stream)
+    writer.writerow([
+        'Data', 'Unidade', 'Paciente', 'Substância', 'Lote', 'Quantidade', 'Preço Unitário', 'Valor'
+    ])
+    rows = movements.order_by('data_hora').values_list(
+        'data_hora', 'unit__nome', 'paciente__nome', 'substance__nome_comum', 'batch__lote',
+        'quantidade', 'substance__preco_padrao',
+    )
+    for data_hora, unidade, paciente, substancia, lote, quantidade, preco in rows.iterator(chunk_size=2000):
+        preco = preco or 0
+        writer.writerow([
+            data_hora.strftime('%d/%m/%Y %H:%M'), unidade, paciente or '', substancia, lote,
+            quantidade, preco, quantidade * preco,
+        ])
+
+
+# Tipo de relatório -> filtros aceitos, gerador, arquivo e tabelas das quais
+# depende (modelo, campo de data que muda a cada alteração)
+REPORTS = {
+    'patients_csv': {
+        'filters': PATIENT_FILTERS,
+        'writer': write_patients_csv,
+        'filename': 'relatorio_pacientes.csv',
+        'content_type': 'text/csv',
+        'sources': [
+            (Patient, 'updated_at'),
+            (PatientSession, 'updated_at'),
+            (SessionSubstance, 'created_at'),
+        ],
+    },
+    'financial_csv': {
+        'filters': FINANCIAL_FILTERS,
+        'writer': write_financial_csv,
+        'filename': 'relatorio_financeiro.csv',
+        'content_type': 'text/csv',
+        'sources': [
+            (StockMovement, 'data_hora'),
+            (Substance, 'updated_at'),
+            (Patient, 'updated_at'),
+        ],
+    },
+}
@@ -0,0 +1,282 @@
+"""
+Reservas de estoque para sessões agendadas (available-to-promise).
+
+Uma reserva prende uma quantidade de um lote específico (FEFO, válido na
+data agendada) para o paciente. A quantidade reservada fica em
+``Inventory.quantity_reserved``; saídas avulsas, sessões, transferências
+(``inventory.transfers``) e novas reservas só usam
+``quantity_on_hand - quantity_reserved``.
+
+``StockAvailability`` guarda o saldo e o reservado de cada (substância,
+unidade). Cada gravação de ``Inventory`` aplica a diferença em relação ao
+valor lido do banco (``connect_signals``), então consultar o disponível lê
+uma linha, sem somar lotes nem reservas. ``rebuild_availability`` recalcula
+a tabela inteira (após cargas em massa com ``update``/``bulk_create``).
+
+Reservas vencidas (``expira_em``) são liberadas por ``expire_reservations``,
+chamado antes de cada nova reserva e pelo comando ``expire_reservations``.
+Ao registrar a sessão, ``consume_reservations`` converte as reservas do
+paciente em ``StockMovement`` de saída dos lotes reservados.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+ZERO = Decimal('0')
+
+
+class InsufficientStock(ValueError):
+    pass
+
+
+def hold_until(data_agendada):
+    """Fim do dia agendado mais a tolerância ``RESERVATION_GRACE_HOURS``."""
+    end_of_day = timezone.make_aware(datetime.combine(data_agendada + timedelta(days=1), time.min))
+    return end_of_day + timedelta(hours=getattr(settings, 'RESERVATION_GRACE_HOURS', 12))
+
+
+# Saldo agregado por (substância, unidade)
+
+def refresh_availability(substance_id, unit_id):
+    """Recalcula a linha de ``StockAvailability`` a partir dos lotes."""
+    from .models import Inventory, StockAvailability
+
+    totals = Inventory.objects.filter(substance_id=substance_id, unit_id=unit_id).aggregate(
+        on_hand=Sum('quantity_on_hand'), reserved=Sum('quantity_reserved')
+    )
+    StockAvailability.objects.update_or_create(
+        substance_id=substance_id, unit_id=unit_id,
+        defaults={'on_hand': totals['on_hand'] or ZERO, 'reserved': totals['reserved'] or ZERO},
+    )
+
+
+def _apply_delta(substance_id, unit_id, on_hand, reserved):
+    from .models import StockAvailability
+
+    if not on_hand and not reserved:
+        return
+    updated = StockAvailability.objects.filter(substance_id=substance_id, unit_id=unit_id).update(
+        on_hand=F('on_hand') + on_hand, reserved=F('reserved') + reserved, updated_at=timezone.now()
+    )
+    if not updated:
+        refresh_availability(substance_id, unit_id)
+
+
+def rebuild_availability():
+    """Recalcula toda a tabela ``StockAvailability``; retorna o número de linhas."""
+    from .models import Inventory, StockAvailability
+
+    rows = Inventory.objects.values('substance_id', 'unit_id').annotate(
+        on_hand=Sum('quantity_on_hand'), reserved=Sum('quantity_reserved')
+    ).order_by()
+    with transaction.atomic():
+        StockAvailability.objects.all().delete()
+        StockAvailability.objects.bulk_create([StockAvailability(**row) for row in rows])
+    return len(rows)
+
+
+def get_available(substance, unit):
+    """Quantidade disponível para novas saídas e reservas (em estoque − reservado)."""
+    from .models import StockAvailability
+
+    row = StockAvailability.objects.filter(substance=substance, unit=unit).first()
+    return row.available if row else ZERO
+
+
+def _loaded(instance):
+    return getattr(instance, '_loaded_quantities', (None, None))
+
+
+def _track_inventory_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_on_hand, old_reserved = (ZERO, ZERO) if created else _loaded(instance)
+    if old_on_hand is None or old_reserved is None:
+        refresh_availability(instance.substance_id, instance.unit_id)
+    else:
+        _apply_delta(
+            instance.substance_id, instance.unit_id,
+            Decimal(str(instance.quantity_on_hand)) - old_on_hand,
+            Decimal(str(instance.quantity_reserved)) - old_reserved,
+        )
+    instance._loaded_quantities = (
+        Decimal(str(instance.quantity_on_hand)), Decimal(str(instance.quantity_reserved))
+    )
+
+
+def _track_inventory_delete(sender, instance, **kwargs):
+    old_on_hand, old_reserved = _loaded(instance)
+    if old_on_hand is None or old_reserved is None:
+        refresh_availability(instance.substance_id, instance.unit_id)
+    else:
+        _apply_delta(instance.substance_id, instance.unit_id, -old_on_hand, -old_reserved)
+
+
+def connect_signals():
+    from .models import Inventory
+
+    post_save.connect(_track_inventory_save, sender=Inventory, dispatch_uid='reservations:inventory:save')
+    post_delete.connect(_track_inventory_delete, sender=Inventory, dispatch_uid='reservations:inventory:delete')
+
+
+# Reservas
+
+def _free_lots(substance, unit, valid_on):
+    """Lotes com saldo livre, válidos em ``valid_on``, em ordem FEFO (bloqueados)."""
+    from .models import Inventory
+
+    return list(
+        Inventory.objects.select_for_update(of=('self',)).filter(
+            substance=substance,
+            unit=unit,
+            quantity_on_hand__gt=F('quantity_reserved'),
+            batch__validade__gte=valid_on,
+        ).select_related('batch').order_by('batch__validade', 'batch__created_at')
+    )
+
+
+def reserve(paciente, unit, data_agendada, items, protocolo=None, user=None):
+    """
+    Reserva ``items`` ([(substância, quantidade)]) para o paciente. Tudo ou
+    nada: sem saldo livre suficiente, levanta ``InsufficientStock``.
+    """
+    from .models import StockReservation
+
+    expire_reservations()
+    expira_em = hold_until(data_agendada)
+    reservations = []
+    with transaction.atomic():
+        for substance, quantidade in items:
+            lots = _free_lots(substance, unit, data_agendada)
+            free = sum((lot.quantity_free for lot in lots), ZERO)
+            if free < quantidade:
+                raise InsufficientStock(
+                    f'Estoque insuficiente para {substance.nome_comum} em {unit.nome}. '
+                    f'Disponível: {free}, necessário: {quantidade}'
+                )
+            remaining = quantidade
+            for lot in lots:
+                if remaining <= 0:
+                    break
+                quantity = min(remaining, lot.quantity_free)
+                lot.quantity_reserved += quantity
+                lot.save()
+                reservations.append(StockReservation.objects.create(
+                    paciente=paciente,
+                    protocolo=protocolo,
+                    unit=unit,
+                    substance=substance,
+                    batch=lot.batch,
+                    quantidade=quantity,
+                    data_agendada=data_agendada,
+                    expira_em=expira_em,
+                    criado_por=user,
+                ))
+                remaining -= quantity
+    return reservations
+
+
+def reserve_protocol(paciente, protocolo, unit, data_agendada, user=None):
+    """Reserva as substâncias obrigatórias do protocolo (quantidade padrão)."""
+    items = [
+        (ps.substance, ps.default_quantity)
+        for ps in protocolo.substances.filter(is_optional=False).select_related('substance')
+    ]
+    return reserve(paciente, unit, data_agendada, items, protocolo=protocolo, user=user)
+
+
+def _lot_for(reservation):
+    from .models import Inventory
+
+    return Inventory.objects.select_for_update().filter(
+        substance_id=reservation.substance_id, batch_id=reservation.batch_id, unit_id=reservation.unit_id
+    ).first()
+
+
+def _release(reservation, status):
+    lot = _lot_for(reservation)
+    if lot is not None:
+        lot.quantity_reserved = max(ZERO, lot.quantity_reserved - reservation.quantidade)
+        lot.save()
+    reservation.status = status
+    reservation.save(update_fields=['status', 'updated_at'])
+
+
+def cancel_reservations(reservations):
+    """Cancela as reservas ativas informadas; retorna quantas foram canceladas."""
+    from .models import StockReservation
+
+    with transaction.atomic():
+        active = StockReservation.objects.select_for_update().filter(
+            pk__in=[r.pk for r in reservations], status='ativa'
+        )
+        count = 0
+        for reservation in active:
+            _release(reservation, 'cancelada')
+            count += 1
+    return count
+
+
+def expire_reservations(now=None):
+    """Libera as reservas ativas vencidas; retorna quantas expiraram."""
+    from .models import StockReservation
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = StockReservation.objects.select_for_update().filter(status='ativa', expira_em__lt=now)
+        count = 0
+        for reservation in expired:
+            _release(reservation, 'expirada')
+            count += 1
+    return count
+
+
+def consume_reservations(session, substance, quantity, **movement_fields):
+    """
+    Converte as reservas ativas do paciente (até a data da sessão) desta
+    substância em saídas dos lotes reservados. Deve rodar dentro da transação
+    que registra a sessão. Retorna a quantidade que ainda falta retirar.
+    """
+    from .models import StockMovement, StockReservation
+
+    remaining = quantity
+    reservations = StockReservation.objects.select_for_update().filter(
+        paciente=session.patient,
+        unit=session.unit,
+        substance=substance,
+        status='ativa',
+        data_agendada__lte=session.session_date,
+    ).select_related('batch').order_by('data_agendada', 'created_at')
+
+    for reservation in reservations:
+        lot = _lot_for(reservation)
+        movement = None
+        if lot is not None:
+            lot.quantity_reserved = max(ZERO, lot.quantity_reserved - reservation.quantidade)
+            quantity_to_take = min(remaining, reservation.quantidade, lot.quantity_on_hand)
+            if quantity_to_take > 0:
+                lot.quantity_on_hand -= quantity_to_take
+                movement = StockMovement.objects.create(
+                    substance=substance,
+                    batch=reservation.batch,
+                    unit=reservation.unit,
+                    tipo='saida',
+                    quantidade=quantity_to_take,
+                    paciente=session.patient,
+                    paciente_nome=session.patient.nome,
+                    session=session,
+                    **movement_fields
+                )
+                remaining -= quantity_to_take
+            lot.save()
+        # Sessão registrada: a sobra da reserva é liberada junto
+        reservation.status = 'convertida' if movement else 'cancelada'
+        reservation.session = session
+        reservation.movimento = movement
+        reservation.save(update_fields=['status', 'session', 'movimento', 'updated_at'])
+    return remaining
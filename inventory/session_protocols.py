@@ -0,0 +1,69 @@
+"""
+Vínculo das sessões (``PatientSession.protocol``) com os templates de protocolo.
+
+Antes do vínculo, a sessão guardava apenas o texto ``protocol_name``, e os
+relatórios comparavam nomes com ``icontains``. O casamento de nomes fica
+concentrado aqui: primeiro o nome idêntico (sem diferenciar maiúsculas), depois
+um template cujo nome contenha o da sessão ou esteja contido nele (o mais
+longo vence). É usado ao salvar sessões sem protocolo e pelo comando
+``backfill_session_protocols``.
+"""
+from django.db import transaction
+
+
+def _templates():
+    from .models import ProtocolTemplate
+
+    return [(name.strip().lower(), pk) for pk, name in ProtocolTemplate.objects.values_list('id', 'name')]
+
+
+def match_name(name, templates):
+    """Id do template para ``name`` (ou ``None``); ``templates``: [(nome minúsculo, id)]."""
+    name = name.strip().lower()
+    if not name:
+        return None
+    for template_name, pk in templates:
+        if template_name == name:
+            return pk
+    candidates = [
+        (len(template_name), template_name, pk)
+        for template_name, pk in templates
+        if template_name and (name in template_name or template_name in name)
+    ]
+    return max(candidates)[2] if candidates else None
+
+
+def match_protocol(name):
+    """Template correspondente ao nome digitado na sessão (ou ``None``)."""
+    from .models import ProtocolTemplate
+
+    pk = match_name(name, _templates())
+    return ProtocolTemplate.objects.get(pk=pk) if pk else None
+
+
+def backfill(overwrite=False, dry_run=False):
+    """
+    Vincula as sessões existentes pelo ``protocol_name``. Uma atualização por
+    nome distinto, não por sessão. Retorna [(nome, template ou None, sessões)].
+    """
+    from .models import PatientSession, ProtocolTemplate
+
+    sessions = PatientSession.objects.exclude(protocol_name='')
+    if not overwrite:
+        sessions = sessions.filter(protocol__isnull=True)
+    templates = _templates()
+    names = {}
+    for protocol_name in sessions.values_list('protocol_name', flat=True).distinct():
+        names[protocol_name] = match_name(protocol_name, templates)
+
+    by_id = ProtocolTemplate.objects.in_bulk({pk for pk in names.values() if pk})
+    result = []
+    with transaction.atomic():
+        for protocol_name, pk in sorted(names.items()):
+            matched = sessions.filter(protocol_name=protocol_name)
+            if pk and not dry_run:
+                count = matched.update(protocol=pk)
+            else:
+                count = matched.count()
+            result.append((protocol_name, by_id.get(pk), count))
+    return result
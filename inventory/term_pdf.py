@@ -0,0 +1,243 @@
+"""
+PDF dos termos de responsabilidade (reportlab).
+
+O processo principal lê o banco e monta, para cada termo, um dicionário só
+com texto (``term_document``). A geração do PDF (``render_pdf``) depende
+apenas desse dicionário e pode rodar em outro processo. Fontes e estilos
+são criados uma vez por processo.
+
+Cada arquivo é gravado em ``TERM_PDF_DIR/<sha256 do conteúdo>.pdf``. Uma
+reimpressão com os mesmos dados apenas reabre o arquivo existente. O mesmo
+vale para os lotes (``lotes/<sha256 das partes>.pdf``), que juntam em um só
+arquivo os termos de um dia ou de uma sessão.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+
+# Mudanças no layout precisam alterar a versão (invalida os arquivos em disco)
+LAYOUT_VERSION = 1
+
+DEFAULT_TITLE = 'TERMO DE CONSENTIMENTO LIVRE, ESCLARECIDO E DECLARAÇÃO DE RESPONSABILIDADE'
+
+DEFAULT_CONTENT = (
+    'Eu, {{PACIENTE_NOME}}, declaro ter sido informado(a) pelo(a) Dr(a). {{MEDICO_NOME}} '
+    '(CRM {{MEDICO_CRM}}) sobre a aplicação de {{MEDICAMENTOS}}, seus riscos, benefícios e '
+    'alternativas, e assumo a responsabilidade pelo tratamento.\n\n{{LOCAL}}, {{DATA_ATUAL}}.'
+)
+
+
+def get_output_dir():
+    return Path(getattr(settings, 'TERM_PDF_DIR', Path(settings.BASE_DIR) / 'term_pdfs'))
+
+
+def term_context(term):
+    """Contexto das variáveis de ``TermTemplate.PLACEHOLDERS`` para o termo."""
+    doctor = term.medico_responsavel
+    data = term.data_aplicacao.strftime('%d/%m/%Y')
+    return {
+        'paciente_nome': term.patient.nome,
+        'medico_nome': doctor.nome if doctor else '',
+        'medico_crm': doctor.crm if doctor else '',
+        'medicamentos': (
+            f'{term.substance.nome_comum} {term.substance.concentracao} - '
+            f'{term.dosagem} ({term.via_administracao})'
+        ),
+        'local': term.unit.nome,
+        'data_atual': data,
+        'data_entrega': data,
+    }
+
+
+def resolve_template(term):
+    """Template do termo: o registrado nele ou o modelo ativo para a substância."""
+    from .models import TermTemplate
+
+    if term.template_usado_id:
+        return term.template_usado
+    return TermTemplate.get_template_for_substance(term.substance)
+
+
+def term_document(term, template=None):
+    """Dados (somente texto) para gerar o PDF do termo."""
+    from .models import TermTemplate
+
+    template = template or resolve_template(term)
+    context = term_context(term)
+    if template is not None:
+        titulo, corpo = template.titulo, template.render_content(context)
+    else:
+        titulo = DEFAULT_TITLE
+        corpo = TermTemplate(conteudo=DEFAULT_CONTENT).render_content(context)
+    return {
+        'layout': LAYOUT_VERSION,
+        'numero': term.numero,
+        'unidade': term.unit.nome,
+        'titulo': titulo,
+        'corpo': corpo,
+        'paciente': term.patient.nome,
+        'profissional': (term.aplicado_por.nome or term.aplicado_por.username) if term.aplicado_por else '',
+        'receita': term.receita_medica,
+    }
+
+
+def document_hash(document):
+    return hashlib.sha256(json.dumps(document, sort_keys=True).encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _fonts():
+    """Registra a fonte configurada (TERM_PDF_FONT, .ttf) uma vez por processo."""
+    font_path = getattr(settings, 'TERM_PDF_FONT', '')
+    if not font_path:
+        return 'Helvetica', 'Helvetica-Bold'
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    pdfmetrics.registerFont(TTFont('TermFont', font_path))
+    return 'TermFont', 'TermFont'
+
+
+@lru_cache(maxsize=None)
+def _styles():
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+    from reportlab.lib.styles import ParagraphStyle
+
+    regular, bold = _fonts()
+    return {
+        'unidade': ParagraphStyle('unidade', fontName=bold, fontSize=10, alignment=TA_CENTER, spaceAfter=4),
+        'titulo': ParagraphStyle('titulo', fontName=bold, fontSize=12, leading=15, alignment=TA_CENTER, spaceAfter=14),
+        'corpo': ParagraphStyle('corpo', fontName=regular, fontSize=10, leading=14, alignment=TA_JUSTIFY, spaceAfter=8),
+        'assinatura': ParagraphStyle('assinatura', fontName=regular, fontSize=9, alignment=TA_CENTER),
+    }
+
+
+def _signature_table(document):
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, Table, TableStyle
+
+    styles = _styles()
+    cells = [
+        Paragraph(f"{escape(document['paciente'])}<br/>Paciente", styles['assinatura']),
+        Paragraph(f"{escape(document['profissional'] or ' ')}<br/>Profissional", styles['assinatura']),
+    ]
+    table = Table([cells], colWidths=[8 * cm, 8 * cm])
+    table.setStyle(TableStyle([
+        ('LINEABOVE', (0, 0), (0, 0), 0.5, 'black'),
+        ('LINEABOVE', (1, 0), (1, 0), 0.5, 'black'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 12),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+    ]))
+    return table
+
+
+def render_pdf(document):
+    """Bytes do PDF do termo (sem acesso ao banco)."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import KeepTogether, Paragraph, SimpleDocTemplate, Spacer
+
+    styles = _styles()
+    regular, _ = _fonts()
+    numero = document['numero']
+
+    def footer(canvas, doc):
+        canvas.saveState()
+        canvas.setFont(regular, 8)
+        canvas.drawRightString(A4[0] - 2 * cm, 1.2 * cm, f'Termo {numero} - página {doc.page}')
+        canvas.restoreState()
+
+    story = [
+        Paragraph(escape(document['unidade']), styles['unidade']),
+        Paragraph(escape(document['titulo']), styles['titulo']),
+    ]
+    for paragraph in document['corpo'].split('\n\n'):
+        if paragraph.strip():
+            story.append(Paragraph(escape(paragraph.strip()).replace('\n', '<br/>'), styles['corpo']))
+    if document['receita']:
+        story.append(Paragraph(f"Receita médica nº {escape(document['receita'])}", styles['corpo']))
+    story.append(KeepTogether([Spacer(1, 2.5 * cm), _signature_table(document)]))
+
+    buffer = BytesIO()
+    # invariant: mesmo conteúdo gera exatamente os mesmos bytes
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, invariant=1, title=f'Termo {numero}',
+        leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm,
+    )
+    doc.build(story, onFirstPage=footer, onLaterPages=footer)
+    return buffer.getvalue()
+
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _render_to_file(args):
+    document, path = args
+    _write_atomic(Path(path), render_pdf(document))
+    return path
+
+
+def render_documents(documents, workers=0):
+    """
+    Caminhos dos PDFs (na ordem de ``documents``), gerando só os que ainda
+    não existem em disco; com ``workers`` > 1, em um pool de processos.
+    """
+    output_dir = get_output_dir()
+    paths = [output_dir / f'{document_hash(document)}.pdf' for document in documents]
+
+    pending = {}
+    for document, path in zip(documents, paths):
+        if not path.exists():
+            pending[path] = document
+    if workers > 1 and len(pending) > 1:
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), mp_context=context) as pool:
+            list(pool.map(_render_to_file, [(document, str(path)) for path, document in pending.items()]))
+    else:
+        for path, document in pending.items():
+            _render_to_file((document, path))
+    return paths
+
+
+def term_pdf_path(term):
+    return render_documents([term_document(term)])[0]
+
+
+def batch_pdf_path(terms, workers=0):
+    """Um único PDF com todos os termos (um por página inicial), na ordem dada."""
+    from pypdf import PdfWriter
+
+    from .models import TermTemplate
+
+    # Uma consulta (no máximo) resolve os templates de todas as substâncias
+    templates = TermTemplate.get_templates_for_substances({term.substance for term in terms})
+    documents = [
+        term_document(term, term.template_usado if term.template_usado_id else templates[term.substance_id])
+        for term in terms
+    ]
+    parts = render_documents(documents, workers=workers)
+    batch_hash = hashlib.sha256('|'.join(path.stem for path in parts).encode()).hexdigest()
+    path = get_output_dir() / 'lotes' / f'{batch_hash}.pdf'
+    if path.exists():
+        return path
+
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(str(part))
+    buffer = BytesIO()
+    writer.write(buffer)
+    _write_atomic(path, buffer.getvalue())
+    return path
@@ -0,0 +1,123 @@
+"""
+Compilação dos templates de termos (``TermTemplate.conteudo``).
+
+O conteúdo é analisado uma única vez e vira uma sequência de trechos
+literais intercalados com variáveis (``{{PACIENTE_NOME}}`` etc.). Para
+renderizar, basta um ``join`` em uma única passada, em vez de um
+``str.replace`` por variável sobre o texto inteiro. Variáveis
+desconhecidas permanecem no texto, como antes.
+
+A forma compilada fica em cache por ``(id, versao)``. Como o conteúdo pode
+ser editado sem troca de versão, o cache confere o texto-fonte antes de
+reaproveitar a entrada.
+"""
+import re
+from collections import OrderedDict
+from operator import itemgetter
+from threading import Lock
+
+PLACEHOLDER_RE = re.compile(r'\{\{([A-Z_]+)\}\}')
+
+CACHE_SIZE = 64
+
+
+class CompiledTemplate:
+    """
+    ``parts`` alterna trechos literais (posições pares) e lugares vazios
+    para as variáveis ``slots`` (posições ímpares).
+    """
+    __slots__ = ('source', 'parts', 'slots', '_getter')
+
+    def __init__(self, source, literals, slots):
+        self.source = source
+        self.slots = slots
+        self.parts = [None] * (2 * len(slots) + 1)
+        self.parts[0::2] = literals
+        if len(slots) > 1:
+            self._getter = itemgetter(*slots)
+        elif slots:
+            self._getter = lambda values: (values[slots[0]],)
+        else:
+            self._getter = lambda values: ()
+
+    def render(self, values):
+        """``values``: dicionário variável -> texto já convertido em ``str``."""
+        parts = self.parts.copy()
+        parts[1::2] = self._getter(values)
+        return ''.join(parts)
+
+
+def compile_template(source, names):
+    """Separa ``source`` em trechos literais e variáveis conhecidas (``names``)."""
+    literals = []
+    slots = []
+    position = 0
+    for match in PLACEHOLDER_RE.finditer(source):
+        if match.group(1) not in names:
+            continue
+        literals.append(source[position:match.start()])
+        slots.append(match.group(1))
+        position = match.end()
+    literals.append(source[position:])
+    return CompiledTemplate(source, tuple(literals), tuple(slots))
+
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+
+
+def get_compiled(template, names):
+    key = (template.__class__, template.pk, template.versao)
+    with _cache_lock:
+        compiled = _cache.get(key)
+        if compiled is not None and compiled.source == template.conteudo:
+            _cache.move_to_end(key)
+            return compiled
+
+    compiled = compile_template(template.conteudo, names)
+    with _cache_lock:
+        _cache[key] = compiled
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
+
+
+def resolve_values(placeholders, context, defaults=None):
+    """
+    Valores das variáveis a partir do contexto. ``placeholders``: variável ->
+    (chave do contexto, padrão); ``defaults`` já resolvidos têm prioridade
+    sobre o padrão (ex.: data atual calculada uma vez por lote).
+    """
+    values = {}
+    for name, (key, default) in placeholders.items():
+        if key in context:
+            values[name] = str(context[key])
+        elif defaults and name in defaults:
+            values[name] = defaults[name]
+        else:
+            values[name] = str(default() if callable(default) else default)
+    return values
+
+
+def render(template, placeholders, context):
+    return get_compiled(template, placeholders).render(resolve_values(placeholders, context))
+
+
+def render_many(template, placeholders, contexts):
+    """Renderiza o mesmo template para vários contextos (ex.: vários pacientes)."""
+    compiled = get_compiled(template, placeholders)
+    # Padrões dinâmicos (data atual) calculados uma vez para o lote
+    defaults = {
+        name: str(default())
+        for name, (key, default) in placeholders.items()
+        if callable(default)
+    }
+    return [compiled.render(resolve_values(placeholders, context, defaults)) for context in contexts]
+
+
+def render_with_replace(source, placeholders, context):
+    """Implementação anterior (um ``str.replace`` por variável); usada no benchmark."""
+    content = source
+    for name, value in resolve_values(placeholders, context).items():
+        content = content.replace('{{%s}}' % name, value)
+    return content
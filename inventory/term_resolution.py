@@ -0,0 +1,89 @@
+"""
+Resolução memoizada do template de termo de cada substância.
+
+Um ``TemplateResolver`` lê todos os templates ativos em uma única consulta
+e guarda o primeiro de cada tipo (e de cada substância, nos templates
+específicos). A cadeia de prioridade de uma substância (``chain``) é
+resolvida sobre esse retrato, e o resultado fica memoizado por id da
+substância. Gerar os termos de uma sessão com várias substâncias custa a
+leitura da versão e, no máximo, uma consulta.
+
+O retrato fica marcado com a versão compartilhada ``CacheVersion`` do
+resolvedor (``version_name``). Salvar ou excluir um template ou uma
+substância incrementa a versão após o commit (``connect_signals``); cada
+processo confere a versão (uma leitura) e refaz o retrato quando ela mudou.
+"""
+from threading import Lock
+
+from django.db.models.signals import post_delete, post_save
+
+
+class TemplateResolver:
+    """
+    ``chain(substance)`` devolve as chaves em ordem de prioridade:
+    ``('tipo', <tipo>)`` ou ``('substance', <id>)``.
+    """
+
+    def __init__(self, model, chain, version_name):
+        self.model = model
+        self.chain = chain
+        self.version_name = version_name
+        self._lock = Lock()
+        self.clear()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._templates = None
+            self._by_id = {}
+            self._resolved = {}
+            self._version = None
+
+    def invalidate(self, **kwargs):
+        """Invalida o retrato neste processo e, após o commit, nos demais."""
+        from .models import CacheVersion
+
+        self.clear()
+        CacheVersion.bump(self.version_name)
+
+    def _snapshot(self):
+        from .models import CacheVersion
+
+        version = CacheVersion.current(self.version_name)
+        if self._templates is None or version != self._version:
+            templates = {}
+            by_id = {}
+            has_substance = any(f.name == 'substance' for f in self.model._meta.fields)
+            # Mesma ordem de ``Meta.ordering``: o primeiro de cada chave vence
+            for template in self.model.objects.filter(ativo=True):
+                by_id[template.pk] = template
+                templates.setdefault(('tipo', template.tipo), template)
+                if has_substance and template.substance_id:
+                    templates.setdefault(('substance', template.substance_id), template)
+            self._templates = templates
+            self._by_id = by_id
+            self._resolved = {}
+            self._version = version
+        return self._templates
+
+    def resolve_many(self, substances):
+        """Template efetivo (ou ``None``) de cada substância, por id."""
+        with self._lock:
+            templates = self._snapshot()
+            result = {}
+            for substance in substances:
+                if substance.pk not in self._resolved:
+                    template = next(
+                        (templates[key] for key in self.chain(substance) if key in templates), None
+                    )
+                    self._resolved[substance.pk] = template.pk if template else None
+                result[substance.pk] = self._by_id.get(self._resolved[substance.pk])
+            return result
+
+    def resolve(self, substance):
+        return self.resolve_many([substance])[substance.pk]
+
+    def connect_signals(self, substance_model):
+        uid = f'term_resolution:{self.model._meta.label_lower}'
+        for sender in (self.model, substance_model):
+            post_save.connect(self.invalidate, sender=sender, weak=False, dispatch_uid=f'{uid}:{sender.__name__}:save')
+            post_delete.connect(self.invalidate, sender=sender, weak=False, dispatch_uid=f'{uid}:{sender.__name__}:delete')
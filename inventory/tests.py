@@ -1,3 +1,279 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import adherence, rebalancing, replay_simulation, reservations
+from .models import (
+    Batch, Inventory, Patient, PatientSession, ProtocolTemplate, StockAvailability, StockReservation, Substance, Unit,
+)
+from .pricing import parse_price
+
+User = get_user_model()
+
+
+class StockTestMixin:
+    """Unidade, substância e lotes mínimos para os testes de estoque."""
+
+    def make_lot(self, lote, quantity, validade, unit=None):
+        unit = unit or self.unit
+        batch = Batch.objects.create(
+            substance=self.substance, unit=unit, lote=lote, validade=validade,
+            quantidade_recebida=quantity, fornecedor='Fornecedor Teste', created_by=self.user,
+        )
+        return Inventory.objects.create(substance=self.substance, batch=batch, unit=unit, quantity_on_hand=quantity)
+
+    def setUp(self):
+        self.user = User.objects.create_user('estoque', password='x', nome='Estoque', role='admin')
+        self.unit = Unit.objects.create(nome='Ribeirão Preto', codigo='RP')
+        self.substance = Substance.objects.create(nome_comum='Vitamina D', concentracao='50000UI', apresentacao='ampola')
+        self.patient = Patient.objects.create(codigo='P001', nome='Paciente Teste', unidade_principal=self.unit)
+
+
+class ReservationsTest(StockTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        today = timezone.localdate()
+        self.scheduled = today + timedelta(days=3)
+        self.first = self.make_lot('L1', Decimal('5'), today + timedelta(days=30))
+        self.second = self.make_lot('L2', Decimal('5'), today + timedelta(days=90))
+
+    def assertAvailabilityInSync(self):
+        """O saldo incremental deve ser igual ao recalculado a partir dos lotes."""
+        def rows():
+            return sorted(StockAvailability.objects.values_list('substance_id', 'unit_id', 'on_hand', 'reserved'))
+
+        incremental = rows()
+        reservations.rebuild_availability()
+        self.assertEqual(incremental, rows())
+
+    def reserve(self, quantity):
+        return reservations.reserve(self.patient, self.unit, self.scheduled, [(self.substance, Decimal(quantity))])
+
+    def test_reserve_takes_lots_fefo(self):
+        created = self.reserve('7')
+
+        self.assertEqual([(r.batch.lote, r.quantidade) for r in created], [('L1', Decimal('5')), ('L2', Decimal('2'))])
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.quantity_reserved, self.second.quantity_reserved), (Decimal('5'), Decimal('2')))
+        self.assertEqual(reservations.get_available(self.substance, self.unit), Decimal('3'))
+        self.assertAvailabilityInSync()
+
+    def test_reserve_more_than_free_is_rejected(self):
+        self.reserve('7')
+
+        with self.assertRaises(reservations.InsufficientStock):
+            self.reserve('4')
+        self.assertEqual(StockReservation.objects.filter(status='ativa').count(), 2)
+        self.assertEqual(reservations.get_available(self.substance, self.unit), Decimal('3'))
+        self.assertAvailabilityInSync()
+
+    def test_expire_releases_reserved_stock(self):
+        created = self.reserve('7')
+
+        self.assertEqual(reservations.expire_reservations(now=created[0].expira_em - timedelta(minutes=1)), 0)
+        self.assertEqual(reservations.expire_reservations(now=created[0].expira_em + timedelta(minutes=1)), 2)
+        self.assertFalse(StockReservation.objects.filter(status='ativa').exists())
+        self.assertEqual(reservations.get_available(self.substance, self.unit), Decimal('10'))
+        self.assertAvailabilityInSync()
+
+    def test_consume_converts_reservations_into_exits(self):
+        self.reserve('7')
+        session = PatientSession.objects.create(
+            patient=self.patient, unit=self.unit, session_number=1, session_date=self.scheduled
+        )
+
+        remaining = reservations.consume_reservations(
+            session, self.substance, Decimal('6'), user=self.user, motivo='Sessão 1'
+        )
+
+        self.assertEqual(remaining, Decimal('0'))
+        self.assertEqual(
+            sorted(StockReservation.objects.values_list('batch__lote', 'status')),
+            [('L1', 'convertida'), ('L2', 'convertida')],
+        )
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.quantity_on_hand, self.first.quantity_reserved), (Decimal('0'), Decimal('0')))
+        # A sobra da reserva do segundo lote é liberada com a sessão
+        self.assertEqual((self.second.quantity_on_hand, self.second.quantity_reserved), (Decimal('4'), Decimal('0')))
+        self.assertEqual(reservations.get_available(self.substance, self.unit), Decimal('4'))
+        self.assertAvailabilityInSync()
+
+
+@override_settings(ADHERENCE_DEFAULT_INTERVAL_DAYS=7, ADHERENCE_RISK_FACTORS=(1.5, 3.0))
+class AdherenceTest(TestCase):
+    today = date(2024, 6, 30)
+
+    def setUp(self):
+        self.unit = Unit.objects.create(nome='Ribeirão Preto', codigo='RP')
+        self.protocol = ProtocolTemplate.objects.create(name='Soroterapia', default_sessions=3)
+        # Dias antes de ``today`` de cada sessão, por curso
+        self.courses = {
+            'concluido': [20, 13, 6],
+            'em_dia': [14, 7],        # intervalo médio 7, parado há 7 dias
+            'atencao': [21, 14],      # parado há 14 ≥ 1,5 × 7
+            'abandono': [30],         # só uma sessão: padrão de 7 dias, parado há 30 ≥ 3 × 7
+        }
+        for codigo, days_ago in self.courses.items():
+            patient = Patient.objects.create(codigo=codigo, nome=f'Paciente {codigo}', unidade_principal=self.unit)
+            for number, days in enumerate(days_ago, start=1):
+                self.session(patient, number, days)
+        # Sessões canceladas não contam
+        self.session(Patient.objects.get(codigo='abandono'), 2, 1, payment_status='cancelado')
+
+    def session(self, patient, number, days_ago, **fields):
+        return PatientSession.objects.create(
+            patient=patient, unit=self.unit, protocol=self.protocol, session_number=number,
+            session_date=self.today - timedelta(days=days_ago), **fields
+        )
+
+    def test_courses_are_bucketed_by_risk(self):
+        rows = [adherence.course(row) for row in adherence.courses_queryset(today=self.today)]
+
+        # Maior risco primeiro
+        self.assertEqual([row['paciente_codigo'] for row in rows], ['abandono', 'atencao', 'em_dia', 'concluido'])
+        self.assertEqual([row['risco'] for row in rows], ['abandono', 'atencao', 'em_dia', 'concluido'])
+        by_code = {row['paciente_codigo']: row for row in rows}
+        self.assertEqual(by_code['em_dia']['intervalo_medio'], 7.0)
+        self.assertEqual(by_code['em_dia']['intervalo_ultimo'], 7)
+        self.assertEqual(by_code['atencao']['dias_sem_sessao'], 14)
+        self.assertEqual(by_code['abandono']['realizadas'], 1)
+        self.assertIsNone(by_code['abandono']['intervalo_medio'])
+        self.assertEqual(by_code['concluido']['conclusao'], 100.0)
+
+    def test_risk_filter(self):
+        rows = adherence.courses_queryset(risco='atencao', today=self.today)
+
+        self.assertEqual([row['patient__codigo'] for row in rows], ['atencao'])
+
+    def test_summarize(self):
+        summary = adherence.summarize(adherence.courses_queryset(today=self.today))
+
+        self.assertEqual(summary['cursos'], 4)
+        self.assertEqual(summary['por_risco'], {'concluido': 1, 'em_dia': 1, 'atencao': 1, 'abandono': 1})
+        # (100 + 66,7 + 66,7 + 33,3) / 4
+        self.assertEqual(summary['conclusao_media'], 66.7)
+
+
+class MovesFromRowsTest(StockTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = Unit.objects.create(nome='Brasília', codigo='BR')
+        self.inactive = Unit.objects.create(nome='Fechada', codigo='FC', ativo=False)
+        self.lot = self.make_lot('L1', Decimal('10'), timezone.localdate() + timedelta(days=60))
+        self.lot.quantity_reserved = Decimal('4')
+        self.lot.save()
+
+    def row(self, quantidade='3', destino=None, batch=None, motivo='ruptura'):
+        return (batch or self.lot.batch_id, destino or self.other.pk, quantidade, motivo)
+
+    def test_valid_rows(self):
+        moves = rebalancing.moves_from_rows([self.row('2.5'), self.row('3.5', motivo='vencimento')])
+
+        self.assertEqual(
+            moves[0],
+            rebalancing.Move(self.substance.pk, self.lot.batch_id, self.unit.pk, self.other.pk, Decimal('2.50'), 'ruptura'),
+        )
+        self.assertEqual(sum(move.quantidade for move in moves), Decimal('6'))
+
+    def test_invalid_rows_are_rejected(self):
+        invalid = {
+            'lote malformado': self.row(batch='abc'),
+            'lote inexistente': self.row(batch='00000000-0000-0000-0000-000000000000'),
+            'destino malformado': self.row(destino='abc'),
+            'destino igual à origem': self.row(destino=self.unit.pk),
+            'destino inativo': self.row(destino=self.inactive.pk),
+            'motivo desconhecido': self.row(motivo='outro'),
+            'quantidade zero': self.row('0'),
+            'quantidade negativa': self.row('-1'),
+            'quantidade não numérica': self.row('abc'),
+            'quantidade infinita': self.row('Infinity'),
+            'quantidade NaN': self.row('NaN'),
+            'quantidade enorme': self.row('1e20'),
+        }
+        for case, row in invalid.items():
+            with self.subTest(case), self.assertRaises(ValueError):
+                rebalancing.moves_from_rows([row])
+
+    def test_rows_cannot_exceed_free_stock_of_the_lot(self):
+        # Livre: 10 em estoque − 4 reservados
+        rebalancing.moves_from_rows([self.row('6')])
+        with self.assertRaises(ValueError):
+            rebalancing.moves_from_rows([self.row('4'), self.row('2.01')])
+
+
+class ReplaySimulationTest(SimpleTestCase):
+    """Séries pequenas calculadas à mão, dia a dia."""
+
+    def simulate(self, demand, shelf_life, minimum, maximum, lead_time):
+        results = replay_simulation.simulate(
+            np.array([demand], dtype=float), np.array([shelf_life]),
+            np.array([[minimum]], dtype=float), np.array([[maximum]], dtype=float), lead_time,
+        )
+        return {name: float(values[0, 0]) for name, values in results.items()}
+
+    def test_stockout_and_reorder(self):
+        # Dia 0: 5 − 3 = 2 ≤ mínimo, pede 3 (chega no dia 2)
+        # Dia 1: falta 1; dia 2: chega 3, consome 3, pede 5 (chega no dia 4); dia 3: falta 3
+        result = self.simulate([3, 3, 3, 3], shelf_life=100, minimum=2, maximum=5, lead_time=2)
+
+        self.assertEqual(result, {
+            'dias_ruptura': 2.0,
+            'estoque_medio': 0.5,
+            'perda_vencimento': 0.0,
+            'falta': 4.0,
+            'pedidos': 2.0,
+        })
+
+    def test_fefo_consumes_oldest_stock_before_it_expires(self):
+        # Dia 0: 6 − 3 = 3 (lote antigo), pede 3; dia 1: chega o lote novo e
+        # a saída de 2 sai do antigo (sobra 1); dia 2: vence só essa sobra
+        result = self.simulate([3, 2, 0, 0], shelf_life=3, minimum=4, maximum=6, lead_time=1)
+
+        self.assertEqual(result['perda_vencimento'], 1.0)
+        self.assertEqual(result['dias_ruptura'], 0.0)
+        self.assertEqual(result['pedidos'], 2.0)
+        self.assertEqual(result['estoque_medio'], 4.25)
+
+    def test_unused_stock_expires(self):
+        # Sem reposição (mínimo negativo): o que sobra no dia 1 vence e falta no resto
+        result = self.simulate([1, 1, 1], shelf_life=2, minimum=-1, maximum=4, lead_time=1)
+
+        self.assertEqual(result, {
+            'dias_ruptura': 2.0,
+            'estoque_medio': 1.0,
+            'perda_vencimento': 3.0,
+            'falta': 2.0,
+            'pedidos': 0.0,
+        })
+
+
+class ParsePriceTest(SimpleTestCase):
+
+    def test_accepted_formats(self):
+        cases = {
+            '10': Decimal('10.00'),
+            '10.5': Decimal('10.50'),
+            '10,5': Decimal('10.50'),
+            'R$ 1.234,56': Decimal('1234.56'),
+            ' 7,999 ': Decimal('8.00'),
+            '': Decimal('0.00'),
+            Decimal('3.1'): Decimal('3.10'),
+            '99999999,99': Decimal('99999999.99'),
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(parse_price(value), expected)
+
+    def test_rejected_values(self):
+        # Fora de DecimalField(max_digits=10, decimal_places=2), negativos e não numéricos
+        for value in [None, 'abc', '-1', 'NaN', 'Infinity', '1e400', '100000000', '99999999,995', '1.2.3,4,5']:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_price(value)
@@ -0,0 +1,142 @@
+"""
+Execução de transferências entre unidades.
+
+A origem só cede o saldo livre dos lotes (em estoque − reservado): reservas
+de pacientes continuam na unidade. Cada lote de origem vira um item da
+transferência, com o lote de mesmo número na unidade de destino, e um par
+de ``StockMovement`` (``transferencia_saida``/``transferencia_entrada``).
+
+Rascunhos do planejador (``rebalancing.create_drafts``) já têm os itens por
+lote; ``send_draft`` executa cada item a partir do seu lote de origem e
+``discard_draft`` descarta o rascunho.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .reservations import InsufficientStock
+
+ZERO = Decimal('0')
+
+
+def free_lots(substance, unit):
+    """Lotes da unidade com saldo livre, em ordem FEFO (bloqueados)."""
+    from .models import Inventory
+
+    return list(
+        Inventory.objects.select_for_update(of=('self',)).filter(
+            substance=substance,
+            unit=unit,
+            quantity_on_hand__gt=F('quantity_reserved'),
+        ).select_related('batch').order_by('batch__validade', 'batch__created_at')
+    )
+
+
+def move_lot(transfer, lot, quantity, user, item=None, **movement_fields):
+    """
+    Move ``quantity`` do lote ``lot`` (``Inventory`` da origem, bloqueado)
+    para a unidade de destino. Cria o item da transferência, ou completa
+    ``item`` quando ele já existe (rascunho); retorna o item.
+    """
+    from .models import Batch, Inventory, StockMovement, TransferItemNew
+
+    source = lot.batch
+    destino = transfer.unidade_destino
+    batch_destino, _ = Batch.objects.get_or_create(
+        lote=source.lote,
+        substance_id=source.substance_id,
+        unit=destino,
+        defaults={
+            'validade': source.validade,
+            'quantidade_recebida': quantity,
+            'fornecedor': source.fornecedor,
+            'nota_fiscal_ref': source.nota_fiscal_ref,
+            'preco_unitario': source.preco_unitario,
+            'created_by': user,
+        },
+    )
+    target, _ = Inventory.objects.select_for_update().get_or_create(
+        substance_id=source.substance_id, batch=batch_destino, unit=destino,
+        defaults={'quantity_on_hand': ZERO},
+    )
+
+    lot.quantity_on_hand -= quantity
+    lot.save()
+    target.quantity_on_hand += quantity
+    target.save()
+
+    motivo = f'Transferência {transfer.numero}: {transfer.unidade_origem.nome} → {destino.nome}'
+    StockMovement.objects.create(
+        substance_id=source.substance_id, batch=source, unit_id=lot.unit_id, tipo='transferencia_saida',
+        quantidade=quantity, motivo=motivo, unidade_destino=destino, user=user, **movement_fields
+    )
+    StockMovement.objects.create(
+        substance_id=source.substance_id, batch=batch_destino, unit=destino, tipo='transferencia_entrada',
+        quantidade=quantity, motivo=motivo, user=user, **movement_fields
+    )
+
+    if item is None:
+        return TransferItemNew.objects.create(
+            transfer=transfer,
+            substance_id=source.substance_id,
+            batch_origem=source,
+            batch_destino=batch_destino,
+            quantidade=quantity,
+        )
+    item.batch_destino = batch_destino
+    item.save(update_fields=['batch_destino'])
+    return item
+
+
+def _open_draft(transfer):
+    """O rascunho bloqueado, ou ``None`` se ele já foi enviado ou descartado."""
+    from .models import TransferNew
+
+    return TransferNew.objects.select_for_update(of=('self',)).select_related(
+        'unidade_origem', 'unidade_destino'
+    ).filter(pk=transfer.pk, status='rascunho').first()
+
+
+def send_draft(transfer, user):
+    """
+    Executa o rascunho: cada item sai do seu lote de origem, só do saldo
+    livre. Tudo ou nada: se algum lote não cobre o item, levanta
+    ``InsufficientStock``. Retorna ``False`` se não era mais um rascunho.
+    """
+    from .models import Inventory
+
+    with transaction.atomic():
+        draft = _open_draft(transfer)
+        if draft is None:
+            return False
+        for item in draft.itens.select_related('substance', 'batch_origem'):
+            lot = Inventory.objects.select_for_update(of=('self',)).filter(
+                batch=item.batch_origem, unit=draft.unidade_origem
+            ).select_related('batch').first()
+            free = lot.quantity_free if lot else ZERO
+            if free < item.quantidade:
+                raise InsufficientStock(
+                    f'Saldo livre insuficiente de {item.substance.nome_comum} no lote {item.batch_origem.lote}. '
+                    f'Disponível: {free}, necessário: {item.quantidade}'
+                )
+            move_lot(draft, lot, item.quantidade, user, item=item)
+
+        now = timezone.now()
+        draft.status = 'concluida'
+        draft.data_envio = draft.data_recebimento = now
+        draft.enviado_por = draft.recebido_por = user
+        draft.save(update_fields=['status', 'data_envio', 'data_recebimento', 'enviado_por', 'recebido_por'])
+    return True
+
+
+def discard_draft(transfer):
+    """Descarta (cancela) o rascunho; ``False`` se ele não estava mais aberto."""
+    with transaction.atomic():
+        draft = _open_draft(transfer)
+        if draft is None:
+            return False
+        draft.status = 'cancelada'
+        draft.save(update_fields=['status'])
+    return True
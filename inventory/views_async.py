@@ -0,0 +1,215 @@
+"""
+Versões assíncronas (ORM async) das APIs JSON chamadas pelo JavaScript das
+páginas. Sob ASGI (``ASYNC_API_VIEWS``) elas substituem as versões síncronas
+nas mesmas URLs; ver ``inventory/urls.py``.
+"""
+from datetime import datetime
+from decimal import Decimal
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncMonth
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.utils import timezone
+
+from core.db_routers import use_read_replica
+from .models import (
+    Batch, Inventory, PatientSession, ProtocolSubstance, ProtocolTemplate, Substance,
+    SubstanceUnitConfig,
+)
+
+User = get_user_model()
+
+
+def async_login_required(view_func):
+    """``login_required`` para views ``async def`` (Django 4.2)."""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        # request.user é carregado sob demanda com consultas síncronas
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+async def _aget_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except (queryset.model.DoesNotExist, ValueError, ValidationError):
+        raise Http404
+
+
+@async_login_required
+async def get_substance_stock(request):
+    """API para buscar estoque atual de uma substância."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    substance_id = request.GET.get('substance_id')
+    if not substance_id:
+        return JsonResponse({'error': 'ID da substância é obrigatório'}, status=400)
+
+    substance = await _aget_or_404(Substance.objects.all(), id=substance_id)
+    minimos = {
+        unit_id: estoque_minimo
+        async for unit_id, estoque_minimo in SubstanceUnitConfig.objects.filter(
+            substance=substance
+        ).values_list('unit_id', 'estoque_minimo')
+    }
+
+    today = timezone.now().date()
+    lotes_data = []
+    total_disponivel = Decimal('0')
+    estoque_baixo = False
+    async for inv in Inventory.objects.filter(substance=substance).select_related('batch').order_by('batch__validade'):
+        if inv.quantity_on_hand <= minimos.get(inv.unit_id, substance.estoque_minimo_default):
+            estoque_baixo = True
+        if inv.quantity_on_hand <= 0:
+            continue
+        dias_restantes = (inv.batch.validade - today).days
+        lotes_data.append({
+            'lote': inv.batch.lote,
+            'validade': inv.batch.validade.strftime('%d/%m/%Y'),
+            'quantidade': float(inv.quantity_on_hand),
+            'vencido': dias_restantes < 0,
+            'vencendo_em_breve': 0 < dias_restantes <= substance.dias_alerta_vencimento,
+        })
+        total_disponivel += inv.quantity_on_hand
+
+    return JsonResponse({
+        'total_disponivel': float(total_disponivel),
+        'estoque_minimo': float(substance.estoque_minimo),
+        'estoque_baixo': estoque_baixo,
+        'lotes': lotes_data,
+    })
+
+
+@async_login_required
+async def get_substance_unit_stock(request):
+    """API para obter estoque de uma substância em uma unidade (transferências)."""
+    substance_id = request.GET.get('substance_id')
+    unit_id = request.GET.get('unit_id')
+    if not substance_id or not unit_id:
+        return JsonResponse({'error': 'Parâmetros inválidos'}, status=400)
+
+    try:
+        batch = await Batch.objects.filter(substance_id=substance_id, unit_id=unit_id).afirst()
+        if batch is None:
+            return JsonResponse({'stock': 0, 'batch_id': None})
+        stock = await Inventory.objects.filter(batch=batch, unit_id=batch.unit_id).values_list(
+            'quantity_on_hand', flat=True
+        ).afirst()
+        return JsonResponse({'stock': float(stock or 0), 'batch_id': str(batch.id)})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_login_required
+async def get_protocol_substances_api(request, protocol_id):
+    """API para buscar substâncias de um protocolo (para AJAX)."""
+    protocol = await _aget_or_404(ProtocolTemplate.objects.all(), id=protocol_id)
+    data = {
+        'protocol': {
+            'id': str(protocol.id),
+            'name': protocol.name,
+            'description': protocol.description,
+            'default_sessions': protocol.default_sessions,
+        },
+        'substances': [
+            {
+                'id': str(ps.id),
+                'substance_id': str(ps.substance.id),
+                'substance_name': ps.substance.nome_comum,
+                'default_quantity': float(ps.default_quantity),
+                'unit_price': float(ps.substance.preco_padrao),
+                'is_optional': ps.is_optional,
+                'order': ps.order,
+                'notes': ps.notes,
+            }
+            async for ps in ProtocolSubstance.objects.filter(protocol=protocol).select_related(
+                'substance'
+            ).order_by('order')
+        ],
+    }
+    return JsonResponse(data)
+
+
+@async_login_required
+@use_read_replica
+async def quick_protocol_stats_api(request):
+    """API para estatísticas rápidas de protocolos."""
+    counts = await ProtocolTemplate.objects.aaggregate(
+        total=Count('id'), active=Count('id', filter=Q(is_active=True))
+    )
+    most_used = await PatientSession.objects.filter(protocol__isnull=False).values('protocol__name').annotate(
+        count=Count('id')
+    ).order_by('-count').afirst()
+
+    return JsonResponse({
+        'total_protocols': counts['total'],
+        'active_protocols': counts['active'],
+        'inactive_protocols': counts['total'] - counts['active'],
+        'most_used_protocol': most_used['protocol__name'] if most_used else None,
+    })
+
+
+@async_login_required
+@use_read_replica
+async def professional_stats_view(request):
+    """Estatísticas detalhadas por profissional (sessões registradas por ele)."""
+    professional_id = request.GET.get('professional_id')
+    if not professional_id:
+        return JsonResponse({'error': 'Professional ID required'}, status=400)
+    professional = await _aget_or_404(User.objects.all(), id=professional_id)
+
+    sessions = PatientSession.objects.filter(created_by=professional)
+    for param, lookup in (('date_from', 'session_date__gte'), ('date_to', 'session_date__lte')):
+        value = request.GET.get(param, '')
+        if value:
+            try:
+                sessions = sessions.filter(**{lookup: datetime.strptime(value, '%Y-%m-%d').date()})
+            except ValueError:
+                pass
+
+    totals = await sessions.aaggregate(
+        total_sessions=Count('id'), unique_patients=Count('patient', distinct=True)
+    )
+    top_substances = [
+        row async for row in sessions.values('substances__substance__nome_comum').annotate(
+            count=Count('id')
+        ).exclude(substances__substance__nome_comum=None).order_by('-count')[:10]
+    ]
+    monthly_sessions = [
+        {'month': row['month'].strftime('%Y-%m'), 'count': row['count']}
+        async for row in sessions.annotate(month=TruncMonth('session_date')).values('month').annotate(
+            count=Count('id')
+        ).order_by('month')
+    ]
+    patients_attended = [
+        row async for row in sessions.values(
+            'patient__nome', 'patient__codigo', 'patient__unidade_principal__nome'
+        ).annotate(
+            session_count=Count('id'), last_session=Max('session_date')
+        ).order_by('-session_count')
+    ]
+
+    total, unique = totals['total_sessions'], totals['unique_patients']
+    return JsonResponse({
+        'professional': {
+            'id': professional.id,
+            'name': professional.username,
+            'full_name': getattr(professional, 'nome', professional.username),
+        },
+        'stats': {
+            'total_sessions': total,
+            'unique_patients': unique,
+            'avg_sessions_per_patient': round(total / unique, 2) if unique > 0 else 0,
+        },
+        'top_substances': top_substances,
+        'monthly_sessions': monthly_sessions,
+        'patients_attended': patients_attended,
+    })
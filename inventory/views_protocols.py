@@ -4,6 +4,8 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.db import transaction
 from django.db.models import Count, Sum
+from core.db_routers import use_read_replica
+from . import protocol_matrix
 from .models import ProtocolTemplate, ProtocolSubstance, Substance, PatientSession
 from .forms_protocols import ProtocolTemplateForm, ProtocolSubstanceFormSet
 
@@ -28,9 +30,7 @@ def protocol_detail_view(request, protocol_id):
     substances = ProtocolSubstance.objects.filter(protocol=protocol).select_related('substance').order_by('order')
     
     # Estatísticas de uso
-    sessions_using_protocol = PatientSession.objects.filter(
-        protocol_name__icontains=protocol.name
-    ).count()
+    sessions_using_protocol = protocol.sessions.count()
     
     context = {
         'protocol': protocol,
@@ -170,31 +170,43 @@ def duplicate_protocol_view(request, protocol_id):
 
 
 @login_required
+@use_read_replica
 def protocol_usage_report_view(request):
     """View para relatório de uso de protocolos."""
-    # Protocolos mais utilizados
+    # Uso e faturamento por template (uma consulta agrupada), chaveado pelo id:
+    # nomes de templates podem se repetir
     protocol_usage = {}
-    sessions = PatientSession.objects.exclude(protocol_name='').values('protocol_name').annotate(
+    templates = ProtocolTemplate.objects.annotate(
+        sessions_count=Count('sessions'),
+        total_value=Sum('sessions__total_value')
+    ).filter(sessions_count__gt=0).order_by('-sessions_count', 'name')
+    
+    for template in templates:
+        protocol_usage[template.pk] = {
+            'name': template.name,
+            'template': template,
+            'sessions_count': template.sessions_count,
+            'total_value': template.total_value or 0,
+        }
+    
+    # Sessões com protocolo digitado que não corresponde a nenhum template
+    unlinked = PatientSession.objects.filter(protocol__isnull=True).exclude(protocol_name='').values(
+        'protocol_name'
+    ).annotate(
         count=Count('id'),
         total_value=Sum('total_value')
     ).order_by('-count')
     
-    for session_data in sessions:
-        protocol_name = session_data['protocol_name']
-        # Tentar encontrar protocolo template correspondente
-        template = ProtocolTemplate.objects.filter(name__icontains=protocol_name).first()
-        
-        protocol_usage[protocol_name] = {
-            'template': template,
+    for session_data in unlinked:
+        protocol_usage[session_data['protocol_name']] = {
+            'name': session_data['protocol_name'],
+            'template': None,
             'sessions_count': session_data['count'],
             'total_value': session_data['total_value'] or 0,
         }
     
     # Protocolos templates não utilizados
-    used_names = [name.lower() for name in protocol_usage.keys()]
-    unused_protocols = ProtocolTemplate.objects.exclude(
-        name__iregex=r'(' + '|'.join(used_names) + ')'
-    ) if used_names else ProtocolTemplate.objects.all()
+    unused_protocols = ProtocolTemplate.objects.filter(sessions__isnull=True)
     
     context = {
         'protocol_usage': protocol_usage,
@@ -245,19 +257,20 @@ def get_protocol_substances_api(request, protocol_id):
 
 
 @login_required
+@use_read_replica
 def quick_protocol_stats_api(request):
     """API para estatísticas rápidas de protocolos."""
     total_protocols = ProtocolTemplate.objects.count()
     active_protocols = ProtocolTemplate.objects.filter(is_active=True).count()
     
-    # Protocolo mais usado (aproximação)
+    # Protocolo mais usado
     most_used = None
-    sessions_with_protocol = PatientSession.objects.exclude(protocol_name='').values('protocol_name').annotate(
+    sessions_with_protocol = PatientSession.objects.filter(protocol__isnull=False).values('protocol__name').annotate(
         count=Count('id')
     ).order_by('-count').first()
     
     if sessions_with_protocol:
-        most_used = sessions_with_protocol['protocol_name']
+        most_used = sessions_with_protocol['protocol__name']
     
     data = {
         'total_protocols': total_protocols,
@@ -268,3 +281,42 @@ def quick_protocol_stats_api(request):
     
     return JsonResponse(data)
 
+
+
+@login_required
+def protocol_matrix_view(request):
+    """Custo e sessões possíveis de cada protocolo ativo em cada unidade."""
+    context = {
+        'matrix': protocol_matrix.get_matrix(),
+    }
+    return render(request, 'inventory/protocol_matrix.html', context)
+
+
+@login_required
+def protocol_matrix_api(request):
+    """API da matriz protocolo x unidade."""
+    matrix = protocol_matrix.get_matrix()
+    data = {
+        'date': matrix['date'].isoformat(),
+        'generated_at': matrix['generated_at'].isoformat(),
+        'units': [{'id': str(unit['id']), 'nome': unit['nome']} for unit in matrix['units']],
+        'protocols': [],
+    }
+    
+    for row in matrix['rows']:
+        data['protocols'].append({
+            'id': str(row['protocol_id']),
+            'name': row['name'],
+            'cost': float(row['cost']),
+            'optional_cost': float(row['optional_cost']),
+            'units': [
+                {
+                    'unit_id': str(cell['unit_id']),
+                    'sessions': cell['sessions'],
+                    'limiting_substance': cell['limiting'],
+                }
+                for cell in row['cells']
+            ],
+        })
+    
+    return JsonResponse(data)
@@ -1,98 +1,34 @@
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Count, Sum, Max
-from django.http import HttpResponse, JsonResponse
+from django.core.paginator import Paginator
+from django.db.models import Q, Count, Max
+from django.db.models.functions import TruncMonth
+from django.http import FileResponse, Http404, JsonResponse
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime
 from django.contrib.auth import get_user_model
-from .models import Patient, PatientSession, Substance, Unit, StockMovement, ResponsibilityTerm
-import csv
-from io import StringIO
+from core.db_routers import use_read_replica
+from . import adherence, expiry_forecast, report_jobs
+from .models import PatientSession, ProtocolTemplate, ReportJob, Substance, SubstanceClassification, Unit
+from .reports import PATIENT_FILTERS, REPORTS, filter_patients, patients_with_stats
+import os
+import uuid
 
 User = get_user_model()
 
+ADHERENCE_PER_PAGE = 50
+
 @login_required
+@use_read_replica
 def patients_report_view(request):
     """
     Relatório completo de pacientes com filtros avançados.
     """
     # Parâmetros de filtro
-    professional_filter = request.GET.get('professional', '')
-    unit_filter = request.GET.get('unit', '')
-    substance_filter = request.GET.get('substance', '')
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    status_filter = request.GET.get('status', 'active')  # active, inactive, all
-    
-    # Query base
-    patients = Patient.objects.all()
-    
-    # Aplicar filtros
-    if status_filter == 'active':
-        patients = patients.filter(ativo=True)
-    elif status_filter == 'inactive':
-        patients = patients.filter(ativo=False)
-    
-    if unit_filter:
-        patients = patients.filter(unidade_principal_id=unit_filter)
-    
-    # Filtros baseados em sessões
-    session_filters = Q()
-    
-    if professional_filter:
-        session_filters &= Q(sessoes__aplicado_por_id=professional_filter)
-    
-    if substance_filter:
-        session_filters &= Q(sessoes__substancias_utilizadas__substance_id=substance_filter)
-    
-    if date_from:
-        try:
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-            session_filters &= Q(sessoes__data_sessao__gte=date_from_obj)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-            session_filters &= Q(sessoes__data_sessao__lte=date_to_obj)
-        except ValueError:
-            pass
-    
-    if session_filters:
-        patients = patients.filter(session_filters).distinct()
+    filters = {name: request.GET.get(name, '') for name in PATIENT_FILTERS}
+    filters['status'] = filters['status'] or 'active'  # active, inactive, all
     
-    # Adicionar estatísticas para cada paciente
-    patients_with_stats = []
-    for patient in patients.select_related('unidade_principal'):
-        # Última sessão
-        last_session = PatientSession.objects.filter(
-            patient=patient
-        ).order_by('-data_sessao').first()
-        
-        # Total de sessões
-        total_sessions = PatientSession.objects.filter(patient=patient).count()
-        
-        # Profissionais que atenderam
-        professionals = PatientSession.objects.filter(
-            patient=patient
-        ).values_list('aplicado_por__username', flat=True).distinct()
-        
-        # Substâncias utilizadas
-        substances_used = PatientSession.objects.filter(
-            patient=patient
-        ).values_list(
-            'substancias_utilizadas__substance__nome_comum', 
-            flat=True
-        ).distinct()
-        
-        patients_with_stats.append({
-            'patient': patient,
-            'last_session': last_session,
-            'total_sessions': total_sessions,
-            'professionals': list(professionals),
-            'substances_used': list(substances_used),
-        })
+    patients_stats = patients_with_stats(filter_patients(filters))
     
     # Dados para filtros
     professionals = User.objects.filter(
@@ -104,12 +40,12 @@ def patients_report_view(request):
     substances = Substance.objects.all().order_by('nome_comum')
     
     # Estatísticas gerais
-    total_patients = len(patients_with_stats)
-    active_patients = sum(1 for p in patients_with_stats if p['patient'].ativo)
+    total_patients = len(patients_stats)
+    active_patients = sum(1 for p in patients_stats if p['patient'].ativo)
     
     # Estatísticas por profissional
     professional_stats = {}
-    for patient_data in patients_with_stats:
+    for patient_data in patients_stats:
         for prof in patient_data['professionals']:
             if prof not in professional_stats:
                 professional_stats[prof] = {
@@ -123,7 +59,7 @@ def patients_report_view(request):
         professional_stats[prof]['patients'] = len(professional_stats[prof]['patients'])
     
     context = {
-        'patients_with_stats': patients_with_stats,
+        'patients_with_stats': patients_stats,
         'professionals': professionals,
         'units': units,
         'substances': substances,
@@ -132,19 +68,164 @@ def patients_report_view(request):
         'professional_stats': professional_stats,
         
         # Filtros aplicados
-        'filters': {
-            'professional': professional_filter,
-            'unit': unit_filter,
-            'substance': substance_filter,
-            'date_from': date_from,
-            'date_to': date_to,
-            'status': status_filter,
-        }
+        'filters': filters,
     }
     
     return render(request, 'inventory/patients_report.html', context)
 
 @login_required
+@use_read_replica
+def expiry_loss_report_view(request):
+    """
+    Previsão de perdas por vencimento de cada lote (consumo FEFO à taxa recente da unidade).
+    """
+    forecast = expiry_forecast.get_forecast()
+    unit_id = request.GET.get('unit', '')
+    show_all = request.GET.get('todos') == '1'
+    
+    lots = forecast['lots']
+    if unit_id:
+        lots = [lot for lot in lots if str(lot['unit_id']) == unit_id]
+    if not show_all:
+        lots = [lot for lot in lots if lot['perda_quantidade'] > 0]
+    
+    context = {
+        'forecast': forecast,
+        'lots': lots,
+        'total_quantidade': sum(lot['perda_quantidade'] for lot in lots),
+        'total_valor': sum(lot['perda_valor'] for lot in lots),
+        'units': Unit.objects.filter(ativo=True).order_by('nome'),
+        'selected_unit': unit_id,
+        'show_all': show_all,
+    }
+    return render(request, 'inventory/expiry_loss_report.html', context)
+
+def _uuid_param(request, name):
+    """Parâmetro GET que deve ser um UUID; valores inválidos são ignorados (``''``)."""
+    value = request.GET.get(name, '')
+    try:
+        return str(uuid.UUID(value)) if value else ''
+    except ValueError:
+        return ''
+
+CLASSIFICATION_SORTS = {
+    'valor': '-valor_consumo',
+    'faturado': '-valor_faturado',
+    'cv': 'coeficiente_variacao',
+    'substancia': 'substance__nome_comum',
+    'classe': 'classe_abc',
+}
+
+
+@login_required
+@use_read_replica
+def classification_report_view(request):
+    """
+    Classificação ABC/XYZ por substância e unidade (tabela recalculada pelo comando classify_catalog).
+    """
+    classifications = SubstanceClassification.objects.select_related('substance', 'unit')
+    
+    unit_id = _uuid_param(request, 'unit')
+    classe_abc = request.GET.get('abc', '')
+    classe_xyz = request.GET.get('xyz', '')
+    if unit_id:
+        classifications = classifications.filter(unit_id=unit_id)
+    if classe_abc:
+        classifications = classifications.filter(classe_abc=classe_abc)
+    if classe_xyz:
+        classifications = classifications.filter(classe_xyz=classe_xyz)
+    
+    sort = request.GET.get('ordem', 'classe')
+    if sort not in CLASSIFICATION_SORTS:
+        sort = 'classe'
+    classifications = classifications.order_by('unit__nome', CLASSIFICATION_SORTS[sort], '-valor_consumo')
+    
+    # Contagem da matriz ABC × XYZ com os mesmos filtros de unidade
+    matrix_qs = SubstanceClassification.objects.all()
+    if unit_id:
+        matrix_qs = matrix_qs.filter(unit_id=unit_id)
+    counts = {
+        (row['classe_abc'], row['classe_xyz']): row['total']
+        for row in matrix_qs.values('classe_abc', 'classe_xyz').annotate(total=Count('id')).order_by()
+    }
+    matrix = [
+        (abc, [(xyz, counts.get((abc, xyz), 0)) for xyz, _ in SubstanceClassification.XYZ_CHOICES])
+        for abc, _ in SubstanceClassification.ABC_CHOICES
+    ]
+    
+    context = {
+        'classifications': classifications,
+        'matrix': matrix,
+        'units': Unit.objects.filter(ativo=True).order_by('nome'),
+        'abc_choices': SubstanceClassification.ABC_CHOICES,
+        'xyz_choices': SubstanceClassification.XYZ_CHOICES,
+        'selected_unit': unit_id,
+        'selected_abc': classe_abc,
+        'selected_xyz': classe_xyz,
+        'sort': sort,
+        'calculado_em': matrix_qs.aggregate(Max('calculado_em'))['calculado_em__max'],
+    }
+    return render(request, 'inventory/classification_report.html', context)
+
+def _adherence_courses(request):
+    """
+    Cursos do relatório de adesão com os filtros da requisição (unidade,
+    protocolo, risco), ainda como queryset; os totais ignoram o filtro de risco.
+    """
+    filters = {name: _uuid_param(request, name) for name in ('unit', 'protocol')}
+    filters['risco'] = request.GET.get('risco', '')
+    scope = {'unit_id': filters['unit'] or None, 'protocol_id': filters['protocol'] or None}
+    courses = adherence.courses_queryset(risco=filters['risco'] or None, **scope)
+    summary = adherence.summarize(adherence.courses_queryset(**scope))
+    return courses, summary, filters
+
+@login_required
+@use_read_replica
+def adherence_report_view(request):
+    """
+    Adesão ao tratamento: conclusão dos protocolos, intervalos entre sessões e risco de abandono.
+    """
+    courses, summary, filters = _adherence_courses(request)
+    page_obj = Paginator(courses, ADHERENCE_PER_PAGE).get_page(request.GET.get('page'))
+    
+    query_params = request.GET.copy()
+    query_params.pop('page', None)
+    
+    context = {
+        'courses': [adherence.course(row) for row in page_obj.object_list],
+        'page_obj': page_obj,
+        'summary': summary,
+        'filters': filters,
+        'risk_choices': adherence.RISK_CHOICES,
+        'units': Unit.objects.filter(ativo=True).order_by('nome'),
+        'protocols': ProtocolTemplate.objects.order_by('name'),
+        'query_string': query_params.urlencode(),
+    }
+    return render(request, 'inventory/adherence_report.html', context)
+
+@login_required
+@use_read_replica
+def adherence_api(request):
+    """
+    API do relatório de adesão (mesmos filtros da página; ?page= e ?per_page=).
+    """
+    courses, summary, filters = _adherence_courses(request)
+    try:
+        per_page = min(max(int(request.GET.get('per_page', ADHERENCE_PER_PAGE)), 1), 500)
+    except ValueError:
+        return JsonResponse({'error': 'per_page inválido'}, status=400)
+    page_obj = Paginator(courses, per_page).get_page(request.GET.get('page'))
+    
+    return JsonResponse({
+        'summary': summary,
+        'page': page_obj.number,
+        'num_pages': page_obj.paginator.num_pages,
+        'count': page_obj.paginator.count,
+        'results': [adherence.course(row) for row in page_obj.object_list],
+    })
+
+@login_required
+@use_read_replica
 def professional_stats_view(request):
     """
     Estatísticas detalhadas por profissional.
@@ -163,20 +244,20 @@ def professional_stats_view(request):
     if date_from:
         try:
             date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-            date_filters &= Q(data_sessao__gte=date_from_obj)
+            date_filters &= Q(session_date__gte=date_from_obj)
         except ValueError:
             pass
     
     if date_to:
         try:
             date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-            date_filters &= Q(data_sessao__lte=date_to_obj)
+            date_filters &= Q(session_date__lte=date_to_obj)
         except ValueError:
             pass
     
     # Sessões do profissional
     sessions = PatientSession.objects.filter(
-        aplicado_por=professional
+        created_by=professional
     ).filter(date_filters)
     
     # Estatísticas
@@ -185,17 +266,20 @@ def professional_stats_view(request):
     
     # Substâncias mais utilizadas
     top_substances = sessions.values(
-        'substancias_utilizadas__substance__nome_comum'
+        'substances__substance__nome_comum'
     ).annotate(
         count=Count('id')
-    ).order_by('-count')[:10]
+    ).exclude(substances__substance__nome_comum=None).order_by('-count')[:10]
     
     # Sessões por mês
-    monthly_sessions = sessions.extra(
-        select={'month': "DATE_FORMAT(data_sessao, '%%Y-%%m')"}
-    ).values('month').annotate(
-        count=Count('id')
-    ).order_by('month')
+    monthly_sessions = [
+        {'month': row['month'].strftime('%Y-%m'), 'count': row['count']}
+        for row in sessions.annotate(
+            month=TruncMonth('session_date')
+        ).values('month').annotate(
+            count=Count('id')
+        ).order_by('month')
+    ]
     
     # Pacientes atendidos
     patients_attended = sessions.values(
@@ -204,7 +288,7 @@ def professional_stats_view(request):
         'patient__unidade_principal__nome'
     ).annotate(
         session_count=Count('id'),
-        last_session=Max('data_sessao')
+        last_session=Max('session_date')
     ).order_by('-session_count')
     
     data = {
@@ -219,7 +303,7 @@ def professional_stats_view(request):
             'avg_sessions_per_patient': round(total_sessions / unique_patients, 2) if unique_patients > 0 else 0
         },
         'top_substances': list(top_substances),
-        'monthly_sessions': list(monthly_sessions),
+        'monthly_sessions': monthly_sessions,
         'patients_attended': list(patients_attended)
     }
     
@@ -228,80 +312,42 @@ def professional_stats_view(request):
 @login_required
 def export_patients_csv(request):
     """
-    Exportar relatório de pacientes para CSV.
+    Exportar relatório de pacientes para CSV (gerado em segundo plano).
     """
-    # Aplicar os mesmos filtros da view principal
-    professional_filter = request.GET.get('professional', '')
-    unit_filter = request.GET.get('unit', '')
-    substance_filter = request.GET.get('substance', '')
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    status_filter = request.GET.get('status', 'active')
-    
-    # Reutilizar lógica de filtros (simplificada)
-    patients = Patient.objects.all()
-    
-    if status_filter == 'active':
-        patients = patients.filter(ativo=True)
-    elif status_filter == 'inactive':
-        patients = patients.filter(ativo=False)
-    
-    if unit_filter:
-        patients = patients.filter(unidade_principal_id=unit_filter)
-    
-    # Criar CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Cabeçalho
-    writer.writerow([
-        'Código',
-        'Nome',
-        'Unidade',
-        'Status',
-        'Total Sessões',
-        'Última Sessão',
-        'Profissionais',
-        'Substâncias Utilizadas'
-    ])
-    
-    # Dados
-    for patient in patients.select_related('unidade_principal'):
-        last_session = PatientSession.objects.filter(
-            patient=patient
-        ).order_by('-data_sessao').first()
-        
-        total_sessions = PatientSession.objects.filter(patient=patient).count()
-        
-        professionals = ', '.join(
-            PatientSession.objects.filter(
-                patient=patient
-            ).values_list('aplicado_por__username', flat=True).distinct()
-        )
-        
-        substances = ', '.join(
-            PatientSession.objects.filter(
-                patient=patient
-            ).values_list(
-                'substancias_utilizadas__substance__nome_comum', 
-                flat=True
-            ).distinct()
-        )
-        
-        writer.writerow([
-            patient.codigo,
-            patient.nome,
-            patient.unidade_principal.nome if patient.unidade_principal else '',
-            'Ativo' if patient.ativo else 'Inativo',
-            total_sessions,
-            last_session.data_sessao.strftime('%d/%m/%Y') if last_session else '',
-            professionals,
-            substances
-        ])
-    
-    # Resposta HTTP
-    response = HttpResponse(output.getvalue(), content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="relatorio_pacientes_{timezone.now().strftime("%Y%m%d_%H%M")}.csv"'
-    
-    return response
+    job = report_jobs.request_report('patients_csv', request.GET, request.user)
+    return redirect('inventory:report_job', job_id=job.id)
 
+@login_required
+def export_financial_csv(request):
+    """
+    Exportar saídas valorizadas para CSV (gerado em segundo plano).
+    """
+    job = report_jobs.request_report('financial_csv', request.GET, request.user)
+    return redirect('inventory:report_job', job_id=job.id)
+
+@login_required
+def report_job_view(request, job_id):
+    """
+    Acompanhamento do relatório (só de quem o pediu); via HTMX devolve apenas o bloco de status,
+    consultado a cada poucos segundos até o job terminar.
+    """
+    job = get_object_or_404(ReportJob, id=job_id, requested_by=request.user)
+    context = {'job': job}
+    if request.htmx:
+        return render(request, 'inventory/partials/report_job_status.html', context)
+    return render(request, 'inventory/report_job.html', context)
+
+@login_required
+def report_job_download(request, job_id):
+    """
+    Download do arquivo gerado (só para quem pediu o relatório).
+    """
+    job = get_object_or_404(ReportJob, id=job_id, requested_by=request.user, status='done')
+    path = report_jobs.result_path(job)
+    if not path.exists():
+        raise Http404('Arquivo expirado; solicite o relatório novamente.')
+    
+    report = REPORTS[job.report_type]
+    name, ext = os.path.splitext(report['filename'])
+    filename = f'{name}_{timezone.localtime(job.finished_at).strftime("%Y%m%d_%H%M")}{ext}'
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type=report['content_type'])
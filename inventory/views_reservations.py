@@ -0,0 +1,93 @@
+import uuid
+
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth.decorators import login_required
+from django.contrib import messages
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods, require_POST
+from .models import StockReservation, Substance, Unit
+from .forms_reservations import ProtocolReservationForm
+from . import reservations
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+@login_required
+def reservations_list_view(request):
+    """View para listar reservas ativas e reservar um protocolo para um paciente."""
+    if request.method == 'POST':
+        form = ProtocolReservationForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            try:
+                created = reservations.reserve_protocol(
+                    data['paciente'], data['protocolo'], data['unit'], data['data_agendada'],
+                    user=request.user
+                )
+            except reservations.InsufficientStock as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(
+                    request,
+                    f'{len(created)} reserva(s) criada(s) para {data["paciente"].nome} '
+                    f'em {data["data_agendada"].strftime("%d/%m/%Y")}.'
+                )
+                return redirect('inventory:reservations_list')
+    else:
+        form = ProtocolReservationForm()
+
+    active = StockReservation.objects.filter(status='ativa').select_related(
+        'paciente', 'protocolo', 'unit', 'substance', 'batch'
+    )
+    unit_id = request.GET.get('unit', '')
+    if not _is_uuid(unit_id):
+        unit_id = ''  # filtro inválido é ignorado
+    if unit_id:
+        active = active.filter(unit_id=unit_id)
+
+    context = {
+        'form': form,
+        'reservations': active,
+        'units': Unit.objects.filter(ativo=True),
+        'selected_unit': unit_id,
+    }
+    return render(request, 'inventory/reservations_list.html', context)
+
+
+@login_required
+@require_POST
+def cancel_reservation_view(request, reservation_id):
+    """View para cancelar uma reserva ativa."""
+    reservation = get_object_or_404(StockReservation, id=reservation_id)
+    if reservations.cancel_reservations([reservation]):
+        messages.success(request, 'Reserva cancelada.')
+    else:
+        messages.warning(request, 'A reserva não está mais ativa.')
+    return redirect('inventory:reservations_list')
+
+
+@login_required
+@require_http_methods(["GET"])
+def stock_availability_api(request):
+    """API do disponível (em estoque − reservado) de uma substância em uma unidade."""
+    substance_id = request.GET.get('substance_id')
+    unit_id = request.GET.get('unit_id')
+    if not substance_id or not unit_id:
+        return JsonResponse({'error': 'substance_id e unit_id são obrigatórios'}, status=400)
+    if not _is_uuid(substance_id) or not _is_uuid(unit_id):
+        return JsonResponse({'error': 'substance_id e unit_id devem ser UUIDs válidos'}, status=400)
+
+    substance = get_object_or_404(Substance, id=substance_id)
+    unit = get_object_or_404(Unit, id=unit_id)
+
+    return JsonResponse({
+        'substance_id': str(substance.id),
+        'unit_id': str(unit.id),
+        'disponivel': float(reservations.get_available(substance, unit)),
+    })
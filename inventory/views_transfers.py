@@ -4,8 +4,11 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.db import transaction
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 from decimal import Decimal
-from .models import TransferNew, TransferItemNew, Unit, Substance, Batch, StockMovement
+from .models import TransferNew, Unit, Substance, Batch
+from . import rebalancing, transfers
+from .reservations import InsufficientStock
 
 @login_required
 def transfers_list(request):
@@ -34,7 +37,7 @@ def transfer_create(request):
                 # Validações básicas
                 if unidade_origem_id == unidade_destino_id:
                     messages.error(request, 'Unidade de origem e destino devem ser diferentes!')
-                    return redirect('transfer_create')
+                    return redirect('inventory:transfer_create')
                 
                 unidade_origem = get_object_or_404(Unit, id=unidade_origem_id)
                 unidade_destino = get_object_or_404(Unit, id=unidade_destino_id)
@@ -54,80 +57,30 @@ def transfer_create(request):
                 if not substances or not quantities:
                     messages.error(request, 'Adicione pelo menos um item à transferência!')
                     transfer.delete()
-                    return redirect('transfer_create')
+                    return redirect('inventory:transfer_create')
                 
                 for substance_id, quantity in zip(substances, quantities):
                     if substance_id and quantity:
                         substance = get_object_or_404(Substance, id=substance_id)
                         quantity = Decimal(str(quantity))
                         
-                        # Buscar lote de origem
-                        batch_origem = Batch.objects.filter(
-                            substance=substance,
-                            unit=unidade_origem
-                        ).first()
+                        # Lotes da origem com saldo livre (sem o reservado), primeiro a vencer
+                        lots = transfers.free_lots(substance, unidade_origem)
+                        disponivel = sum((lot.quantity_free for lot in lots), Decimal('0'))
                         
-                        if not batch_origem:
-                            messages.error(request, f'Lote não encontrado para {substance.nome_comum} na unidade {unidade_origem.nome}!')
-                            transfer.delete()
-                            return redirect('transfer_create')
+                        if disponivel < quantity:
+                            messages.error(request, f'Estoque insuficiente de {substance.nome_comum}! Disponível: {disponivel}')
+                            # Desfaz a transferência e os itens já movidos
+                            transaction.set_rollback(True)
+                            return redirect('inventory:transfer_create')
                         
-                        if batch_origem.get_estoque_atual() < quantity:
-                            messages.error(request, f'Estoque insuficiente de {substance.nome_comum}! Disponível: {batch_origem.get_estoque_atual()}')
-                            transfer.delete()
-                            return redirect('transfer_create')
-                        
-                        # Buscar ou criar lote de destino
-                        batch_destino, created = Batch.objects.get_or_create(
-                            substance=substance,
-                            unit=unidade_destino,
-                            defaults={
-                                'lote': f'TRANSF-{transfer.numero}',
-                                'data_fabricacao': timezone.now().date(),
-                                'data_validade': timezone.now().date().replace(year=timezone.now().year + 2),
-                                'quantidade_inicial': Decimal('0'),
-                                'preco_unitario': batch_origem.preco_unitario if hasattr(batch_origem, 'preco_unitario') else Decimal('0')
-                            }
-                        )
-                        
-                        # Criar item da transferência
-                        TransferItemNew.objects.create(
-                            transfer=transfer,
-                            substance=substance,
-                            batch_origem=batch_origem,
-                            batch_destino=batch_destino,
-                            quantidade=quantity
-                        )
-                        
-                        # Criar movimentações de estoque
-                        # Saída da origem
-                        StockMovement.objects.create(
-                            substance=substance,
-                            batch=batch_origem,
-                            unit=unidade_origem,
-                            tipo='saida',
-                            quantidade=quantity,
-                            user=request.user,
-                            data_hora=timezone.now()
-                        )
-                        
-                        # Entrada no destino
-                        StockMovement.objects.create(
-                            substance=substance,
-                            batch=batch_destino,
-                            unit=unidade_destino,
-                            tipo='entrada',
-                            quantidade=quantity,
-                            user=request.user,
-                            data_hora=timezone.now()
-                        )
-                        
-                        # Atualizar estoques
-                        batch_origem.quantidade_inicial -= quantity
-                        batch_origem.save()
-                        
-                        batch_destino.quantidade_inicial += quantity
-                        batch_destino.save()
+                        remaining = quantity
+                        for lot in lots:
+                            if remaining <= 0:
+                                break
+                            quantity_to_take = min(remaining, lot.quantity_free)
+                            transfers.move_lot(transfer, lot, quantity_to_take, request.user)
+                            remaining -= quantity_to_take
                 
                 # Marcar transferência como concluída
                 transfer.status = 'concluida'
@@ -138,11 +91,11 @@ def transfer_create(request):
                 transfer.save()
                 
                 messages.success(request, f'Transferência {transfer.numero} criada com sucesso!')
-                return redirect('transfer_detail', transfer_id=transfer.id)
+                return redirect('inventory:transfer_detail', transfer_id=transfer.id)
                 
         except Exception as e:
             messages.error(request, f'Erro ao criar transferência: {str(e)}')
-            return redirect('transfer_create')
+            return redirect('inventory:transfer_create')
     
     # GET request
     units = Unit.objects.filter(ativo=True)
@@ -155,6 +108,64 @@ def transfer_create(request):
     }
     return render(request, 'inventory/transfer_create.html', context)
 
+@login_required
+def transfer_suggestions(request):
+    """Transferências sugeridas pelo planejador (faltas previstas e lotes a vencer)"""
+    if request.method == 'POST':
+        # Os movimentos conferidos na tela voltam no POST; não recalcula o plano
+        rows = [
+            (
+                request.POST.get(f'batch_{index}'),
+                request.POST.get(f'destino_{index}'),
+                request.POST.get(f'quantidade_{index}'),
+                request.POST.get(f'motivo_{index}'),
+            )
+            for index in request.POST.getlist('move')
+        ]
+        if not rows:
+            messages.info(request, 'Nenhuma transferência selecionada.')
+            return redirect('inventory:transfer_suggestions')
+        try:
+            moves = rebalancing.moves_from_rows(rows)
+        except ValueError as e:
+            messages.error(request, f'{e} Confira as sugestões novamente.')
+            return redirect('inventory:transfer_suggestions')
+        drafts = rebalancing.create_drafts(moves, user=request.user)
+        messages.success(request, f'{len(drafts)} rascunho(s) de transferência criado(s).')
+        return redirect('inventory:transfers_list')
+    
+    moves = rebalancing.plan()
+    units = Unit.objects.in_bulk({m.origem_id for m in moves} | {m.destino_id for m in moves})
+    substances = Substance.objects.in_bulk({m.substance_id for m in moves})
+    batches = Batch.objects.in_bulk({m.batch_id for m in moves})
+    groups = []
+    index = 0
+    for (origem_id, destino_id), items in rebalancing.group_moves(moves).items():
+        groups.append({
+            'origem': units[origem_id],
+            'destino': units[destino_id],
+            'items': [
+                {
+                    'index': index + i,
+                    'substance': substances[m.substance_id],
+                    'batch': batches[m.batch_id],
+                    'destino_id': m.destino_id,
+                    'quantidade': m.quantidade,
+                    'motivo': m.motivo,
+                    'motivo_label': rebalancing.MOTIVOS[m.motivo],
+                }
+                for i, m in enumerate(items)
+            ],
+        })
+        index += len(items)
+    
+    context = {
+        'groups': groups,
+        'open_drafts': TransferNew.objects.filter(status='rascunho').count(),
+        'title': 'Transferências Sugeridas'
+    }
+    return render(request, 'inventory/transfer_suggestions.html', context)
+
 @login_required
 def transfer_detail(request, transfer_id):
     """Detalhes de uma transferência"""
@@ -171,6 +182,31 @@ def transfer_detail(request, transfer_id):
     }
     return render(request, 'inventory/transfer_detail.html', context)
 
+@login_required
+@require_POST
+def transfer_send_draft(request, transfer_id):
+    """Envia um rascunho do planejador: movimenta o estoque dos lotes de origem"""
+    transfer = get_object_or_404(TransferNew, id=transfer_id)
+    try:
+        if transfers.send_draft(transfer, request.user):
+            messages.success(request, f'Transferência {transfer.numero} enviada e concluída!')
+        else:
+            messages.warning(request, 'A transferência não é mais um rascunho.')
+    except InsufficientStock as e:
+        messages.error(request, str(e))
+    return redirect('inventory:transfer_detail', transfer_id=transfer.id)
+
+@login_required
+@require_POST
+def transfer_discard_draft(request, transfer_id):
+    """Descarta um rascunho do planejador"""
+    transfer = get_object_or_404(TransferNew, id=transfer_id)
+    if transfers.discard_draft(transfer):
+        messages.success(request, f'Rascunho {transfer.numero} descartado.')
+    else:
+        messages.warning(request, 'A transferência não é mais um rascunho.')
+    return redirect('inventory:transfer_detail', transfer_id=transfer.id)
+
 @login_required
 def get_substance_stock(request):
     """API para obter estoque de uma substância em uma unidade"""
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Q
 from django.utils.html import format_html
 from .models import User, AuditLog
 
@@ -63,10 +64,21 @@ class UserAdmin(BaseUserAdmin):
 class AuditLogAdmin(admin.ModelAdmin):
     list_display = ['timestamp', 'user', 'action', 'table_name', 'record_id', 'ip_address']
     list_filter = ['action', 'table_name', 'timestamp']
-    search_fields = ['user__nome', 'user__username', 'table_name', 'record_id', 'ip_address']
+    search_fields = ['table_name', 'record_id', 'ip_address']
     readonly_fields = ['timestamp', 'user', 'action', 'table_name', 'record_id', 'old_value', 'new_value', 'ip_address', 'user_agent']
     date_hierarchy = 'timestamp'
     
+    def get_search_results(self, request, queryset, search_term):
+        # Busca por usuário sem JOIN (AuditLog pode estar no banco ``ledger``)
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            user_ids = list(User.objects.filter(
+                Q(nome__icontains=search_term) | Q(username__icontains=search_term)
+            ).values_list('id', flat=True))
+            if user_ids:
+                queryset |= self.model.objects.filter(user_id__in=user_ids)
+        return queryset, may_have_duplicates
+    
     def has_add_permission(self, request):
         # Logs são criados automaticamente
         return False
@@ -0,0 +1,297 @@
+"""
+Trilha de auditoria das alterações de modelos com gravação em lote (write-behind).
+
+Os handlers de sinais capturam os valores anteriores e novos dos modelos
+configurados em ``settings.AUDIT_MODELS`` e, após o commit da transação,
+enfileiram as entradas em um buffer em memória. O buffer é gravado em
+``AuditLog`` com ``bulk_create`` por uma thread em segundo plano (ou ao
+final de cada requisição, quando a gravação assíncrona está desligada).
+"""
+import atexit
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Requisição corrente (usuário, IP e user agent das entradas capturadas)
+_current_request = ContextVar('audit_current_request', default=None)
+# Permite suspender a captura (cargas em massa, benchmarks)
+_suspended = ContextVar('audit_suspended', default=False)
+
+# Campos que mudam em todo save e não interessam à auditoria
+IGNORED_FIELDS = {'updated_at', 'atualizado_em', 'data_modificacao'}
+
+_json_encoder = DjangoJSONEncoder()
+
+
+def _to_json(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    try:
+        return _json_encoder.default(value)
+    except TypeError:
+        return str(value)
+
+
+def _serialize(entry):
+    # Os valores são capturados crus e convertidos para JSON só na gravação
+    for key in ('old_value', 'new_value'):
+        values = entry[key]
+        if isinstance(values, dict):
+            entry[key] = {name: _to_json(value) for name, value in values.items()}
+    return entry
+
+
+def get_client_ip(request):
+    """Obtém o IP do cliente."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0]
+    return request.META.get('REMOTE_ADDR')
+
+
+class AuditBuffer:
+    """
+    Buffer em memória das entradas de auditoria, gravado em lote.
+    """
+
+    def __init__(self, batch_size=200, flush_interval=2.0, async_flush=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.async_flush = async_flush
+        self._entries = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+            full = len(self._entries) >= self.batch_size
+        if self.async_flush:
+            self._ensure_thread()
+            if full:
+                self._wakeup.set()
+        elif full:
+            self.flush()
+
+    def flush(self):
+        """Grava as entradas pendentes com um único ``bulk_create``."""
+        with self._lock:
+            entries, self._entries = self._entries, []
+        if not entries:
+            return 0
+        from .models import AuditLog
+        try:
+            AuditLog.objects.bulk_create(
+                [AuditLog(**_serialize(entry)) for entry in entries], batch_size=500
+            )
+        except Exception:
+            logger.exception('Falha ao gravar %d entradas de auditoria', len(entries))
+            return 0
+        return len(entries)
+
+    def _ensure_thread(self):
+        # Reinicia a thread após fork (workers do gunicorn)
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='audit-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # Conexões desta thread não devem ficar abertas entre flushes
+                connections.close_all()
+
+
+buffer = AuditBuffer(
+    batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 2.0),
+    async_flush=getattr(settings, 'AUDIT_ASYNC_FLUSH', True),
+)
+atexit.register(buffer.flush)
+
+
+def enqueue(entry, using='default'):
+    """Enfileira a entrada quando (e se) a transação corrente for confirmada."""
+    transaction.on_commit(lambda: buffer.add(entry), using=using)
+
+
+def build_entry(action, table_name, record_id='', old_value=None, new_value=None,
+                user=None, request=None):
+    """
+    Monta os dados de uma entrada de auditoria.
+
+    A instância de ``AuditLog`` só é criada na gravação em lote, fora do
+    caminho da requisição.
+    """
+    request = request if request is not None else _current_request.get()
+    ip_address = None
+    user_agent = ''
+    if request is not None:
+        ip_address = get_client_ip(request)
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        if user is None:
+            request_user = getattr(request, 'user', None)
+            if request_user is not None and request_user.is_authenticated:
+                user = request_user
+    return {
+        'user_id': user.pk if user is not None else None,
+        'action': action,
+        'table_name': table_name,
+        'record_id': record_id,
+        'old_value': old_value,
+        'new_value': new_value,
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'timestamp': timezone.now(),
+    }
+
+
+def log_action(user, action, request, details=None, table_name='auth'):
+    """Registra uma ação de usuário (login, logout, ...) via buffer."""
+    enqueue(build_entry(action, table_name, new_value=details, user=user, request=request))
+
+
+@contextmanager
+def suspended():
+    """Suspende a captura de alterações no contexto corrente."""
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+@contextmanager
+def request_context(request):
+    token = _current_request.set(request)
+    try:
+        yield
+    finally:
+        _current_request.reset(token)
+
+
+def _field_values(instance, snapshot=None):
+    source = snapshot if snapshot is not None else instance.__dict__
+    values = {}
+    for field in instance._meta.concrete_fields:
+        if field.attname in source:
+            values[field.attname] = source[field.attname]
+    return values
+
+
+def _audited_from_db(model):
+    """
+    ``from_db`` que guarda os valores lidos do banco (a tupla de
+    ``values``, sem cópia): o dicionário com os valores anteriores só é
+    montado quando a instância é salva. Instâncias novas não pagam nada.
+    """
+    original = model.from_db.__func__
+
+    def from_db(cls, db, field_names, values):
+        instance = original(cls, db, field_names, values)
+        instance._audit_loaded = (field_names, values)
+        return instance
+
+    # Para ``disconnect_signals``: o atributo próprio do modelo, se havia
+    from_db.audit_original = model.__dict__.get('from_db')
+    return classmethod(from_db)
+
+
+def _loaded_values(instance):
+    field_names, values = getattr(instance, '_audit_loaded', ((), ()))
+    return dict(zip(field_names, values))
+
+
+def _capture_save(sender, instance, created, raw=False, using='default', update_fields=None, **kwargs):
+    if raw or _suspended.get():
+        return
+    current = _field_values(instance)
+    if created:
+        entry = build_entry(
+            'create', sender._meta.db_table, str(instance.pk),
+            new_value=current,
+        )
+    else:
+        previous = _field_values(instance, _loaded_values(instance))
+        fields = set(current) & set(previous)
+        if update_fields:
+            names = {sender._meta.get_field(name).attname for name in update_fields}
+            fields &= names
+        changed = sorted(
+            name for name in fields
+            if name not in IGNORED_FIELDS and previous[name] != current[name]
+        )
+        if not changed:
+            instance._audit_loaded = (list(current), list(current.values()))
+            return
+        entry = build_entry(
+            'update', sender._meta.db_table, str(instance.pk),
+            old_value={name: previous[name] for name in changed},
+            new_value={name: current[name] for name in changed},
+        )
+    instance._audit_loaded = (list(current), list(current.values()))
+    enqueue(entry, using=using)
+
+
+def _capture_delete(sender, instance, using='default', **kwargs):
+    if _suspended.get():
+        return
+    entry = build_entry(
+        'delete', sender._meta.db_table, str(instance.pk),
+        old_value=_field_values(instance),
+    )
+    enqueue(entry, using=using)
+
+
+def get_audited_models():
+    return [apps.get_model(label) for label in getattr(settings, 'AUDIT_MODELS', [])]
+
+
+def connect_signals():
+    """Conecta os handlers aos modelos configurados em ``AUDIT_MODELS``."""
+    for model in get_audited_models():
+        uid = f'audit:{model._meta.label_lower}'
+        if not hasattr(model.from_db, 'audit_original'):
+            model.from_db = _audited_from_db(model)
+        post_save.connect(_capture_save, sender=model, dispatch_uid=f'{uid}:save')
+        post_delete.connect(_capture_delete, sender=model, dispatch_uid=f'{uid}:delete')
+
+
+def disconnect_signals():
+    for model in get_audited_models():
+        uid = f'audit:{model._meta.label_lower}'
+        if hasattr(model.from_db, 'audit_original'):
+            original = model.from_db.audit_original
+            if original is None:
+                del model.from_db
+            else:
+                model.from_db = original
+        post_save.disconnect(sender=model, dispatch_uid=f'{uid}:save')
+        post_delete.disconnect(sender=model, dispatch_uid=f'{uid}:delete')
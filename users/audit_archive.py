@@ -0,0 +1,198 @@
+"""
+Arquivo frio dos logs de auditoria.
+
+Cada mês é gravado em ``auditlog-AAAA-MM.jsonl.gz``, composto por blocos
+gzip independentes (um membro gzip por bloco), e em um índice
+``auditlog-AAAA-MM.index.json`` com o deslocamento de cada bloco e os
+valores presentes nele (usuários, ações, tabelas, registros e intervalo de
+datas). A busca lê o índice e descomprime apenas os blocos candidatos.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+CHUNK_SIZE = 1000
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+
+def get_archive_dir():
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'audit_archive'))
+
+
+def format_timestamp(value):
+    """Formato fixo em UTC: as comparações no arquivo são feitas entre strings."""
+    return value.astimezone(dt_timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def month_key(timestamp):
+    # Meses em UTC, coerentes com os timestamps gravados
+    return format_timestamp(timestamp)[:7]
+
+
+def _paths(archive_dir, month):
+    base = Path(archive_dir) / month[:4]
+    return base / f'auditlog-{month}.jsonl.gz', base / f'auditlog-{month}.index.json'
+
+
+def _load_index(index_path, month):
+    if index_path.exists():
+        with open(index_path, encoding='utf-8') as f:
+            return json.load(f)
+    return {'month': month, 'chunks': []}
+
+
+def _chunk_metadata(rows):
+    return {
+        'count': len(rows),
+        'ts_min': min(row['timestamp'] for row in rows),
+        'ts_max': max(row['timestamp'] for row in rows),
+        'users': sorted({row['user_id'] for row in rows if row['user_id'] is not None}),
+        'actions': sorted({row['action'] for row in rows}),
+        'tables': sorted({row['table_name'] for row in rows}),
+        'records': sorted({f"{row['table_name']}:{row['record_id']}" for row in rows if row['record_id']}),
+    }
+
+
+def _archived_ids(data_path, index, ts_min):
+    """Ids já gravados nos blocos que alcançam ``ts_min`` (normalmente só o último)."""
+    ids = set()
+    chunks = [chunk for chunk in index['chunks'] if chunk['ts_max'] >= ts_min]
+    if not chunks:
+        return ids
+    with open(data_path, 'rb') as f:
+        for chunk in chunks:
+            f.seek(chunk['offset'])
+            payload = gzip.decompress(f.read(chunk['length']))
+            ids.update(json.loads(line)['id'] for line in payload.decode('utf-8').splitlines())
+    return ids
+
+
+def write_month(month, rows, archive_dir=None):
+    """
+    Acrescenta ``rows`` (dicionários serializáveis) ao arquivo do mês.
+
+    Linhas já arquivadas (mesmo ``id``) são ignoradas: se a execução anterior
+    caiu depois de gravar e antes de remover da tabela, rodar de novo não
+    duplica o arquivo. O índice só é atualizado depois que os blocos foram
+    gravados em disco.
+    """
+    archive_dir = archive_dir or get_archive_dir()
+    data_path, index_path = _paths(archive_dir, month)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    index = _load_index(index_path, month)
+    if rows and index['chunks']:
+        archived = _archived_ids(data_path, index, min(row['timestamp'] for row in rows))
+        rows = [row for row in rows if row['id'] not in archived]
+    if not rows:
+        return data_path
+
+    with open(data_path, 'ab') as f:
+        for start in range(0, len(rows), CHUNK_SIZE):
+            chunk = rows[start:start + CHUNK_SIZE]
+            payload = ''.join(
+                json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for row in chunk
+            ).encode('utf-8')
+            compressed = gzip.compress(payload)
+            offset = f.tell()
+            f.write(compressed)
+            metadata = _chunk_metadata(chunk)
+            metadata.update({'offset': offset, 'length': len(compressed)})
+            index['chunks'].append(metadata)
+        f.flush()
+        os.fsync(f.fileno())
+
+    tmp_path = index_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, index_path)
+    return data_path
+
+
+def _chunk_matches(chunk, filters):
+    if filters.get('user_id') is not None and filters['user_id'] not in chunk['users']:
+        return False
+    if filters.get('action') and filters['action'] not in chunk['actions']:
+        return False
+    if filters.get('table_name') and filters['table_name'] not in chunk['tables']:
+        return False
+    if filters.get('record_id'):
+        if filters.get('table_name'):
+            if f"{filters['table_name']}:{filters['record_id']}" not in chunk['records']:
+                return False
+        elif not any(key.endswith(f":{filters['record_id']}") for key in chunk['records']):
+            return False
+    if filters.get('date_from') and chunk['ts_max'] < filters['date_from']:
+        return False
+    if filters.get('date_to') and chunk['ts_min'] > filters['date_to']:
+        return False
+    return True
+
+
+def _row_matches(row, filters):
+    if filters.get('user_id') is not None and row['user_id'] != filters['user_id']:
+        return False
+    if filters.get('action') and row['action'] != filters['action']:
+        return False
+    if filters.get('table_name') and row['table_name'] != filters['table_name']:
+        return False
+    if filters.get('record_id') and row['record_id'] != filters['record_id']:
+        return False
+    if filters.get('date_from') and row['timestamp'] < filters['date_from']:
+        return False
+    if filters.get('date_to') and row['timestamp'] > filters['date_to']:
+        return False
+    return True
+
+
+def search(filters, limit=200, archive_dir=None):
+    """
+    Busca entradas arquivadas.
+
+    ``filters`` aceita ``user_id``, ``action``, ``table_name``, ``record_id``,
+    ``date_from`` e ``date_to`` (strings em ``format_timestamp``). Retorna as ``limit``
+    entradas mais recentes.
+    """
+    archive_dir = Path(archive_dir or get_archive_dir())
+    if not archive_dir.exists():
+        return []
+    if filters.get('user_id') is not None:
+        try:
+            filters = {**filters, 'user_id': int(filters['user_id'])}
+        except (TypeError, ValueError):
+            filters = {**filters, 'user_id': None}  # usuário inválido é ignorado
+
+    month_from = filters.get('date_from', '')[:7]
+    month_to = filters.get('date_to', '')[:7]
+    results = []
+    for index_path in sorted(archive_dir.glob('*/auditlog-*.index.json'), reverse=True):
+        month = index_path.name[len('auditlog-'):-len('.index.json')]
+        if (month_from and month < month_from) or (month_to and month > month_to):
+            continue
+        index = _load_index(index_path, month)
+        data_path, _ = _paths(archive_dir, month)
+        candidates = [chunk for chunk in index['chunks'] if _chunk_matches(chunk, filters)]
+        if not candidates:
+            continue
+        with open(data_path, 'rb') as f:
+            for chunk in candidates:
+                f.seek(chunk['offset'])
+                payload = gzip.decompress(f.read(chunk['length']))
+                for line in payload.decode('utf-8').splitlines():
+                    row = json.loads(line)
+                    if _row_matches(row, filters):
+                        results.append(row)
+        # Os meses são percorridos do mais recente para o mais antigo
+        if len(results) >= limit:
+            break
+
+    results.sort(key=lambda row: (row['timestamp'], row['id']), reverse=True)
+    for row in results[:limit]:
+        row['timestamp'] = datetime.strptime(row['timestamp'], TIMESTAMP_FORMAT).replace(tzinfo=dt_timezone.utc)
+    return results[:limit]
@@ -0,0 +1,64 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users import audit_archive
+from users.models import AuditLog, User
+
+
+class Command(BaseCommand):
+    help = 'Move logs de auditoria antigos para arquivos JSONL comprimidos por mês (com índice)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'AUDIT_RETENTION_DAYS', 180),
+            help='Mantém na tabela apenas os últimos N dias'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Registros lidos por lote')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas informa quantos registros seriam arquivados')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        old_logs = AuditLog.objects.filter(timestamp__lt=cutoff)
+        
+        if options['dry_run']:
+            self.stdout.write(f'{old_logs.count()} registros anteriores a {cutoff:%d/%m/%Y} seriam arquivados.')
+            return
+        
+        total = 0
+        months = set()
+        while True:
+            rows = list(
+                old_logs.order_by('timestamp', 'id').values(
+                    'id', 'timestamp', 'user_id', 'action', 'table_name',
+                    'record_id', 'old_value', 'new_value', 'ip_address', 'user_agent',
+                )[:options['batch_size']]
+            )
+            if not rows:
+                break
+            
+            # Usuários lidos à parte: AuditLog pode estar no banco ``ledger``
+            usernames = dict(User.objects.filter(
+                id__in={row['user_id'] for row in rows if row['user_id']}
+            ).values_list('id', 'username'))
+            by_month = defaultdict(list)
+            for row in rows:
+                row['username'] = usernames.get(row['user_id'])
+                month = audit_archive.month_key(row['timestamp'])
+                row['timestamp'] = audit_archive.format_timestamp(row['timestamp'])
+                by_month[month].append(row)
+            
+            # Só remove da tabela o que já foi gravado (e sincronizado) em disco
+            for month, month_rows in by_month.items():
+                audit_archive.write_month(month, month_rows)
+                AuditLog.objects.filter(id__in=[row['id'] for row in month_rows]).delete()
+                months.add(month)
+            total += len(rows)
+            self.stdout.write(f'{total} registros arquivados...')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total} registros arquivados em {len(months)} mês(es) em {audit_archive.get_archive_dir()}'
+        ))
@@ -0,0 +1,97 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.models import Substance
+from users import audit
+from users.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = 'Mede o custo por operação da auditoria de alterações (com e sem captura), inclusive nas leituras'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=500, help='Número de criações/atualizações por rodada')
+        parser.add_argument('--rounds', type=int, default=3, help='Número de rodadas (usa a melhor)')
+
+    def handle(self, *args, **options):
+        operations = options['operations']
+        rounds = options['rounds']
+        self.created_ids = []
+        
+        audit.disconnect_signals()
+        try:
+            baseline, baseline_load = self._best(operations, rounds)
+        finally:
+            audit.connect_signals()
+        
+        # Mede apenas a captura: a gravação fica retida no buffer durante as rodadas
+        async_flush, batch_size = audit.buffer.async_flush, audit.buffer.batch_size
+        audit.buffer.async_flush, audit.buffer.batch_size = False, float('inf')
+        try:
+            audited, audited_load = self._best(operations, rounds)
+        finally:
+            audit.buffer.async_flush, audit.buffer.batch_size = async_flush, batch_size
+        
+        # Custo da gravação em lote, fora do caminho da requisição
+        pending = len(audit.buffer)
+        start = time.perf_counter()
+        flushed = audit.buffer.flush()
+        flush_time = time.perf_counter() - start
+        
+        # Remove as entradas de auditoria geradas pelo benchmark
+        AuditLog.objects.filter(
+            table_name=Substance._meta.db_table, record_id__in=self.created_ids
+        ).delete()
+        
+        per_op_base = baseline / (operations * 2) * 1_000_000
+        per_op_audit = audited / (operations * 2) * 1_000_000
+        overhead = (audited - baseline) / baseline * 100 if baseline else 0
+        per_load_base = baseline_load / operations * 1_000_000
+        per_load_audit = audited_load / operations * 1_000_000
+        load_overhead = (audited_load - baseline_load) / baseline_load * 100 if baseline_load else 0
+        
+        self.stdout.write(f'Operações por rodada: {operations * 2} (criação + atualização)')
+        self.stdout.write(f'Sem auditoria:  {per_op_base:8.1f} µs/op')
+        self.stdout.write(f'Com auditoria:  {per_op_audit:8.1f} µs/op ({overhead:+.1f}%)')
+        self.stdout.write(f'Leitura sem auditoria: {per_load_base:8.1f} µs/instância')
+        self.stdout.write(f'Leitura com auditoria: {per_load_audit:8.1f} µs/instância ({load_overhead:+.1f}%)')
+        self.stdout.write(
+            f'Gravação em lote: {flushed} de {pending} entradas em {flush_time * 1000:.1f} ms '
+            f'({flush_time / max(flushed, 1) * 1_000_000:.1f} µs/entrada, fora da requisição)'
+        )
+
+    def _best(self, operations, rounds):
+        results = [self._run(operations) for _ in range(rounds)]
+        return min(write for write, _ in results), min(load for _, load in results)
+
+    def _run(self, operations):
+        """Tempo de criação + atualização e tempo de leitura das instâncias criadas."""
+        tag = uuid.uuid4().hex[:8]
+        start = time.perf_counter()
+        with transaction.atomic():
+            created = [
+                Substance.objects.create(
+                    nome_comum=f'__bench__{tag}_{i}',
+                    concentracao='1mg',
+                    apresentacao='ampola',
+                )
+                for i in range(operations)
+            ]
+            for substance in created:
+                substance.preco_padrao = Decimal('1.00')
+                substance.save()
+        elapsed = time.perf_counter() - start
+        self.created_ids.extend(str(substance.pk) for substance in created)
+        
+        bench = Substance.objects.filter(nome_comum__startswith=f'__bench__{tag}')
+        start = time.perf_counter()
+        list(bench)
+        load_elapsed = time.perf_counter() - start
+        
+        with audit.suspended():
+            bench.delete()
+        return elapsed, load_elapsed
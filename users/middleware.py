@@ -0,0 +1,34 @@
+from asgiref.sync import sync_to_async
+
+from core.middleware import AsyncCapableMiddleware
+
+from . import audit
+
+
+class AuditContextMiddleware(AsyncCapableMiddleware):
+    """
+    Disponibiliza a requisição corrente para a trilha de auditoria.
+    """
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        
+        with audit.request_context(request):
+            response = self.get_response(request)
+        
+        # Sem a thread de gravação, o buffer é gravado ao final da requisição
+        if not audit.buffer.async_flush:
+            audit.buffer.flush()
+        
+        return response
+    
+    async def __acall__(self, request):
+        # O ContextVar da requisição é copiado para as threads do sync_to_async
+        with audit.request_context(request):
+            response = await self.get_response(request)
+        
+        if not audit.buffer.async_flush:
+            await sync_to_async(audit.buffer.flush)()
+        
+        return response
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 import pyotp
 import qrcode
 from io import BytesIO
@@ -112,9 +113,11 @@ class AuditLog(models.Model):
         ('export', 'Exportação'),
     ]
     
+    # Sem constraint: o log pode ficar no banco ``ledger`` e deve sobreviver ao usuário
     user = models.ForeignKey(
         User, 
-        on_delete=models.SET_NULL, 
+        on_delete=models.DO_NOTHING, 
+        db_constraint=False,
         null=True, 
         blank=True,
         verbose_name='Usuário'
@@ -126,12 +129,20 @@ class AuditLog(models.Model):
     new_value = models.JSONField(blank=True, null=True, verbose_name='Novo Valor')
     ip_address = models.GenericIPAddressField(blank=True, null=True, verbose_name='IP')
     user_agent = models.TextField(blank=True, verbose_name='User Agent')
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name='Data/Hora')
+    # Preenchido no momento do evento (a gravação é feita em lote, depois)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Data/Hora')
     
     class Meta:
         verbose_name = 'Log de Auditoria'
         verbose_name_plural = 'Logs de Auditoria'
-        ordering = ['-timestamp']
+        ordering = ['-timestamp', '-id']
+        indexes = [
+            # Paginação por cursor (timestamp, id) e filtros combinados
+            models.Index(fields=['-timestamp', '-id'], name='auditlog_ts_id_idx'),
+            models.Index(fields=['user', '-timestamp'], name='auditlog_user_ts_idx'),
+            models.Index(fields=['action', '-timestamp'], name='auditlog_action_ts_idx'),
+            models.Index(fields=['table_name', 'record_id', '-timestamp'], name='auditlog_record_ts_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user} - {self.get_action_display()} - {self.timestamp}"
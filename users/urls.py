@@ -10,6 +10,10 @@ urlpatterns = [
     path('change-password/', views.change_password_view, name='change_password'),
     path('setup-2fa/', views.setup_2fa_view, name='setup_2fa'),
     path('audit-logs/', views.AuditLogView.as_view(), name='audit_logs'),
+    path('query-stats/', views.query_stats_view, name='query_stats'),
+    path('profiles/', views.profiles_list_view, name='profiles'),
+    path('profiles/<int:profile_id>/', views.profile_detail_view, name='profile_detail'),
+    path('profiles/<int:profile_id>/<str:kind>/', views.profile_download_view, name='profile_download'),
     path('verify-2fa/', views.verify_2fa_ajax, name='verify_2fa_ajax'),
 ]
 